@@ -0,0 +1 @@
+"""Performance benchmarks; run ``python -m benchmarks.indexing --help``."""
@@ -0,0 +1,139 @@
+"""Deterministic synthetic corpora for the indexing benchmarks."""
+
+import json
+import os
+import random
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+FORMATS = ("txt", "md", "html", "pdf")
+FILES_PER_DIRECTORY = 500
+
+_WORDS = (
+    "index query document invoice contract report budget quarter revenue policy "
+    "customer vendor shipment warehouse schedule release deadline meeting review "
+    "summary analysis forecast metric latency throughput storage network cluster "
+    "service request response ticket incident owner team project milestone risk"
+).split()
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(6, 16))]
+    if rng.random() < 0.2:
+        # Identifiers for the keyword index to pick up
+        words.insert(rng.randrange(len(words)), f"INC-{rng.randint(1000, 9999)}")
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraphs(rng: random.Random, size: int) -> List[str]:
+    paragraphs, length = [], 0
+    while length < size:
+        paragraph = " ".join(_sentence(rng) for _ in range(rng.randint(2, 6)))
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 2
+    return paragraphs
+
+
+def _txt(rng: random.Random, size: int) -> bytes:
+    return "\n\n".join(_paragraphs(rng, size)).encode("utf-8")
+
+
+def _md(rng: random.Random, size: int) -> bytes:
+    parts = [f"# {_sentence(rng)[:-1]}"]
+    for i, paragraph in enumerate(_paragraphs(rng, size)):
+        if i % 4 == 3:
+            parts.append(f"## {rng.choice(_WORDS).capitalize()} {i}")
+        parts.append(paragraph)
+        if i % 7 == 6:
+            parts.append("| item | count |\n| --- | --- |\n" +
+                         "\n".join(f"| {rng.choice(_WORDS)} | {rng.randint(1, 999)} |" for _ in range(4)))
+    return "\n\n".join(parts).encode("utf-8")
+
+
+def _html(rng: random.Random, size: int) -> bytes:
+    body = "\n".join(f"<p>{paragraph}</p>" for paragraph in _paragraphs(rng, size))
+    return (f"<!DOCTYPE html>\n<html><head><title>{rng.choice(_WORDS)}</title></head>\n"
+            f"<body><h1>{_sentence(rng)[:-1]}</h1>\n{body}\n</body></html>\n").encode("utf-8")
+
+
+def _pdf(rng: random.Random, size: int) -> bytes:
+    """A single-page PDF with one line of text per sentence."""
+    lines = [sentence for paragraph in _paragraphs(rng, size) for sentence in paragraph.split(". ")][:60]
+    text = "\n".join(f"({line.replace('(', '').replace(')', '')}) Tj T*" for line in lines)
+    stream = f"BT /F1 9 Tf 11 TL 36 800 Td\n{text}\nET".encode("latin-1")
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+        b"/Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    pdf, offsets = bytearray(b"%PDF-1.4\n"), []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    pdf += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(pdf)
+
+
+_GENERATORS = {"txt": _txt, "md": _md, "html": _html, "pdf": _pdf}
+
+
+def _manifest(directory: Path) -> Path:
+    # Kept beside the corpus, where the indexer does not see it
+    return directory.parent / f"{directory.name}.json"
+
+
+def generate_corpus(directory: Path, files: int, formats: Sequence[str] = FORMATS, seed: int = 0,
+                    min_size: int = 1024, max_size: int = 16 * 1024) -> Dict[str, int]:
+    """Write ``files`` documents cycling through ``formats`` under ``directory``.
+
+    Files are spread over subdirectories of ``FILES_PER_DIRECTORY``. The same
+    arguments always produce the same corpus, and a corpus already generated
+    with them is reused. Returns the corpus description (file count and bytes).
+    """
+    unknown = set(formats) - set(_GENERATORS)
+    if unknown:
+        raise ValueError(f"Unknown corpus formats: {', '.join(sorted(unknown))}")
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    spec = {"files": files, "formats": list(formats), "seed": seed, "min_size": min_size, "max_size": max_size}
+    manifest = _manifest(directory)
+    if manifest.exists():
+        existing = json.loads(manifest.read_text())
+        if existing["spec"] == spec:
+            return existing["corpus"]
+
+    rng = random.Random(seed)
+    total_bytes = 0
+    for i in range(files):
+        file_format = formats[i % len(formats)]
+        subdirectory = directory / f"d{i // FILES_PER_DIRECTORY:04d}"
+        if i % FILES_PER_DIRECTORY == 0:
+            subdirectory.mkdir(parents=True, exist_ok=True)
+        content = _GENERATORS[file_format](rng, rng.randint(min_size, max_size))
+        (subdirectory / f"doc_{i:06d}.{file_format}").write_bytes(content)
+        total_bytes += len(content)
+
+    corpus = {"files": files, "bytes": total_bytes, "formats": list(formats)}
+    manifest.write_text(json.dumps({"spec": spec, "corpus": corpus}))
+    return corpus
+
+
+def modify_corpus(directory: Path, fraction: float, seed: int = 1) -> List[str]:
+    """Append a sentence to ``fraction`` of the corpus's text files; returns their paths."""
+    rng = random.Random(seed)
+    paths = sorted(str(path) for path in Path(directory).rglob("doc_*") if path.suffix != ".pdf")
+    chosen = rng.sample(paths, max(1, int(len(paths) * fraction))) if paths else []
+    for path in chosen:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(f"\n\n{_sentence(rng)}\n")
+    # The manifest no longer describes the files on disk
+    manifest = _manifest(Path(directory))
+    if manifest.exists():
+        os.remove(manifest)
+    return chosen
@@ -0,0 +1,266 @@
+"""Indexing throughput benchmark.
+
+Generates synthetic corpora, indexes each one with ``FileAgent.index_directory``
+into the offline local index and reports throughput, per-stage latency
+percentiles, peak RSS and index state bytes written. Every corpus is indexed
+in a fresh process, so peak RSS is per corpus. Results are written as JSON;
+pass an earlier result file to ``--compare`` to check for regressions::
+
+    python -m benchmarks.indexing --sizes 10 1000 100000 --output after.json --compare before.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from .corpus import FORMATS, generate_corpus, modify_corpus
+
+PHASES = ("cold", "rescan", "modified")
+RESULTS_DIR = Path(__file__).resolve().parent.parent / "data" / "benchmarks"
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted ``values``."""
+    if not values:
+        return 0.0
+    return values[min(len(values), max(1, math.ceil(q / 100 * len(values)))) - 1]
+
+
+class StageTimer:
+    """Collects the latency of every stage call reported to the indexer metrics."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def reset(self):
+        self.samples.clear()
+
+    def record(self, stage: str, file_type: str, seconds: float):
+        self.samples[stage].append(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Count, total and p50/p90/p99/max latency in milliseconds per stage."""
+        summary = {}
+        for stage, samples in self.samples.items():
+            values = sorted(samples)
+            summary[stage] = {
+                "count": len(values),
+                "total_ms": sum(values) * 1000,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p90_ms": percentile(values, 90) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+                "max_ms": values[-1] * 1000 if values else 0.0
+            }
+        return summary
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process, when the platform reports it."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _directory_bytes(directory: Path) -> int:
+    return sum(path.stat().st_size for path in directory.rglob("*") if path.is_file())
+
+
+def run_corpus(files: int, formats: Sequence[str], workdir: str, phases: Sequence[str] = PHASES,
+               conversion_cache: bool = False, modify_fraction: float = 0.01) -> Dict[str, Any]:
+    """Generate one corpus and time each indexing phase over it.
+
+    Phases: ``cold`` indexes the corpus into an empty index, ``rescan`` runs
+    again with nothing changed and ``modified`` runs after editing
+    ``modify_fraction`` of the files.
+    """
+    from src.agent.agent import FileAgent
+    from src.indexer.document_processor import DocumentProcessor
+    from src.indexer.index_manager import IndexManager
+    from src.utils.metrics import metrics
+
+    workdir = Path(workdir)
+    corpus_dir = workdir / f"corpus_{files}_{'_'.join(formats)}"
+    started = time.perf_counter()
+    corpus = generate_corpus(corpus_dir, files, formats)
+    corpus["generation_seconds"] = time.perf_counter() - started
+
+    state_dir = Path(tempfile.mkdtemp(prefix="state_", dir=workdir))
+    agent = FileAgent()
+    agent.index_manager = IndexManager("Benchmark", "Indexing benchmark", agent_id="benchmark", backend="local",
+                                       local_connector=agent.local_connector, state_dir=state_dir)
+    agent.index_manager.document_processor = DocumentProcessor(use_cache=conversion_cache)
+    timer = StageTimer()
+    metrics.add_listener(timer.record)
+    state_backend = agent.index_manager.storage.backend
+
+    results = {}
+    try:
+        for phase in phases:
+            if phase == "modified":
+                corpus["modified_files"] = len(modify_corpus(corpus_dir, modify_fraction))
+            timer.reset()
+            metrics.reset()
+            bytes_before = state_backend.bytes_written
+            start = time.perf_counter()
+            # The pipeline prints a line per file; keep it out of the report
+            with contextlib.redirect_stdout(io.StringIO()):
+                agent.index_directory(str(corpus_dir))
+            elapsed = time.perf_counter() - start
+            results[phase] = {
+                "seconds": elapsed,
+                "files_per_sec": corpus["files"] / elapsed,
+                "mb_per_sec": corpus["bytes"] / elapsed / 1024 ** 2,
+                **agent.index_manager.last_stats,
+                "state_bytes_written": state_backend.bytes_written - bytes_before,
+                "stages": timer.summary(),
+                "counters": metrics.snapshot()["counters"]
+            }
+    finally:
+        metrics.remove_listener(timer.record)
+
+    return {
+        "corpus": corpus,
+        "phases": results,
+        "state_bytes_on_disk": _directory_bytes(state_dir),
+        "peak_rss_bytes": peak_rss_bytes()
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=Path(__file__).resolve().parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(sizes: Sequence[int], formats: Sequence[str] = FORMATS, workdir: Optional[str] = None,
+                  phases: Sequence[str] = PHASES, conversion_cache: bool = False,
+                  isolate: bool = True) -> Dict[str, Any]:
+    """Benchmark every corpus size, each in a fresh process unless ``isolate`` is False."""
+    from src.config.settings import STATE_BACKEND, UPSERT_BATCH_RECORDS, UPSERT_MAX_IN_FLIGHT, CONVERSION_WORKERS
+
+    with contextlib.ExitStack() as stack:
+        if workdir is None:
+            workdir = stack.enter_context(tempfile.TemporaryDirectory(prefix="indexing_benchmark_"))
+        Path(workdir).mkdir(parents=True, exist_ok=True)
+        scenarios = []
+        for files in sizes:
+            args = (files, list(formats), str(workdir), list(phases), conversion_cache)
+            if isolate:
+                with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                    scenarios.append(pool.submit(run_corpus, *args).result())
+            else:
+                scenarios.append(run_corpus(*args))
+
+    return {
+        "benchmark": "indexing",
+        "commit": _git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": {
+            "state_backend": STATE_BACKEND,
+            "conversion_workers": CONVERSION_WORKERS,
+            "upsert_batch_records": UPSERT_BATCH_RECORDS,
+            "upsert_max_in_flight": UPSERT_MAX_IN_FLIGHT,
+            "conversion_cache": conversion_cache
+        },
+        "scenarios": scenarios
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.1) -> List[str]:
+    """Describe the files/sec change of every phase also in ``baseline``.
+
+    Returns the lines of the report; lines of phases that slowed down by more
+    than ``threshold`` start with ``REGRESSION``.
+    """
+    def key(scenario):
+        return scenario["corpus"]["files"], tuple(scenario["corpus"]["formats"])
+
+    previous = {key(scenario): scenario for scenario in baseline["scenarios"]}
+    lines = []
+    for scenario in current["scenarios"]:
+        old = previous.get(key(scenario))
+        if not old:
+            continue
+        for phase, result in scenario["phases"].items():
+            if phase not in old["phases"]:
+                continue
+            before, after = old["phases"][phase]["files_per_sec"], result["files_per_sec"]
+            change = (after - before) / before if before else 0.0
+            label = "REGRESSION" if change < -threshold else "ok"
+            lines.append(f"{label:<10} {scenario['corpus']['files']:>7} files {phase:<8} "
+                         f"{before:10.1f} -> {after:10.1f} files/s ({change:+.1%})")
+    return lines
+
+
+def format_report(results: Dict[str, Any]) -> str:
+    lines = [f"Indexing benchmark at {results['commit'] or 'unknown commit'}"]
+    for scenario in results["scenarios"]:
+        corpus = scenario["corpus"]
+        rss = scenario["peak_rss_bytes"]
+        lines.append(f"\n{corpus['files']} files, {corpus['bytes'] / 1024 ** 2:.1f} MB ({', '.join(corpus['formats'])})"
+                     + (f", peak RSS {rss / 1024 ** 2:.0f} MB" if rss else ""))
+        for phase, result in scenario["phases"].items():
+            lines.append(f"  {phase:<8} {result['seconds']:8.2f}s {result['files_per_sec']:10.1f} files/s "
+                         f"{result['mb_per_sec']:8.2f} MB/s  indexed {result['indexed']} errors {result['errors']} "
+                         f"state {result['state_bytes_written']} B")
+            for stage, latency in result["stages"].items():
+                lines.append(f"    {stage:<12} n={latency['count']:<7} p50 {latency['p50_ms']:8.3f} ms "
+                             f"p90 {latency['p90_ms']:8.3f} ms p99 {latency['p99_ms']:8.3f} ms")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000],
+                        help="corpus sizes in files (e.g. 10 1000 100000)")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--phases", nargs="+", choices=PHASES, default=list(PHASES))
+    parser.add_argument("--workdir", help="where corpora are generated (and reused); a temporary directory by default")
+    parser.add_argument("--conversion-cache", action="store_true", help="use the on-disk conversion cache")
+    parser.add_argument("--output", help="result JSON path (default: data/benchmarks/indexing-<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier result JSON to compare files/sec against")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="slowdown fraction reported as a regression (default: 0.1)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.sizes, args.formats, args.workdir, args.phases, args.conversion_cache)
+    print(format_report(results))
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"indexing-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        report = compare(results, json.loads(Path(args.compare).read_text()), args.threshold)
+        print("\n" + "\n".join(report or ["No matching scenarios to compare"]))
+        if any(line.startswith("REGRESSION") for line in report):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,29 +1,67 @@
-from typing import List, Dict, Any, Optional
-from aixplain.factories import AgentFactory
-from aixplain.modules.agent.tool.model_tool import ModelTool
+import os
+import asyncio
+import threading
+from typing import List, Dict, Any, Iterable, Optional, Tuple, Union
 from ..indexer.index_manager import IndexManager
+from ..indexer.retrieval_backends import RetrievalBackend
+from ..indexer.sharding import ShardedIndexer
 from ..connectors.local_connector import LocalConnector
 from ..connectors.drive_connector import DriveConnector
+from ..connectors.file_watcher import FileWatcher
+from .async_client import AsyncAgentClient
+from .answer_cache import AnswerCache
 from ..config.aixplain_config import create_tool, DEFAULT_LLM_ID, MAX_FILE_SIZE
+from ..config.settings import RETRIEVAL_BACKEND, INDEX_WORKERS, METRICS_PORT, METRICS_TRACING, AGENT_CONTEXT_HITS
+from ..utils.lazy import LazyImport
+from ..utils.metrics import metrics
+
+# The aiXplain SDK is imported when the agent is initialized
+AgentFactory = LazyImport("aixplain.factories", "AgentFactory")
+ModelTool = LazyImport("aixplain.modules.agent.tool.model_tool", "ModelTool")
 
 class FileAgent:
-    def __init__(self, name: str = "File Assistant", description: str = "An agent that helps you interact with your documents"):
-        """Initialize the file agent."""
+    def __init__(self, name: str = "File Assistant", description: str = "An agent that helps you interact with your documents",
+                 answer_cache: Optional[AnswerCache] = None):
+        """Initialize the file agent.
+        
+        ``answer_cache`` replaces the default answer cache, e.g. with one that
+        matches similar questions by embedding.
+        """
         self.name = name
         self.description = description
         self.local_connector = LocalConnector()
         self.drive_connector = DriveConnector()
         self.index_manager = None
+        self.retrieval_backend = None
         self.agent = None
+        self.async_client = AsyncAgentClient()
+        self.answer_cache = answer_cache or AnswerCache()
         
-    def initialize(self, llm_id: str = DEFAULT_LLM_ID, agent_id: str = None):
-        """Initialize the agent with necessary tools and index."""
+    def initialize(self, llm_id: str = DEFAULT_LLM_ID, agent_id: str = None,
+                   retrieval_backend: Union[str, RetrievalBackend] = RETRIEVAL_BACKEND):
+        """Initialize the agent with necessary tools and index.
+        
+        ``retrieval_backend`` chooses the agent's index: "aixplain" (default) or
+        "local" for an offline index. The hosted agent can only search an
+        aiXplain index, so with a local backend it gets no search tool and
+        sees the documents only if ``AGENT_CONTEXT_HITS`` is set (see
+        ``_with_context``).
+        """
         # Create index for documents with a unique identifier
         self.index_manager = IndexManager(
             name=f"{self.name} Index",
             description=f"Index for {self.name}'s document collection",
-            agent_id=self.name.replace(" ", "_").lower()
+            agent_id=self.name.replace(" ", "_").lower(),
+            backend=retrieval_backend,
+            local_connector=self.local_connector,
+            drive_connector=self.drive_connector
         )
+        self.retrieval_backend = retrieval_backend
+        
+        if METRICS_PORT:
+            metrics.serve(METRICS_PORT)
+        if METRICS_TRACING:
+            metrics.enable_tracing()
         
         if agent_id:
             self.agent = AgentFactory.get(agent_id)
@@ -32,12 +70,16 @@ class FileAgent:
             tools = [
                 create_tool("speech_synthesis"),
                 create_tool("translation"),
-                create_tool("speech_recognition"),
-                ModelTool(
+                create_tool("speech_recognition")
+            ]
+            if retrieval_backend == "aixplain":
+                tools.append(ModelTool(
                     model=self.index_manager.id,
                     description="This tool searches through indexed documents to find relevant information."
-                )
-            ]
+                ))
+            else:
+                print("Using a local retrieval backend; the agent gets no document search tool "
+                      "(set AGENT_CONTEXT_HITS to send it search hits with each question)")
             
             # Create agent
             self.agent = AgentFactory.create(
@@ -51,65 +93,181 @@ class FileAgent:
         """Authenticate with Google Drive."""
         self.drive_connector.authenticate(credentials_path)
         
-    def index_directory(self, directory_path: str, recursive: bool = True, force: bool = False) -> int:
-        """Index all supported files in a directory, checking size before processing."""
+    def index_directory(self, directory_path: str, recursive: bool = True, force: bool = False,
+                        prune: bool = True, resume: bool = True) -> int:
+        """Index all supported files in a directory, checking size before processing.
+        
+        With ``prune``, files indexed from the directory earlier that the scan
+        no longer finds (deleted, moved or grown past the size limit) are
+        removed from the index afterwards. The run is a checkpointed job: if
+        an earlier run with the same options was interrupted, it is resumed
+        from its last committed batch unless ``resume`` is False.
+        """
+        if not self.index_manager:
+            raise ValueError("Agent not initialized. Call initialize() first.")
+            
+        directory_path = os.path.normpath(directory_path)
+        scanned, failed_dirs = set(), []
+        
+        # Scan directory for files, taking size and mtime from a single stat per file
+        # so unchanged files are skipped without being opened
+        def documents():
+            for file_path, stats in self.local_connector.scan_directory_entries(directory_path, recursive, failed_dirs):
+                # Check file size before processing
+                if stats.st_size <= MAX_FILE_SIZE:
+                    scanned.add(file_path)
+                    doc = {
+                        "file_path": file_path,
+                        "size": stats.st_size,
+                        "stats": stats
+                    }
+                    if force:
+                        doc["force"] = True
+                    yield doc
+        
+        # Stream the scan straight into the indexing pipeline
+        job = self.index_manager.start_job(f"directory:{directory_path}", resume=resume,
+                                           recursive=recursive, force=force)
+        indexed = self.index_manager.add_documents(documents(), job)
+        if prune:
+            self.index_manager.reconcile_directory(directory_path, scanned, recursive, failed_dirs)
+        return indexed
+        
+    def index_directories(self, directory_paths: Iterable[str], workers: int = INDEX_WORKERS,
+                          recursive: bool = True, force: bool = False, prune: bool = True,
+                          resume: bool = True) -> int:
+        """Index several directory roots into the agent's index with ``workers`` processes.
+        
+        Files are sharded across the workers by path hash (see
+        ``ShardedIndexer``); the options mean what they do for
+        ``index_directory``. More than one worker needs the SQLite state
+        backend and the aiXplain index, which several processes can write to.
+        """
+        if not self.index_manager:
+            raise ValueError("Agent not initialized. Call initialize() first.")
+        
+        indexer = ShardedIndexer(
+            name=f"{self.name} Index",
+            description=f"Index for {self.name}'s document collection",
+            agent_id=self.name.replace(" ", "_").lower(),
+            backend=self.retrieval_backend,
+            workers=workers,
+            index_manager=self.index_manager
+        )
+        indexed = indexer.index_directories(list(directory_paths), recursive, force, prune, resume)
+        self.index_manager.last_stats = indexer.last_stats
+        return indexed
+        
+    def watch_directory(self, directory_path: str, recursive: bool = True,
+                        stop_event: Optional[threading.Event] = None, **watcher_options):
+        """Keep a directory's index up to date until ``stop_event`` is set.
+        
+        Runs an initial incremental index, then applies debounced filesystem
+        events as they arrive: created and modified files are re-indexed,
+        deleted or renamed-away files are removed from the index.
+        """
         if not self.index_manager:
             raise ValueError("Agent not initialized. Call initialize() first.")
             
-        # Scan directory for files
-        files = list(self.local_connector.scan_directory(directory_path, recursive))
-        
-        # Prepare documents for indexing
-        documents = []
-        for file_path in files:
-            # Check file size before processing
-            file_size = self.local_connector.get_file_metadata(file_path).get('size', 0)
-            if file_size <= MAX_FILE_SIZE:
-                doc = {
-                    "file_path": file_path,
-                    "size": file_size
-                }
-                if force:
-                    doc["force"] = True
-                documents.append(doc)
-        
-        # Add to index
-        return self.index_manager.add_documents(documents)
-        
-    def index_drive_folder(self, folder_id: str, recursive: bool = True, max_size: int = 10**6) -> int:
-        """Index all supported files in a Google Drive folder, checking size before processing."""
+        watcher = FileWatcher(directory_path, recursive, connector=self.local_connector, **watcher_options)
+        self.index_directory(directory_path, recursive)
+        
+        for batch in watcher.watch(stop_event):
+            try:
+                if batch.rescan:
+                    # The kernel dropped events; fall back to an (incremental) full scan
+                    self.index_directory(directory_path, recursive)
+                    
+                documents = []
+                for file_path in batch.changed:
+                    try:
+                        stats = os.stat(file_path)
+                    except FileNotFoundError:
+                        batch.deleted.add(file_path)
+                        continue
+                    if stats.st_size <= MAX_FILE_SIZE:
+                        documents.append({"file_path": file_path, "size": stats.st_size, "stats": stats})
+                if documents:
+                    self.index_manager.add_documents(documents)
+                    
+                if batch.deleted:
+                    self.index_manager.remove_documents(batch.deleted)
+                for directory in batch.deleted_dirs:
+                    self.index_manager.remove_directory(directory)
+                    
+            except Exception as e:
+                print(f"Error applying filesystem changes: {str(e)}")
+        
+    def index_drive_folder(self, folder_id: str, recursive: bool = True, max_size: int = 10**6,
+                           full: bool = False) -> int:
+        """Index all supported files in a Google Drive folder, checking size before processing.
+        
+        After the first run only files changed since the previous sync are
+        looked at; pass ``full=True`` to crawl the whole folder again.
+        """
         if not self.index_manager:
             raise ValueError("Agent not initialized. Call initialize() first.")
             
         if not self.drive_connector.service:
             raise ValueError("Not authenticated with Google Drive. Call authenticate_drive() first.")
             
-        # Scan Drive folder for files
-        documents = []
-        for file_info in self.drive_connector.scan_folder(folder_id, recursive):
-            try:
-                # Get metadata and check file size before downloading
-                metadata = self.drive_connector.get_file_metadata(file_info['id'])
-                file_size = metadata.get('size', 0)
-                if file_size <= max_size:
-                    documents.append({
-                        "file_id": file_info['id'],
-                        "metadata": metadata
-                    })
-            
-            except Exception as e:
-                print(f"Error processing Drive file {file_info['name']}: {str(e)}")
-                
-        # Add to index
-        return self.index_manager.add_documents(documents)
+        # Index through the authenticated connector
+        self.index_manager.drive_connector = self.drive_connector
+        return self.index_manager.sync_drive_folder(folder_id, recursive, max_size, full=full)
+        
+    def _cached_answer(self, question: str, use_cache: bool, kwargs: Dict[str, Any]) -> Tuple[Optional[str], Any]:
+        """Look a question up in the answer cache, returning ``(index_version, answer)``.
+        
+        Conversational queries (with a session, history or other run options)
+        bypass the cache, signalled by a ``None`` version.
+        """
+        if not use_cache or kwargs or not self.index_manager:
+            return None, None
+        version = self.index_manager.version or ""
+        return version, self.answer_cache.get(question, version)
+        
+    def _with_context(self, question: str) -> str:
+        """Append the question's top ``AGENT_CONTEXT_HITS`` ``IndexManager.search`` hits, when set.
+        
+        The agent's search tool queries the aiXplain index directly, so BM25
+        keyword hits and identifier re-ranking only reach the agent this way.
+        It is off by default: it costs one more index search per question,
+        on top of the tool's own, and makes every prompt longer. Without a
+        keyword index the tool already finds the same hits, and the question
+        is sent as is; with a local backend the hits are the agent's only
+        view of the documents.
+        """
+        manager = self.index_manager
+        if not AGENT_CONTEXT_HITS or not manager or (manager.sparse_index is None and self.retrieval_backend == "aixplain"):
+            return question
+        try:
+            result = manager.search(question, top_k=AGENT_CONTEXT_HITS)
+        except Exception as e:
+            print(f"Error searching documents for query: {str(e)}")
+            return question
+        hits = getattr(result, "details", None)
+        if not isinstance(hits, list) or not hits:
+            return question
+        excerpts = "\n\n".join(f"[{number}] {hit.get('document') or hit.get('id', '')}\n{hit.get('data', '')}"
+                               for number, hit in enumerate(hits[:AGENT_CONTEXT_HITS], 1))
+        return f"{question}\n\nExcerpts from the indexed documents that may help:\n\n{excerpts}"
         
-    def query(self, question: str, **kwargs) -> Dict[str, Any]:
-        """Query the agent with a natural language question."""
+    def query(self, question: str, use_cache: bool = True, **kwargs) -> Dict[str, Any]:
+        """Query the agent with a natural language question.
+        
+        With ``AGENT_CONTEXT_HITS`` set, the question is sent with its hybrid
+        search hits (see ``_with_context``). Answers are reused for repeated questions until the index changes.
+        """
         if not self.agent:
             raise ValueError("Agent not initialized. Call initialize() first.")
             
         try:
-            response = self.agent.run(question, **kwargs)
+            version, answer = self._cached_answer(question, use_cache, kwargs)
+            if answer is not None:
+                return answer
+            response = self.agent.run(self._with_context(question), **kwargs)
+            if version is not None and response.get("status") != "FAILED":
+                self.answer_cache.put(question, version, response["data"])
             return response["data"]
             
         except Exception as e:
@@ -119,6 +277,50 @@ class FileAgent:
                 "error": str(e)
             }
     
+    async def aquery(self, question: str, timeout: Optional[float] = None, use_cache: bool = True,
+                     **kwargs) -> Dict[str, Any]:
+        """Query the agent without blocking the event loop.
+        
+        Queries share a pooled HTTP client and a concurrency limit (see
+        ``AsyncAgentClient``) and the answer cache of ``query``. ``timeout``
+        bounds the whole query; cancelling the awaiting task abandons it.
+        """
+        if not self.agent:
+            raise ValueError("Agent not initialized. Call initialize() first.")
+            
+        try:
+            version, answer = self._cached_answer(question, use_cache, kwargs)
+            if answer is not None:
+                return answer
+            # Searching blocks on the index, so it runs outside the event loop
+            prompt = await asyncio.to_thread(self._with_context, question) if AGENT_CONTEXT_HITS else question
+            answer = await self.async_client.run(self.agent, prompt, timeout=timeout, **kwargs)
+            if version is not None:
+                self.answer_cache.put(question, version, answer)
+            return answer
+            
+        except asyncio.TimeoutError:
+            print(f"Query timed out: {question}")
+            return {
+                "output": "I apologize, but your query took too long to process.",
+                "error": "timeout"
+            }
+        except Exception as e:
+            print(f"Error processing query: {str(e)}")
+            return {
+                "output": "I apologize, but I encountered an error while processing your query.",
+                "error": str(e)
+            }
+            
+    async def aquery_many(self, questions: Iterable[str], timeout: Optional[float] = None,
+                          **kwargs) -> List[Dict[str, Any]]:
+        """Run many queries concurrently, returning their responses in input order."""
+        return await asyncio.gather(*(self.aquery(question, timeout=timeout, **kwargs) for question in questions))
+        
+    async def aclose(self):
+        """Release the pooled connections used by async queries."""
+        await self.async_client.aclose()
+    
     def get_intermediate_steps(self, response: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Get the intermediate steps from an agent response."""
         return response.get("intermediate_steps", [])
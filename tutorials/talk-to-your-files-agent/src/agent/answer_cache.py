@@ -0,0 +1,87 @@
+"""Cache of agent answers keyed by normalized question and index version."""
+
+import math
+import re
+import threading
+from typing import Any, Callable, Optional, Sequence, Tuple
+from ..config.settings import (ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_MAX_BYTES, ANSWER_CACHE_TTL,
+                               ANSWER_CACHE_SIMILARITY)
+from ..utils.cache import LRUCache
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.]+$")
+
+
+def normalize_question(question: str) -> str:
+    """Fold case, whitespace and trailing punctuation so trivially different phrasings share an entry."""
+    return _TRAILING_PUNCTUATION.sub("", _WHITESPACE.sub(" ", question.strip().lower()))
+
+
+def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class AnswerCache:
+    """LRU + TTL cache of agent responses that is emptied whenever the index changes.
+
+    Answers are looked up by normalized question. When an ``embed`` function
+    (text -> vector) is given, a question that misses exactly is also matched
+    against the cached questions by cosine similarity, and the closest answer
+    is returned if it scores at least ``similarity_threshold``. Every lookup
+    passes the current index version (``IndexStorage.last_update``); a new
+    version drops all answers computed against the old index.
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_MAX_ENTRIES, max_bytes: int = ANSWER_CACHE_MAX_BYTES,
+                 ttl: Optional[float] = ANSWER_CACHE_TTL, embed: Optional[Callable[[str], Sequence[float]]] = None,
+                 similarity_threshold: float = ANSWER_CACHE_SIMILARITY):
+        self.entries = LRUCache(max_entries, max_bytes, ttl)
+        self.embed = embed
+        self.similarity_threshold = similarity_threshold
+        self.version = None
+        self._lock = threading.Lock()
+
+    def _check_version(self, version: Optional[str]):
+        with self._lock:
+            if version != self.version:
+                self.entries.clear()
+                self.version = version
+
+    def get(self, question: str, version: Optional[str]) -> Optional[Any]:
+        """Return the cached answer to ``question`` for this index version, or None."""
+        self._check_version(version)
+        key = normalize_question(question)
+        entry = self.entries.get(key)
+        if entry is not None:
+            return entry[1]
+        if not self.embed or not len(self.entries):
+            return None
+
+        vector = self.embed(key)
+        best_score, best_answer = 0.0, None
+        for _, (cached_vector, answer) in self.entries.items():
+            if cached_vector is None:
+                continue
+            score = _cosine(vector, cached_vector)
+            if score > best_score:
+                best_score, best_answer = score, answer
+        if best_score >= self.similarity_threshold:
+            self.entries.hits += 1
+            return best_answer
+        return None
+
+    def put(self, question: str, version: Optional[str], answer: Any):
+        """Cache an answer computed against the given index version."""
+        self._check_version(version)
+        key = normalize_question(question)
+        vector: Optional[Tuple[float, ...]] = tuple(self.embed(key)) if self.embed else None
+        self.entries.put(key, (vector, answer))
+
+    def clear(self):
+        self.entries.clear()
+
+    @property
+    def stats(self) -> dict:
+        return self.entries.stats
@@ -0,0 +1,117 @@
+"""Asyncio client that runs aiXplain agents over one pooled HTTP connection pool."""
+
+import asyncio
+import json
+from typing import Dict, Any, List, Optional
+from ..config.settings import QUERY_MAX_CONCURRENCY, QUERY_MAX_CONNECTIONS, QUERY_TIMEOUT, QUERY_POLL_INTERVAL
+from ..utils.lazy import LazyImport
+
+# Imported on the first async query
+httpx = LazyImport("httpx")
+process_variables = LazyImport("aixplain.modules.agent.utils", "process_variables")
+
+MAX_POLL_INTERVAL = 5.0  # Polling backs off up to this many seconds between requests
+
+
+class AgentRunError(Exception):
+    """Raised when the agent service reports a failed run."""
+
+
+class AsyncAgentClient:
+    """Submits agent runs and polls for their results without blocking the event loop.
+
+    All runs share one ``httpx.AsyncClient`` (keep-alive connection pool) and
+    at most ``max_concurrency`` runs are in flight at once; further calls wait
+    for a slot. Each run is bounded by a timeout that covers queuing for a slot,
+    submission and polling. Cancelling the awaiting task abandons the run
+    locally and frees its slot (the service has no cancel endpoint, so the run
+    itself finishes remotely).
+    """
+
+    def __init__(self, max_concurrency: int = QUERY_MAX_CONCURRENCY,
+                 max_connections: int = QUERY_MAX_CONNECTIONS, timeout: float = QUERY_TIMEOUT,
+                 poll_interval: float = QUERY_POLL_INTERVAL,
+                 transport: Optional["httpx.AsyncBaseTransport"] = None):
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.transport = transport
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_client(self) -> "httpx.AsyncClient":
+        """Create the pooled client and concurrency limit for the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            # Connections and semaphores belong to one loop; a new loop (e.g. a
+            # second asyncio.run) gets a fresh pool
+            self._client = httpx.AsyncClient(
+                transport=self.transport,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                timeout=httpx.Timeout(60.0)
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._client
+
+    async def run(self, agent, question: str, timeout: Optional[float] = None,
+                  session_id: Optional[str] = None, history: Optional[List[Dict]] = None,
+                  max_tokens: int = 4096, max_iterations: int = 5) -> Dict[str, Any]:
+        """Run ``agent`` on a question and return the response data (``output``, ``intermediate_steps``, ...).
+
+        Raises ``asyncio.TimeoutError`` when the run takes longer than ``timeout``
+        seconds (``self.timeout`` by default) and ``AgentRunError`` when it fails.
+        """
+        client = self._ensure_client()
+        return await asyncio.wait_for(
+            self._run(client, agent, question, session_id, history, max_tokens, max_iterations),
+            timeout if timeout is not None else self.timeout
+        )
+
+    async def _run(self, client: "httpx.AsyncClient", agent, question: str, session_id: Optional[str],
+                   history: Optional[List[Dict]], max_tokens: int, max_iterations: int) -> Dict[str, Any]:
+        async with self._semaphore:
+            headers = {"x-api-key": agent.api_key, "Content-Type": "application/json"}
+            payload = {
+                "id": agent.id,
+                "query": process_variables(question, question, {}, agent.instructions),
+                "sessionId": session_id,
+                "history": history,
+                "executionParams": {
+                    "maxTokens": max_tokens,
+                    "maxIterations": max_iterations,
+                    "outputFormat": "text"
+                }
+            }
+            response = await client.post(agent.url, headers=headers, content=json.dumps(payload))
+            response.raise_for_status()
+            poll_url = response.json().get("data")
+            if not poll_url:
+                raise AgentRunError(f"Agent {agent.id} did not return a polling URL")
+
+            wait = self.poll_interval
+            while True:
+                await asyncio.sleep(wait)
+                response = await client.get(poll_url, headers=headers)
+                response.raise_for_status()
+                result = response.json()
+                if result.get("completed"):
+                    if result.get("error_message") or result.get("supplierError"):
+                        raise AgentRunError(result.get("error_message") or result.get("supplierError"))
+                    return result.get("data") or {}
+                wait = min(wait * 1.5, MAX_POLL_INTERVAL)
+
+    async def aclose(self):
+        """Close the pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self) -> "AsyncAgentClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
@@ -1,28 +1,36 @@
-from aixplain.enums import Function, Supplier
-from aixplain.modules.agent.tool.model_tool import ModelTool
+from ..utils.lazy import LazyImport
+
+# The aiXplain SDK is imported when the first tool is created
+Function = LazyImport("aixplain.enums", "Function")
+Supplier = LazyImport("aixplain.enums", "Supplier")
+ModelTool = LazyImport("aixplain.modules.agent.tool.model_tool", "ModelTool")
 
 # Default LLM model for the agent
 DEFAULT_LLM_ID = "6646261c6eb563165658bbb1"  # GPT-4
 
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
 
-# Tool configurations
+# Tool configurations (names of aiXplain Function and Supplier members)
 TOOL_CONFIGS = {
     "speech_synthesis": {
-        "function": Function.SPEECH_SYNTHESIS,
-        "supplier": Supplier.GOOGLE
+        "function": "SPEECH_SYNTHESIS",
+        "supplier": "GOOGLE"
     },
     "translation": {
-        "function": Function.TRANSLATION,
-        "supplier": Supplier.MICROSOFT
+        "function": "TRANSLATION",
+        "supplier": "MICROSOFT"
     },
     "speech_recognition": {
-        "function": Function.SPEECH_RECOGNITION
+        "function": "SPEECH_RECOGNITION"
     }
 }
 
-def create_tool(tool_name: str, **kwargs) -> ModelTool:
+def create_tool(tool_name: str, **kwargs) -> "ModelTool":
     """Create a ModelTool with the specified configuration."""
-    config = TOOL_CONFIGS.get(tool_name, {})
+    config = dict(TOOL_CONFIGS.get(tool_name, {}))
+    if "function" in config:
+        config["function"] = getattr(Function, config["function"])
+    if "supplier" in config:
+        config["supplier"] = getattr(Supplier, config["supplier"])
     config.update(kwargs)
     return ModelTool(**config) 
\ No newline at end of file
@@ -8,10 +8,7 @@ load_dotenv(override=True)
 # Base paths
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 DATA_DIR = BASE_DIR / "data"
-INDEXED_DIR = DATA_DIR / "indexed"
-
-# Create directories if they don't exist
-INDEXED_DIR.mkdir(parents=True, exist_ok=True)
+INDEXED_DIR = DATA_DIR / "indexed"  # Created by the components that write to it
 
 # API Keys and credentials
 AIXPLAIN_API_KEY = os.getenv("AIXPLAIN_API_KEY")
@@ -24,11 +21,67 @@ SUPPORTED_EXTENSIONS = {
     "presentation": [".ppt", ".pptx"],
     "text": [".md", ".json", ".yaml", ".yml", ".html", ".htm"]
 }
+SUPPORTED_EXTENSION_SET = frozenset(ext for exts in SUPPORTED_EXTENSIONS.values() for ext in exts)  # For O(1) lookups
+
+# Directory scan settings
+SCAN_IGNORE_FILES = [".gitignore", ".indexignore"]  # gitignore-style files whose patterns exclude paths from scans
+# Excluded everywhere unless re-included by an ignore file (e.g. "!.git/"). Only VCS and tool metadata,
+# which never holds documents; anything else (build/, node_modules/, ...) goes in .indexignore or in
+# the comma-separated SCAN_IGNORE_PATTERNS environment variable, added to these
+SCAN_IGNORE_PATTERNS = [".git/", ".hg/", ".svn/", "__pycache__/", ".mypy_cache/", ".pytest_cache/"] + [
+    pattern.strip() for pattern in os.getenv("SCAN_IGNORE_PATTERNS", "").split(",") if pattern.strip()
+]
 
 # Indexing settings
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 BATCH_SIZE = 10  # Number of files to process in one batch
+PLAIN_TEXT_EXTENSIONS = frozenset([".txt", ".md", ".json", ".yaml", ".yml", ".csv"])  # Indexed as is, without docling
+TEXT_DECODE_BLOCK_SIZE = 1024 * 1024  # Bytes of a plain-text file read, hashed and decoded at a time
+CONVERSION_WORKERS = int(os.getenv("CONVERSION_WORKERS", "1"))  # Document conversion processes, 1 converts in-process
+CONVERSION_TIMEOUT = 300  # Seconds allowed to convert a single document
+INDEX_WORKERS = int(os.getenv("INDEX_WORKERS", str(os.cpu_count() or 1)))  # Processes sharing a sharded multi-root indexing run
+PIPELINE_QUEUE_SIZE = 32  # Items buffered between indexing pipeline stages
+UPSERT_BATCH_RECORDS = 100  # Flush an upsert once this many records are pending (lowered while the index is slow or failing)
+UPSERT_BATCH_BYTES = 8 * 1024 * 1024  # ...or once pending record content reaches this size
+UPSERT_MIN_BATCH_RECORDS = 10  # Smallest batch the adaptive upsert sizing backs off to
+UPSERT_MAX_IN_FLIGHT = 4  # Upsert requests sent concurrently
+UPSERT_RETRY_BASE_DELAY = 1.0  # First retry of a failed upsert waits up to this many seconds, doubling per attempt
+UPSERT_RETRY_MAX_DELAY = 30.0  # Longest wait between upsert retries
+UPSERT_TARGET_LATENCY = 10.0  # Upserts slower than this many seconds shrink the batch size
+WATCH_DEBOUNCE_SECONDS = 2.0  # Quiet period before a burst of filesystem events is indexed
+WATCH_POLL_INTERVAL = 5.0  # Seconds between scans when inotify is not available
+CHUNK_SIZE = 4000  # Maximum characters per indexed chunk
+CHUNK_OVERLAP = 200  # Characters repeated from the end of the previous chunk
+CONVERSION_CACHE_DIR = DATA_DIR / "cache" / "conversions"  # Content-addressed cache of converted documents
+CONVERSION_CACHE_MAX_BYTES = int(os.getenv("CONVERSION_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))  # 0 disables the cache
+DRIVE_MAX_WORKERS = 8  # Concurrent Google Drive API requests when crawling folders
+DRIVE_DOWNLOAD_CHUNK_SIZE = int(os.getenv("DRIVE_DOWNLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))  # Bytes fetched per Drive download request
+DRIVE_SPOOL_THRESHOLD = int(os.getenv("DRIVE_SPOOL_THRESHOLD", str(16 * 1024 * 1024)))  # Larger downloads spill from memory to disk
+STATE_BACKEND = os.getenv("STATE_BACKEND", "sqlite")  # Index state engine: "sqlite", "journal" or "json"
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "aixplain")  # Where chunks are indexed: "aixplain" or "local" (offline)
+EMBEDDING_DIM = 384  # Dimensions of the built-in offline embeddings used by the local backend
+SEARCH_CACHE_MAX_ENTRIES = 512  # Memoized index search results, 0 disables memoization
+SEARCH_CACHE_TTL = 300  # Seconds a memoized search result is reused
+SEARCH_MAX_WORKERS = 8  # Concurrent index searches in IndexManager.search_many
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"  # Fuse local BM25 keyword hits into remote search results
+RRF_K = 60  # Reciprocal-rank fusion constant; larger values flatten the rank weights
+DELETE_BATCH_SIZE = 500  # Files removed from the index per state commit
+DELETE_MAX_WORKERS = 8  # Concurrent record deletions against the index
+STATE_COMPACT_RATIO = 0.1  # Compact the index state after removing at least this fraction of its files
+
+# Metrics settings
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # Serve indexer metrics (/metrics, /metrics.json) on this port, 0 disables
+METRICS_TRACING = os.getenv("METRICS_TRACING", "false").lower() == "true"  # Record an OpenTelemetry span per indexing stage call
 
 # Agent settings
 DEFAULT_CONTEXT_WINDOW = 2000  # Number of tokens for context window
-MAX_RETRIES = 3  # Maximum number of retries for API calls 
\ No newline at end of file
+MAX_RETRIES = 3  # Maximum number of retries for API calls
+QUERY_MAX_CONCURRENCY = int(os.getenv("QUERY_MAX_CONCURRENCY", "64"))  # Agent runs in flight at once per FileAgent
+QUERY_MAX_CONNECTIONS = 100  # Pooled HTTP connections shared by async queries
+QUERY_TIMEOUT = 300  # Seconds allowed for one async query, including polling
+QUERY_POLL_INTERVAL = 0.5  # Initial wait between polls of a running agent
+AGENT_CONTEXT_HITS = int(os.getenv("AGENT_CONTEXT_HITS", "0"))  # Hybrid search hits sent to the agent with each question (one more search per question), 0 disables
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024"))  # Cached answers per FileAgent, 0 disables the cache
+ANSWER_CACHE_MAX_BYTES = 16 * 1024 * 1024  # Approximate memory limit of the answer cache
+ANSWER_CACHE_TTL = 3600  # Seconds an answer is reused before the agent is asked again
+ANSWER_CACHE_SIMILARITY = 0.95  # Minimum cosine similarity for embedding matches 
\ No newline at end of file
@@ -1,21 +1,27 @@
 import os
-import io
-import hashlib
-from typing import Dict, Any, List, Generator, Optional
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
-from ..config.settings import SUPPORTED_EXTENSIONS
+import tempfile
+from typing import BinaryIO, Dict, Any, List, Generator, Optional, Tuple
+from ..config.settings import SUPPORTED_EXTENSIONS, DRIVE_DOWNLOAD_CHUNK_SIZE, DRIVE_SPOOL_THRESHOLD
+from ..utils.lazy import LazyImport
+from .drive_crawler import DriveCrawler, DRIVE_API_ROOT, FILE_FIELDS
+
+# The Google client libraries are only needed once Drive is used
+build = LazyImport("googleapiclient.discovery", "build")
+MediaIoBaseDownload = LazyImport("googleapiclient.http", "MediaIoBaseDownload")
+Credentials = LazyImport("google.oauth2.credentials", "Credentials")
+Request = LazyImport("google.auth.transport.requests", "Request")
+AuthorizedSession = LazyImport("google.auth.transport.requests", "AuthorizedSession")
+InstalledAppFlow = LazyImport("google_auth_oauthlib.flow", "InstalledAppFlow")
 
 SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
 
 class DriveConnector:
-    def __init__(self):
+    def __init__(self, api_root: str = DRIVE_API_ROOT):
         """Initialize the Google Drive connector."""
         self.credentials = None
         self.service = None
+        self.api_root = api_root
+        self._crawler = None
         
     def authenticate(self, credentials_path: str = None):
         """Authenticate with Google Drive."""
@@ -36,102 +42,103 @@ class DriveConnector:
                     token.write(self.credentials.to_json())
                     
         self.service = build('drive', 'v3', credentials=self.credentials)
+        self._crawler = None
+        
+    @property
+    def crawler(self) -> DriveCrawler:
+        """Concurrent crawler sharing one authorized, pooled HTTP session."""
+        if not self.service:
+            raise ValueError("Not authenticated. Call authenticate() first.")
+        if self._crawler is None:
+            self._crawler = DriveCrawler(AuthorizedSession(self.credentials), api_root=self.api_root)
+        return self._crawler
+        
+    @staticmethod
+    def metadata_from_file(file: Dict[str, Any]) -> Dict[str, Any]:
+        """Build file metadata from a Drive file resource (e.g. an entry of a list response)."""
+        metadata = {
+            'file_id': file['id'],
+            'file_name': file['name'],
+            'file_type': os.path.splitext(file['name'])[1].lower(),
+            'mime_type': file.get('mimeType', ''),
+            'size': int(file.get('size', 0)),
+            'last_modified': file.get('modifiedTime'),
+            'created': file.get('createdTime'),
+            'parents': file.get('parents', [])
+        }
+        # Server-side MD5 of the full content. Google Docs-native files have none,
+        # in which case change detection falls back to size and modifiedTime.
+        if file.get('md5Checksum'):
+            metadata['checksum'] = f"md5:{file['md5Checksum']}"
+        return metadata
         
-    def scan_folder(self, folder_id: str, recursive: bool = True) -> Generator[Dict[str, Any], None, None]:
-        """Scan a Google Drive folder for supported files."""
+    def scan_folder(self, folder_id: str, recursive: bool = True, seen_folders: Optional[set] = None,
+                    failed_folders: Optional[list] = None) -> Generator[Dict[str, Any], None, None]:
+        """Scan a Google Drive folder for supported files.
+        
+        Subfolders are listed concurrently, and each result carries the file's
+        metadata taken from the list response so no per-file call is needed.
+        The IDs of visited and unlistable folders are collected into
+        ``seen_folders`` and ``failed_folders`` when given.
+        """
         if not self.service:
             raise ValueError("Not authenticated. Call authenticate() first.")
             
         try:
-            query = f"'{folder_id}' in parents and trashed = false"
-            page_token = None
-            
-            while True:
-                response = self.service.files().list(
-                    q=query,
-                    spaces='drive',
-                    fields='nextPageToken, files(id, name, mimeType, modifiedTime, size)',
-                    pageToken=page_token
-                ).execute()
-                
-                for file in response.get('files', []):
-                    if file['mimeType'] == 'application/vnd.google-apps.folder' and recursive:
-                        # Recursively scan subfolders
-                        yield from self.scan_folder(file['id'], recursive)
-                    else:
-                        extension = os.path.splitext(file['name'])[1].lower()
-                        if any(extension in exts for exts in SUPPORTED_EXTENSIONS.values()):
-                            yield {
-                                'id': file['id'],
-                                'name': file['name'],
-                                'modified_time': file['modifiedTime'],
-                                'size': file.get('size', 0)
-                            }
-                            
-                page_token = response.get('nextPageToken')
-                if not page_token:
-                    break
+            for file in self.crawler.crawl(folder_id, recursive, seen_folders, failed_folders):
+                yield {
+                    'id': file['id'],
+                    'name': file['name'],
+                    'modified_time': file.get('modifiedTime'),
+                    'size': int(file.get('size', 0)),
+                    'metadata': self.metadata_from_file(file)
+                }
                     
         except Exception as e:
             print(f"Error scanning Drive folder {folder_id}: {str(e)}")
+            if failed_folders is not None:
+                failed_folders.append(folder_id)
             
-    def download_file(self, file_id: str) -> io.BytesIO:
-        """Download a file from Google Drive."""
+    def get_files_metadata(self, file_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get metadata for many Drive files using batched requests."""
         if not self.service:
             raise ValueError("Not authenticated. Call authenticate() first.")
             
         try:
-            request = self.service.files().get_media(fileId=file_id)
-            file_content = io.BytesIO()
-            downloader = MediaIoBaseDownload(file_content, request)
-            
-            done = False
-            while not done:
-                _, done = downloader.next_chunk()
-                
-            file_content.seek(0)
-            return file_content
-            
-        except Exception as e:
-            print(f"Error downloading file {file_id}: {str(e)}")
-            return None
-            
-    def _calculate_file_checksum(self, file_id: str) -> str:
-        """Calculate checksum from the first part of a Drive file for fast comparison."""
-        try:
-            file_content = self.download_partial_file(file_id, bytes_limit=8192)
-            if file_content:
-                hasher = hashlib.md5()
-                hasher.update(file_content.getvalue())
-                return hasher.hexdigest()
-            return ""
+            return {
+                file_id: self.metadata_from_file(file)
+                for file_id, file in self.crawler.get_files(file_ids).items()
+            }
         except Exception as e:
-            print(f"Error calculating checksum for file {file_id}: {str(e)}")
-            return ""
+            print(f"Error getting metadata for Drive files: {str(e)}")
+            return {}
             
-    def download_partial_file(self, file_id: str, bytes_limit: int = 8192) -> Optional[io.BytesIO]:
-        """Download just the first part of a file from Google Drive for checksum calculation."""
+    def download_file(self, file_id: str, chunk_size: int = DRIVE_DOWNLOAD_CHUNK_SIZE,
+                      spool_threshold: int = DRIVE_SPOOL_THRESHOLD) -> Optional[BinaryIO]:
+        """Stream a file from Google Drive into a spooled temporary file.
+        
+        The content is fetched ``chunk_size`` bytes at a time and kept in memory
+        up to ``spool_threshold`` bytes, beyond which it spills to disk. The
+        returned file is positioned at the start; the caller should close it.
+        """
         if not self.service:
             raise ValueError("Not authenticated. Call authenticate() first.")
             
+        file_content = tempfile.SpooledTemporaryFile(max_size=spool_threshold)
         try:
             request = self.service.files().get_media(fileId=file_id)
-            file_content = io.BytesIO()
-            downloader = MediaIoBaseDownload(file_content, request)
+            downloader = MediaIoBaseDownload(file_content, request, chunksize=chunk_size)
             
-            # Download only first chunk
-            _, done = downloader.next_chunk()
+            done = False
+            while not done:
+                _, done = downloader.next_chunk()
+                
             file_content.seek(0)
-            
-            # If the file is larger than bytes_limit, truncate it
-            if file_content.getbuffer().nbytes > bytes_limit:
-                truncated = io.BytesIO(file_content.read(bytes_limit))
-                return truncated
-            
             return file_content
             
         except Exception as e:
-            print(f"Error downloading partial file {file_id}: {str(e)}")
+            file_content.close()
+            print(f"Error downloading file {file_id}: {str(e)}")
             return None
             
     def get_file_metadata(self, file_id: str) -> Dict[str, Any]:
@@ -142,26 +149,19 @@ class DriveConnector:
         try:
             file = self.service.files().get(
                 fileId=file_id,
-                fields='id, name, mimeType, modifiedTime, size, createdTime'
+                fields=FILE_FIELDS,
+                supportsAllDrives=True
             ).execute()
-            
-            # Calculate checksum for files that aren't too large
-            size = int(file.get('size', 0))
-            checksum = ""
-            if size > 0 and size < 10485760:  # Skip files larger than 10MB
-                checksum = self._calculate_file_checksum(file_id)
-            
-            return {
-                'file_id': file['id'],
-                'file_name': file['name'],
-                'file_type': os.path.splitext(file['name'])[1].lower(),
-                'mime_type': file['mimeType'],
-                'size': size,
-                'last_modified': file['modifiedTime'],
-                'created': file['createdTime'],
-                'checksum': checksum  # Add checksum to metadata
-            }
+            return self.metadata_from_file(file)
             
         except Exception as e:
             print(f"Error getting metadata for file {file_id}: {str(e)}")
-            return {} 
\ No newline at end of file
+            return {}
+            
+    def get_start_page_token(self) -> str:
+        """Get the current position in the Drive change log."""
+        return self.crawler.get_start_page_token()
+        
+    def list_changes(self, page_token: str) -> Tuple[List[Dict[str, Any]], str]:
+        """List the changes made since ``page_token`` and the token to resume from next time."""
+        return self.crawler.list_changes(page_token)
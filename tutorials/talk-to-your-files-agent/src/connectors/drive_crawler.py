@@ -0,0 +1,243 @@
+"""Concurrent Google Drive crawler built on the Drive v3 REST API.
+
+``DriveCrawler`` lists folders in parallel over one shared, pooled HTTP
+session, batches ``files.get`` calls through the Drive batch endpoint and
+retries rate-limited requests with exponential backoff. It talks plain HTTP
+(any ``requests.Session``, e.g. ``google.auth.transport.requests.AuthorizedSession``)
+so it can be pointed at a local fake of the Drive API in tests.
+"""
+
+import json
+import os
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode
+from ..config.settings import SUPPORTED_EXTENSION_SET, MAX_RETRIES, DRIVE_MAX_WORKERS
+from ..utils.lazy import LazyImport
+from ..utils.logging_config import get_logger
+
+# requests is only needed once a crawler is created, i.e. once Drive is used
+HTTPAdapter = LazyImport("requests.adapters", "HTTPAdapter")
+
+logger = get_logger('drive_crawler')
+
+DRIVE_API_ROOT = "https://www.googleapis.com"
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+FILE_FIELDS = "id, name, mimeType, modifiedTime, createdTime, size, md5Checksum, parents"
+LIST_PAGE_SIZE = 1000
+CHANGES_PAGE_SIZE = 1000
+BATCH_LIMIT = 100  # Maximum calls per Drive batch request
+
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+_RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+
+class DriveRateLimitError(Exception):
+    """Raised when a request is still rate limited after all retries."""
+
+
+def _is_retryable(status: int, body: str) -> bool:
+    if status in _RETRY_STATUS:
+        return True
+    return status == 403 and any(reason in body for reason in _RATE_LIMIT_REASONS)
+
+
+def _backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Exponential backoff with full jitter, honouring Retry-After when present."""
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return random.uniform(0, min(32.0, 0.5 * 2 ** attempt))
+
+
+def is_supported_name(name: str) -> bool:
+    """Check a Drive file name against the supported extensions."""
+    extension = os.path.splitext(name)[1].lower()
+    return extension in SUPPORTED_EXTENSION_SET
+
+
+class DriveCrawler:
+    def __init__(self, session: "requests.Session", api_root: str = DRIVE_API_ROOT,
+                 max_workers: int = DRIVE_MAX_WORKERS, max_retries: int = MAX_RETRIES):
+        """Initialize the crawler on a shared HTTP session."""
+        self.session = session
+        self.api_root = api_root.rstrip("/")
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        # Let every worker thread keep its own pooled connection
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _request(self, method: str, path: str, **kwargs) -> "requests.Response":
+        """Send a request, retrying rate limits and transient server errors."""
+        url = f"{self.api_root}{path}"
+        for attempt in range(self.max_retries + 1):
+            response = self.session.request(method, url, timeout=60, **kwargs)
+            if not _is_retryable(response.status_code, response.text):
+                response.raise_for_status()
+                return response
+            if attempt == self.max_retries:
+                break
+            delay = _backoff_delay(attempt, response.headers.get("Retry-After"))
+            logger.debug(f"Drive API returned {response.status_code}, retrying in {delay:.2f}s")
+            time.sleep(delay)
+        raise DriveRateLimitError(f"{method} {path} still failing after {self.max_retries} retries "
+                                  f"(HTTP {response.status_code})")
+
+    def list_folder(self, folder_id: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """List all pages of a folder, returning ``(files, subfolder_ids)``."""
+        files, folders = [], []
+        page_token = None
+        while True:
+            params = {
+                "q": f"'{folder_id}' in parents and trashed = false",
+                "spaces": "drive",
+                "fields": f"nextPageToken, files({FILE_FIELDS})",
+                "pageSize": LIST_PAGE_SIZE,
+                "supportsAllDrives": "true",
+                "includeItemsFromAllDrives": "true",
+            }
+            if page_token:
+                params["pageToken"] = page_token
+            response = self._request("GET", "/drive/v3/files", params=params).json()
+            for file in response.get("files", []):
+                if file.get("mimeType") == FOLDER_MIME_TYPE:
+                    folders.append(file["id"])
+                else:
+                    files.append(file)
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                return files, folders
+
+    def crawl(self, folder_id: str, recursive: bool = True, seen_folders: Optional[set] = None,
+              failed_folders: Optional[list] = None) -> Iterator[Dict[str, Any]]:
+        """Yield every supported file below a folder, listing folders concurrently.
+
+        ``seen_folders`` (if given) is filled with the IDs of all folders visited,
+        and ``failed_folders`` with those that could not be listed.
+        """
+        seen_folders = seen_folders if seen_folders is not None else set()
+        seen_folders.add(folder_id)
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="drive-crawl") as executor:
+            in_flight = {executor.submit(self.list_folder, folder_id): folder_id}
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    current = in_flight.pop(future)
+                    try:
+                        files, subfolders = future.result()
+                    except Exception as e:
+                        logger.error(f"Error scanning Drive folder {current}: {e}")
+                        if failed_folders is not None:
+                            failed_folders.append(current)
+                        continue
+                    if recursive:
+                        for subfolder in subfolders:
+                            if subfolder not in seen_folders:
+                                seen_folders.add(subfolder)
+                                in_flight[executor.submit(self.list_folder, subfolder)] = subfolder
+                    for file in files:
+                        if is_supported_name(file.get("name", "")):
+                            yield file
+
+    def get_start_page_token(self) -> str:
+        """Get the token marking "now" in the Drive change log."""
+        response = self._request("GET", "/drive/v3/changes/startPageToken",
+                                 params={"supportsAllDrives": "true"}).json()
+        return response["startPageToken"]
+
+    def list_changes(self, page_token: str) -> Tuple[List[Dict[str, Any]], str]:
+        """List every change since ``page_token``.
+
+        Returns ``(changes, new_start_page_token)``; each change has ``fileId``,
+        ``removed`` and (unless removed) the ``file`` resource with its current
+        ``md5Checksum``, ``parents`` and ``trashed`` flag.
+        """
+        changes = []
+        while True:
+            params = {
+                "pageToken": page_token,
+                "fields": f"nextPageToken, newStartPageToken, changes(fileId, removed, file({FILE_FIELDS}, trashed))",
+                "pageSize": CHANGES_PAGE_SIZE,
+                "includeRemoved": "true",
+                "spaces": "drive",
+                "supportsAllDrives": "true",
+                "includeItemsFromAllDrives": "true",
+            }
+            response = self._request("GET", "/drive/v3/changes", params=params).json()
+            changes.extend(response.get("changes", []))
+            if "newStartPageToken" in response:
+                return changes, response["newStartPageToken"]
+            page_token = response["nextPageToken"]
+
+    def get_files(self, file_ids: Iterable[str], fields: str = FILE_FIELDS) -> Dict[str, Dict[str, Any]]:
+        """Fetch file resources for many IDs using Drive batch requests."""
+        results: Dict[str, Dict[str, Any]] = {}
+        file_ids = list(dict.fromkeys(file_ids))
+        chunks = [file_ids[i:i + BATCH_LIMIT] for i in range(0, len(file_ids), BATCH_LIMIT)]
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="drive-batch") as executor:
+            for chunk_results in executor.map(lambda chunk: self._get_batch(chunk, fields), chunks):
+                results.update(chunk_results)
+        return results
+
+    def _get_batch(self, file_ids: List[str], fields: str) -> Dict[str, Dict[str, Any]]:
+        """Run one batch of ``files.get`` calls, retrying the items that were rate limited."""
+        results = {}
+        remaining = list(file_ids)
+        for attempt in range(self.max_retries + 1):
+            boundary = f"batch_{random.getrandbits(64):016x}"
+            parts = []
+            for index, file_id in enumerate(remaining):
+                query = urlencode({"fields": fields, "supportsAllDrives": "true"})
+                parts.append(
+                    f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <item{index}>\r\n\r\n"
+                    f"GET /drive/v3/files/{file_id}?{query}\r\n\r\n"
+                )
+            body = "".join(parts) + f"--{boundary}--\r\n"
+            response = self._request(
+                "POST", "/batch/drive/v3", data=body.encode("utf-8"),
+                headers={"Content-Type": f"multipart/mixed; boundary={boundary}"}
+            )
+            retry = []
+            for index, status, payload in _parse_batch_response(response):
+                file_id = remaining[index]
+                if status == 200:
+                    results[file_id] = json.loads(payload)
+                elif _is_retryable(status, payload):
+                    retry.append(file_id)
+                else:
+                    logger.warning(f"Drive files.get failed for {file_id}: HTTP {status}")
+            if not retry:
+                return results
+            remaining = retry
+            if attempt < self.max_retries:
+                time.sleep(_backoff_delay(attempt))
+        logger.error(f"Giving up on {len(remaining)} rate limited Drive files.get calls")
+        return results
+
+
+_BOUNDARY = re.compile(r'boundary="?([^";]+)"?')
+_CONTENT_ID = re.compile(r"Content-ID:\s*<response-item(\d+)>", re.IGNORECASE)
+_STATUS_LINE = re.compile(r"HTTP/[\d.]+\s+(\d{3})")
+
+
+def _parse_batch_response(response: "requests.Response") -> Iterator[Tuple[int, int, str]]:
+    """Yield ``(item_index, status, body)`` for each part of a multipart batch response."""
+    match = _BOUNDARY.search(response.headers.get("Content-Type", ""))
+    if not match:
+        raise ValueError("Drive batch response has no multipart boundary")
+    for part in response.text.split(f"--{match.group(1)}"):
+        content_id = _CONTENT_ID.search(part)
+        status = _STATUS_LINE.search(part)
+        if not content_id or not status:
+            continue
+        # The embedded HTTP response's body follows the first blank line after its status line
+        http_response = part[status.start():].replace("\r\n", "\n")
+        _, _, payload = http_response.partition("\n\n")
+        yield int(content_id.group(1)), int(status.group(1)), payload.strip()
@@ -0,0 +1,264 @@
+"""Filesystem watching for continuous incremental indexing.
+
+``FileWatcher`` turns raw filesystem events into debounced ``ChangeBatch``
+objects. On Linux it uses inotify directly through ctypes; elsewhere (or when
+inotify is unavailable) it falls back to polling stat snapshots.
+"""
+
+import os
+import sys
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+from pathlib import Path
+from time import monotonic
+from typing import Dict, Iterator, Optional, Set, Tuple
+from .local_connector import LocalConnector
+from .ignore_rules import IgnoreMatcher
+from ..config.settings import WATCH_DEBOUNCE_SECONDS, WATCH_POLL_INTERVAL
+from ..utils.hashing import stat_signature
+from ..utils.logging_config import get_logger
+
+logger = get_logger('watcher')
+
+# inotify event flags (from <sys/inotify.h>)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class ChangeBatch:
+    """A coalesced set of filesystem changes ready to be applied to the index."""
+
+    def __init__(self):
+        self.changed: Set[str] = set()
+        self.deleted: Set[str] = set()
+        self.deleted_dirs: Set[str] = set()
+        self.rescan = False
+
+    def __bool__(self) -> bool:
+        return bool(self.changed or self.deleted or self.deleted_dirs or self.rescan)
+
+    def __repr__(self) -> str:
+        return (f"ChangeBatch(changed={len(self.changed)}, deleted={len(self.deleted)}, "
+                f"deleted_dirs={len(self.deleted_dirs)}, rescan={self.rescan})")
+
+
+class _InotifyBackend:
+    """Recursive inotify watch on a directory tree."""
+
+    def __init__(self, directory: str, recursive: bool, connector: LocalConnector, ignore: IgnoreMatcher):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.recursive = recursive
+        self.connector = connector
+        self.ignore = ignore
+        self.watches: Dict[int, str] = {}
+        self._add_tree(directory)
+
+    def _add_watch(self, directory: str):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            logger.warning(f"Cannot watch {directory}: {os.strerror(errno)}")
+            return
+        self.watches[wd] = directory
+
+    def _add_tree(self, directory: str):
+        if not self.recursive:
+            self._add_watch(directory)
+            return
+        # Ignored directories (.git, __pycache__, ...) are neither walked nor watched
+        for subdirectory in self.connector.walk_directories(directory, self.ignore):
+            self._add_watch(subdirectory)
+
+    def read(self, timeout: float, stop_event: threading.Event) -> Iterator[Tuple[str, str, bool]]:
+        """Yield ``(kind, path, is_dir)`` events available within ``timeout`` seconds."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return
+        try:
+            data = os.read(self.fd, 256 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, name_length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + name_length].rstrip(b"\0")
+            offset += name_length
+
+            if mask & IN_Q_OVERFLOW:
+                yield "overflow", "", False
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+            path = os.path.join(directory, os.fsdecode(name)) if name else directory
+            is_dir = bool(mask & IN_ISDIR)
+
+            if mask & (IN_DELETE | IN_MOVED_FROM):
+                yield "deleted", path, is_dir
+            elif mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                yield "deleted", directory, True
+            elif is_dir and mask & (IN_CREATE | IN_MOVED_TO):
+                if self.recursive and not self.ignore.is_ignored(path, True):
+                    self._add_tree(path)
+                    yield "created_dir", path, True
+            elif not is_dir:
+                yield "changed", path, False
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _PollingBackend:
+    """Fallback that diffs stat snapshots of the tree every ``interval`` seconds."""
+
+    def __init__(self, directory: str, recursive: bool, connector: LocalConnector, interval: float):
+        self.directory = directory
+        self.recursive = recursive
+        self.connector = connector
+        self.interval = interval
+        self.snapshot = self._take_snapshot()
+        self._next_poll = monotonic() + interval
+
+    def _take_snapshot(self) -> Dict[str, tuple]:
+        return {
+            path: tuple(stat_signature(stats).values())
+            for path, stats in self.connector.scan_directory_entries(self.directory, self.recursive)
+        }
+
+    def read(self, timeout: float, stop_event: threading.Event) -> Iterator[Tuple[str, str, bool]]:
+        # Waiting on the watcher's stop event lets stop() interrupt the wait for the next poll
+        wait_for = self._next_poll - monotonic()
+        if wait_for > timeout:
+            stop_event.wait(timeout)
+            return
+        if stop_event.wait(max(0.0, wait_for)):
+            return
+        self._next_poll = monotonic() + self.interval
+
+        current = self._take_snapshot()
+        for path, signature in current.items():
+            if self.snapshot.get(path) != signature:
+                yield "changed", path, False
+        for path in self.snapshot.keys() - current.keys():
+            yield "deleted", path, False
+        self.snapshot = current
+
+    def close(self):
+        pass
+
+
+class FileWatcher:
+    """Watches a directory and yields debounced batches of changes.
+
+    Events are collected until the tree has been quiet for ``debounce``
+    seconds (or ``max_latency`` has passed since the first pending event),
+    then coalesced by final state: a path that still exists is reported as
+    changed, anything that is gone as deleted. A burst of writes to one file
+    therefore results in a single re-index, and a rename shows up as a delete
+    of the old path plus a change of the new one.
+    """
+
+    def __init__(self, directory: str, recursive: bool = True, debounce: float = WATCH_DEBOUNCE_SECONDS,
+                 max_latency: Optional[float] = None, poll_interval: float = WATCH_POLL_INTERVAL,
+                 backend: str = "auto", connector: Optional[LocalConnector] = None):
+        self.directory = str(Path(directory))
+        self.recursive = recursive
+        self.debounce = debounce
+        self.max_latency = max_latency if max_latency is not None else debounce * 5
+        self.connector = connector or LocalConnector()
+        self.ignore = IgnoreMatcher(self.directory)
+        self.backend = self._create_backend(backend, poll_interval)
+
+    def _create_backend(self, backend: str, poll_interval: float):
+        if backend in ("auto", "inotify") and sys.platform.startswith("linux"):
+            try:
+                watcher = _InotifyBackend(self.directory, self.recursive, self.connector, self.ignore)
+                logger.info(f"Watching {self.directory} with inotify ({len(watcher.watches)} directories)")
+                return watcher
+            except (OSError, AttributeError) as e:
+                if backend == "inotify":
+                    raise
+                logger.warning(f"inotify unavailable ({e}), falling back to polling")
+        elif backend == "inotify":
+            raise ValueError("inotify is only available on Linux")
+        elif backend not in ("auto", "polling"):
+            raise ValueError(f"Unknown watcher backend: {backend}")
+        logger.info(f"Watching {self.directory} by polling every {poll_interval}s")
+        return _PollingBackend(self.directory, self.recursive, self.connector, poll_interval)
+
+    def _is_relevant(self, path: str) -> bool:
+        return self.connector._is_supported_file(Path(path)) and not self.ignore.is_ignored(path)
+
+    def watch(self, stop_event: Optional[threading.Event] = None) -> Iterator[ChangeBatch]:
+        """Yield change batches until ``stop_event`` is set."""
+        stop_event = stop_event or threading.Event()
+        pending: Set[str] = set()
+        pending_dirs: Set[str] = set()
+        overflow = False
+        first_event = last_event = None
+        try:
+            while not stop_event.is_set():
+                for kind, path, is_dir in self.backend.read(timeout=min(self.debounce, 0.5), stop_event=stop_event):
+                    now = monotonic()
+                    first_event = first_event or now
+                    last_event = now
+                    if kind == "overflow":
+                        overflow = True
+                    elif kind == "created_dir":
+                        # Files moved in together with a directory produce no events of their own
+                        pending.update(self.connector.scan_directory(path, self.recursive, self.ignore))
+                    elif self.ignore.is_ignore_file(path):
+                        # Rules changed; they apply to new events (and to the next full scan)
+                        self.ignore.invalidate()
+                    elif is_dir:
+                        pending_dirs.add(path)
+                    elif self._is_relevant(path):
+                        pending.add(path)
+
+                if first_event is None:
+                    continue
+                now = monotonic()
+                if now - last_event < self.debounce and now - first_event < self.max_latency:
+                    continue
+
+                batch = ChangeBatch()
+                batch.rescan = overflow
+                for path in pending:
+                    if os.path.isfile(path):
+                        batch.changed.add(path)
+                    else:
+                        batch.deleted.add(path)
+                batch.deleted_dirs = {path for path in pending_dirs if not os.path.isdir(path)}
+                pending, pending_dirs, overflow = set(), set(), False
+                first_event = last_event = None
+                if batch:
+                    logger.debug(f"Filesystem changes: {batch}")
+                    yield batch
+        finally:
+            self.backend.close()
@@ -0,0 +1,188 @@
+"""gitignore-style rules that exclude paths from directory scans."""
+
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from ..config.settings import SCAN_IGNORE_FILES, SCAN_IGNORE_PATTERNS
+
+
+def _translate(pattern: str) -> str:
+    """Translate a gitignore glob (without its anchoring slash) into a regex."""
+    out, i, n = [], 0, len(pattern)
+    while i < n:
+        at_segment_start = i == 0 or pattern[i - 1] == "/"
+        if at_segment_start and pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif at_segment_start and pattern.startswith("**", i) and i + 2 == n:
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and pattern.find("]", i + 2) != -1:
+            end = pattern.find("]", i + 2)
+            content = pattern[i + 1:end]
+            if content.startswith("!"):
+                content = "^" + content[1:]
+            out.append("[" + content.replace("\\", "\\\\") + "]")
+            i = end + 1
+        elif pattern[i] == "\\" and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(out)
+
+
+def compile_pattern(line: str) -> Optional[Tuple["re.Pattern[str]", bool, bool]]:
+    """Compile one ignore file line into ``(regex, negate, directory_only)``.
+
+    Follows gitignore: blank lines and ``#`` comments are skipped, ``!``
+    re-includes, a trailing ``/`` only matches directories, and a pattern
+    with a slash before its end is anchored to the ignore file's directory
+    while one without matches at any depth.
+    """
+    line = line.rstrip("\n\r")
+    if not line.endswith("\\ "):
+        line = line.rstrip()
+    if not line or line.startswith("#"):
+        return None
+    negate = line.startswith("!")
+    if negate:
+        line = line[1:]
+    elif line.startswith("\\"):
+        line = line[1:]
+    directory_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+    anchored = "/" in line
+    regex = _translate(line.lstrip("/"))
+    if not anchored:
+        regex = "(?:.*/)?" + regex
+    return re.compile(regex + r"\Z"), negate, directory_only
+
+
+class IgnoreRules:
+    """The patterns of one ignore file, matched against paths below its directory."""
+
+    def __init__(self, patterns: Iterable[str], base: str):
+        self.base = base
+        self._offset = len(base) + 1
+        self.rules = [rule for rule in map(compile_pattern, patterns) if rule]
+        self._any_negation = any(negate for _, negate, _ in self.rules)
+        if not self._any_negation:
+            # Without re-includes any match ignores, so one combined regex per kind will do
+            self._files = self._combine(rule for rule in self.rules if not rule[2])
+            self._dirs = self._combine(self.rules)
+
+    @staticmethod
+    def _combine(rules) -> Optional["re.Pattern[str]"]:
+        patterns = [regex.pattern for regex, _, _ in rules]
+        return re.compile("|".join(f"(?:{pattern})" for pattern in patterns)) if patterns else None
+
+    def __bool__(self) -> bool:
+        return bool(self.rules)
+
+    def match(self, path: str, is_dir: bool) -> Optional[bool]:
+        """True if ``path`` is ignored, False if it is re-included, None if no rule matches."""
+        relative = path[self._offset:]
+        if os.sep != "/":
+            relative = relative.replace(os.sep, "/")
+        if not self._any_negation:
+            combined = self._dirs if is_dir else self._files
+            return True if combined is not None and combined.match(relative) else None
+        for regex, negate, directory_only in reversed(self.rules):
+            if (is_dir or not directory_only) and regex.match(relative):
+                return not negate
+        return None
+
+
+class IgnoreMatcher:
+    """Decides which paths under ``root`` are excluded from scans.
+
+    ``SCAN_IGNORE_PATTERNS`` apply everywhere below ``root``; the ignore files
+    named in ``ignore_files`` (``.gitignore``, ``.indexignore``) add rules for
+    their directory and everything below it, deeper files taking precedence,
+    as in git. Paths inside an ignored directory are always ignored.
+    """
+
+    def __init__(self, root: str, ignore_files: Sequence[str] = SCAN_IGNORE_FILES,
+                 patterns: Sequence[str] = SCAN_IGNORE_PATTERNS):
+        # Paths are compared as strings, in the form the scanner and watcher build them
+        self.root = str(Path(root))
+        self.ignore_files = tuple(ignore_files)
+        self._ignore_file_names = frozenset(ignore_files)
+        self._default = IgnoreRules(patterns, self.root)
+        self._rules: Dict[str, Tuple[IgnoreRules, ...]] = {}
+
+    def is_ignore_file(self, path: str) -> bool:
+        return os.path.basename(path) in self._ignore_file_names
+
+    def extend(self, directory: str, rules: Tuple[IgnoreRules, ...],
+               names: Optional[Iterable[str]] = None) -> Tuple[IgnoreRules, ...]:
+        """The rules in effect inside ``directory``: ``rules`` plus its own ignore files.
+
+        ``names`` are the directory's entries when the caller has listed it,
+        which saves trying to open ignore files that do not exist.
+        """
+        if names is None:
+            present = self.ignore_files
+        else:
+            names = set(names)
+            present = [name for name in self.ignore_files if name in names]
+        for name in present:
+            try:
+                with open(os.path.join(directory, name), encoding="utf-8", errors="replace") as f:
+                    own = IgnoreRules(f.readlines(), directory)
+            except OSError:
+                continue
+            if own:
+                rules = rules + (own,)
+        return rules
+
+    def rules_for(self, directory: str) -> Tuple[IgnoreRules, ...]:
+        """The rules in effect inside a directory under ``root`` (cached)."""
+        rules = self._rules.get(directory)
+        if rules is None:
+            rules = self._rules[directory] = self.extend(directory, self.inherited(directory))
+        return rules
+
+    def inherited(self, directory: str) -> Tuple[IgnoreRules, ...]:
+        """The rules a directory inherits from its parents (the default patterns for ``root``)."""
+        if directory == self.root or not directory.startswith(self.root + os.sep):
+            return (self._default,) if self._default else ()
+        return self.rules_for(os.path.dirname(directory))
+
+    @staticmethod
+    def matches(rules: Tuple[IgnoreRules, ...], path: str, is_dir: bool) -> bool:
+        """Whether ``rules`` ignore ``path`` itself (its parents are not checked)."""
+        for rule_set in reversed(rules):
+            decision = rule_set.match(path, is_dir)
+            if decision is not None:
+                return decision
+        return False
+
+    def is_ignored(self, path: str, is_dir: bool = False) -> bool:
+        """Whether a path under ``root`` is excluded, including by an ignored parent directory."""
+        if not path.startswith(self.root + os.sep):
+            return False
+        parents: List[str] = []
+        parent = os.path.dirname(path)
+        while parent != self.root and parent.startswith(self.root + os.sep):
+            parents.append(parent)
+            parent = os.path.dirname(parent)
+        for directory in reversed(parents):
+            if self.matches(self.rules_for(os.path.dirname(directory)), directory, True):
+                return True
+        return self.matches(self.rules_for(os.path.dirname(path)), path, is_dir)
+
+    def invalidate(self):
+        """Forget cached rules, e.g. after an ignore file changed."""
+        self._rules.clear()
@@ -1,8 +1,12 @@
 import os
-import hashlib
 from pathlib import Path
-from typing import List, Generator
-from ..config.settings import SUPPORTED_EXTENSIONS
+from time import perf_counter
+from typing import Callable, List, Generator, Optional, Tuple, Union
+from .ignore_rules import IgnoreMatcher
+from ..config.settings import SUPPORTED_EXTENSION_SET
+from ..utils.hashing import hash_file, stat_signature, reusable_checksum
+from ..utils.text_file import TextFile
+from ..utils.metrics import metrics
 
 class LocalConnector:
     def __init__(self):
@@ -10,11 +14,38 @@ class LocalConnector:
         
     def _is_supported_file(self, file_path: Path) -> bool:
         """Check if the file type is supported."""
-        extension = file_path.suffix.lower()
-        return any(extension in exts for exts in SUPPORTED_EXTENSIONS.values())
+        return file_path.suffix.lower() in SUPPORTED_EXTENSION_SET
     
-    def scan_directory(self, directory_path: str, recursive: bool = True) -> Generator[str, None, None]:
+    def _ignore_matcher(self, root: str, ignore: Union[bool, IgnoreMatcher]) -> Optional[IgnoreMatcher]:
+        if isinstance(ignore, IgnoreMatcher):
+            return ignore
+        return IgnoreMatcher(root) if ignore else None
+    
+    def scan_directory(self, directory_path: str, recursive: bool = True,
+                       ignore: Union[bool, IgnoreMatcher] = True) -> Generator[str, None, None]:
         """Scan a directory for supported files."""
+        for file_path, _ in self.scan_directory_entries(directory_path, recursive, ignore=ignore):
+            yield file_path
+            
+    def scan_directory_entries(self, directory_path: str, recursive: bool = True,
+                               failed_dirs: Optional[List[str]] = None,
+                               ignore: Union[bool, IgnoreMatcher] = True,
+                               select: Optional[Callable[[str], bool]] = None) -> Generator[Tuple[str, os.stat_result], None, None]:
+        """Scan a directory for supported files, yielding each path with its stat result.
+        
+        Uses ``os.scandir`` so the stat comes from the directory entry and no
+        file is opened; callers can compare it against the stored state to
+        decide which files need a closer look. Directories excluded by
+        ``SCAN_IGNORE_PATTERNS`` or by ``.gitignore``-style ignore files are
+        pruned before they are entered; ``ignore=False`` scans everything, and
+        an ``IgnoreMatcher`` applies the rules of an enclosing root. Without
+        ``recursive`` only the directory's own files are listed. Directories
+        that could not be read are appended to ``failed_dirs``, since their
+        files may still exist. With ``select``, only the files whose path it
+        accepts are stat'ed and yielded (e.g. one shard of the tree). Listing
+        time per directory is reported as the ``scan`` stage and each stat as
+        ``stat``; time spent by the caller between items is not counted.
+        """
         try:
             directory = Path(directory_path)
             if not directory.exists():
@@ -23,49 +54,105 @@ class LocalConnector:
             if not directory.is_dir():
                 raise ValueError(f"Path is not a directory: {directory_path}")
             
-            # Walk through directory
-            for root, _, files in os.walk(directory):
-                if not recursive and root != str(directory):
-                    continue
-                    
-                for file in files:
-                    file_path = Path(root) / file
-                    if self._is_supported_file(file_path):
-                        yield str(file_path)
+            root = str(directory)
+            matcher = self._ignore_matcher(root, ignore)
+            pending = [(root, matcher.inherited(root) if matcher else ())]
+            while pending:
+                current, rules = pending.pop()
+                started, paused = perf_counter(), 0.0
+                try:
+                    with os.scandir(current) as listing:
+                        entries = list(listing)
+                    if matcher:
+                        rules = matcher.extend(current, rules, (entry.name for entry in entries))
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            # Excluded directories are pruned without being listed
+                            if recursive and not (rules and matcher.matches(rules, entry.path, True)):
+                                pending.append((entry.path, rules))
+                            continue
+                        file_type = os.path.splitext(entry.name)[1].lower()
+                        if (file_type in SUPPORTED_EXTENSION_SET and (select is None or select(entry.path))
+                                and entry.is_file()
+                                and not (rules and matcher.matches(rules, entry.path, False))):
+                            stat_started = perf_counter()
+                            stats = entry.stat()
+                            metrics.observe("stat", perf_counter() - stat_started, file_type)
+                            yield entry.path, stats
+                            paused += perf_counter() - stat_started
+                    metrics.observe("scan", perf_counter() - started - paused)
+                except OSError as e:
+                    print(f"Error scanning directory {current}: {str(e)}")
+                    if failed_dirs is not None:
+                        failed_dirs.append(current)
                         
         except Exception as e:
             print(f"Error scanning directory {directory_path}: {str(e)}")
+            if failed_dirs is not None:
+                failed_dirs.append(str(directory_path))
+                
+    def walk_directories(self, directory_path: str,
+                         ignore: Union[bool, IgnoreMatcher] = True) -> Generator[str, None, None]:
+        """Yield a directory and every subdirectory a recursive scan would enter."""
+        root = str(Path(directory_path))
+        matcher = self._ignore_matcher(root, ignore)
+        pending = [(root, matcher.inherited(root) if matcher else ())]
+        while pending:
+            current, rules = pending.pop()
+            yield current
+            try:
+                with os.scandir(current) as listing:
+                    entries = list(listing)
+            except OSError as e:
+                print(f"Error scanning directory {current}: {str(e)}")
+                continue
+            if matcher:
+                rules = matcher.extend(current, rules, (entry.name for entry in entries))
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False) and not (rules and matcher.matches(rules, entry.path, True)):
+                    pending.append((entry.path, rules))
             
     def get_file_content(self, file_path: str) -> str:
-        """Read the content of a file."""
+        """Read the content of a file as text."""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
+            with TextFile(file_path) as text:
+                return text.read()
         except Exception as e:
             print(f"Error reading file {file_path}: {str(e)}")
             return ""
     
     def _calculate_file_checksum(self, file_path: Path) -> str:
-        """Calculate checksum from the first part of a file for fast comparison."""
+        """Calculate a fast non-cryptographic checksum over the full file content."""
         try:
-            hasher = hashlib.md5()
-            with open(file_path, 'rb') as f:
-                # Read only first 8KB of file for fast comparison
-                chunk = f.read(8192)
-                hasher.update(chunk)
-            return hasher.hexdigest()
+            return hash_file(file_path)
         except Exception as e:
             print(f"Error calculating checksum for {file_path}: {str(e)}")
             return ""
             
-    def get_file_metadata(self, file_path: str) -> dict:
-        """Get metadata for a file."""
+    def get_file_metadata(self, file_path: str, previous: Optional[dict] = None,
+                          stats: Optional[os.stat_result] = None, text: Optional[TextFile] = None) -> dict:
+        """Get metadata for a file.
+        
+        ``previous`` is the metadata stored by the last indexing run; when the
+        file's size, mtime and inode all still match it, its checksum is reused
+        instead of re-reading the file. ``stats`` avoids a second stat call when
+        the caller already has one (e.g. from ``scan_directory_entries``), and
+        ``text``, the file already opened as a ``TextFile``, provides the stat
+        so the file is not opened again; its checksum is left as ``None`` (unless
+        reused) for whoever decodes the text, which hashes it in the same read.
+        """
         path = Path(file_path)
         try:
-            stats = path.stat()
+            if text is not None:
+                stats = text.stats
+            elif stats is None:
+                with metrics.stage("stat", path.suffix.lower()):
+                    stats = path.stat()
             
-            # Calculate checksum from first 8KB of file (fast yet reasonably accurate)
-            checksum = self._calculate_file_checksum(path)
+            checksum = reusable_checksum(stats, previous)
+            if checksum is None and text is None:
+                with metrics.stage("hash", path.suffix.lower(), stats.st_size):
+                    checksum = self._calculate_file_checksum(path)
             
             return {
                 "file_path": str(path),
@@ -74,6 +161,7 @@ class LocalConnector:
                 "size": stats.st_size,
                 "last_modified": stats.st_mtime,
                 "created": stats.st_ctime,
+                **stat_signature(stats),
                 "checksum": checksum  # Add checksum to metadata
             }
         except Exception as e:
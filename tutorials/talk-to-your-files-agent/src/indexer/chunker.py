@@ -0,0 +1,150 @@
+"""Markdown-aware chunking of extracted document content."""
+
+import re
+from typing import List, Dict, Any, Iterable, Iterator, Tuple, Union
+from ..config.settings import CHUNK_SIZE, CHUNK_OVERLAP
+from ..utils.hashing import hash_buffer
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+_FENCE = re.compile(r"^(```|~~~)")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# Joins the blocks of a chunk, and the overlap tail to the first block after it
+_SEPARATOR = "\n\n"
+
+
+def chunk_id(key: str, index: int) -> str:
+    """Build the stable record ID of a chunk."""
+    return f"{key}#chunk-{index}"
+
+
+class MarkdownChunker:
+    """Splits markdown into chunks of at most ``chunk_size`` characters.
+
+    Chunks are assembled from whole structural blocks (headings, paragraphs,
+    tables, lists and fenced code) whenever they fit. Oversized tables are split
+    by rows with their header repeated, other oversized blocks by sentences or
+    lines. The last ``overlap`` characters of a chunk are repeated at the start
+    of the next one so context is not lost at the boundary. Text is given as
+    a string or as an iterable of its lines (e.g. ``TextFile.lines()``),
+    so a large file can be chunked without holding it as one string.
+    """
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP):
+        if overlap and overlap + len(_SEPARATOR) >= chunk_size:
+            raise ValueError("Chunk overlap must be smaller than the chunk size")
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        # Longest block that still fits in a chunk after an overlap tail and its separator
+        self._piece_limit = chunk_size - overlap - len(_SEPARATOR) if overlap else chunk_size
+
+    def _blocks(self, text: Union[str, Iterable[str]]) -> Iterator[Tuple[str, str]]:
+        """Yield ``(block, section)`` pairs in document order."""
+        section = ""
+        lines: List[str] = []
+        in_fence = False
+        in_table = False
+
+        def flush():
+            block = "\n".join(lines).strip("\n")
+            lines.clear()
+            return block
+
+        for line in text.splitlines() if isinstance(text, str) else text:
+            if _FENCE.match(line.strip()):
+                if not in_fence and lines:
+                    block = flush()
+                    if block:
+                        yield block, section
+                lines.append(line)
+                if in_fence:
+                    yield flush(), section
+                in_fence = not in_fence
+                continue
+            if in_fence:
+                lines.append(line)
+                continue
+
+            heading = _HEADING.match(line)
+            is_table_row = line.lstrip().startswith("|")
+            if heading or not line.strip() or is_table_row != in_table:
+                block = flush()
+                if block:
+                    yield block, section
+            in_table = is_table_row
+            if heading:
+                section = heading.group(2).strip()
+                yield line, section
+            elif line.strip():
+                lines.append(line)
+
+        block = flush()
+        if block:
+            yield block, section
+
+    def _split_oversized(self, block: str) -> List[str]:
+        """Split a block that does not fit into a single chunk."""
+        limit = self._piece_limit
+        rows = block.split("\n")
+        if rows[0].lstrip().startswith("|") and len(rows) > 2:
+            # Keep the header and separator rows with every slice of a table
+            header = "\n".join(rows[:2])
+            pieces, current = [], header
+            for row in rows[2:]:
+                if len(current) + len(row) + 1 > limit and current != header:
+                    pieces.append(current)
+                    current = header
+                current += "\n" + row
+            pieces.append(current)
+        else:
+            units = _SENTENCE_END.split(block) if "\n" not in block else rows
+            pieces, current = [], ""
+            for unit in units:
+                if current and len(current) + len(unit) + 1 > limit:
+                    pieces.append(current)
+                    current = ""
+                current = f"{current} {unit}" if current else unit
+            if current:
+                pieces.append(current)
+        # Hard-cut anything still too long (e.g. a single enormous line)
+        return [piece[i:i + limit] for piece in pieces for i in range(0, len(piece), limit)]
+
+    def _overlap_tail(self, text: str) -> str:
+        if not self.overlap or len(text) <= self.overlap:
+            return ""
+        tail = text[-self.overlap:]
+        space = tail.find(" ")
+        return tail[space + 1:] if 0 <= space < len(tail) - 1 else tail
+
+    def split(self, text: Union[str, Iterable[str]]) -> List[Tuple[str, str]]:
+        """Split text into ``(chunk_text, section)`` pairs."""
+        chunks: List[Tuple[str, str]] = []
+        current, current_section = "", ""
+        for block, section in self._blocks(text):
+            pieces = [block] if len(block) <= self._piece_limit else self._split_oversized(block)
+            for piece in pieces:
+                if current and len(current) + len(_SEPARATOR) + len(piece) > self.chunk_size:
+                    chunks.append((current, current_section))
+                    tail = self._overlap_tail(current)
+                    current = f"{tail}{_SEPARATOR}{piece}" if tail else piece
+                    current_section = section
+                else:
+                    if not current:
+                        current_section = section
+                    current = f"{current}{_SEPARATOR}{piece}" if current else piece
+        if current:
+            chunks.append((current, current_section))
+        return chunks
+
+    def chunk(self, key: str, text: Union[str, Iterable[str]]) -> List[Dict[str, Any]]:
+        """Split a document into chunks with stable IDs and content hashes."""
+        return [
+            {
+                "id": chunk_id(key, index),
+                "index": index,
+                "text": chunk_text,
+                "section": section,
+                "hash": hash_buffer(chunk_text.encode('utf-8')),
+            }
+            for index, (chunk_text, section) in enumerate(self.split(text))
+        ]
@@ -0,0 +1,138 @@
+"""Content-addressed on-disk cache of document conversions."""
+
+import os
+import zlib
+import threading
+from importlib import metadata as importlib_metadata
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from ..config.settings import CONVERSION_CACHE_DIR, CONVERSION_CACHE_MAX_BYTES
+from ..utils.logging_config import get_logger
+
+logger = get_logger('conversion_cache')
+
+CACHE_SUFFIX = ".md.z"
+
+
+def converter_version() -> str:
+    """Version of the converter; a docling upgrade invalidates every entry."""
+    try:
+        return f"docling-{importlib_metadata.version('docling')}"
+    except importlib_metadata.PackageNotFoundError:
+        return "docling-unknown"
+
+
+class ConversionCache:
+    """Stores converted markdown compressed on disk, keyed by content hash and converter version.
+
+    Identical files anywhere in a tree share one entry, and a forced reindex of
+    unchanged content never reruns the converter. Entries are evicted least
+    recently used first once the cache grows past ``max_bytes``; an entry's
+    mtime serves as its last-use time because atime is often disabled.
+    """
+
+    def __init__(self, cache_dir: Path = CONVERSION_CACHE_DIR, max_bytes: int = CONVERSION_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.version = converter_version()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._sizes: Dict[Path, int] = {}
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._scan()
+
+    def _scan(self):
+        """Rebuild the in-memory size index from disk."""
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(CACHE_SUFFIX):
+                    size = entry.stat().st_size
+                    self._sizes[Path(entry.path)] = size
+                    self._total_bytes += size
+
+    def _path(self, checksum: str) -> Path:
+        # Checksums look like "<algorithm>:<hex digest>"; shard on the digest
+        digest = checksum.rpartition(":")[2]
+        name = f"{checksum.replace(':', '-')}-{self.version}{CACHE_SUFFIX}"
+        return self.cache_dir / digest[:2] / name
+
+    def get(self, checksum: str) -> Optional[str]:
+        """Return the cached markdown for a content hash, or None."""
+        if not checksum:
+            return None
+        path = self._path(checksum)
+        try:
+            with open(path, 'rb') as f:
+                content = zlib.decompress(f.read()).decode('utf-8')
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, zlib.error, UnicodeDecodeError) as e:
+            logger.warning(f"Dropping unreadable cache entry {path}: {e}")
+            self._remove(path)
+            self.misses += 1
+            return None
+        # Mark as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return content
+
+    def put(self, checksum: str, content: str):
+        """Store markdown for a content hash, evicting old entries if needed."""
+        if not checksum or self.max_bytes <= 0:
+            return
+        path = self._path(checksum)
+        payload = zlib.compress(content.encode('utf-8'), 6)
+        if len(payload) > self.max_bytes:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._total_bytes += len(payload) - self._sizes.get(path, 0)
+            self._sizes[path] = len(payload)
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def _remove(self, path: Path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self._total_bytes -= self._sizes.pop(path, 0)
+
+    def evict(self, target_bytes: Optional[int] = None):
+        """Remove least recently used entries until the cache fits ``target_bytes``."""
+        if target_bytes is None:
+            target_bytes = int(self.max_bytes * 0.9)
+        with self._lock:
+            entries = list(self._sizes)
+
+        def last_used(path: Path) -> Tuple[int, str]:
+            try:
+                return path.stat().st_mtime_ns, str(path)
+            except FileNotFoundError:
+                return 0, str(path)
+
+        evicted = 0
+        for path in sorted(entries, key=last_used):
+            if self._total_bytes <= target_bytes:
+                break
+            self._remove(path)
+            evicted += 1
+        if evicted:
+            logger.info(f"Evicted {evicted} conversion cache entries ({self._total_bytes} bytes remain)")
+
+    @property
+    def size_bytes(self) -> int:
+        return self._total_bytes
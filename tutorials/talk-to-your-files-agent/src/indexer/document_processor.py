@@ -1,13 +1,110 @@
+import io
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
-from typing import Dict, Any, Optional
-from docling.document_converter import DocumentConverter
-from ..config.settings import SUPPORTED_EXTENSIONS
+from time import perf_counter, time
+from typing import BinaryIO, Callable, Dict, Any, Optional, Iterable, Iterator, Tuple, Union
+from ..config.settings import (SUPPORTED_EXTENSION_SET, PLAIN_TEXT_EXTENSIONS, CONVERSION_WORKERS, CONVERSION_TIMEOUT,
+                               CONVERSION_CACHE_MAX_BYTES, DRIVE_DOWNLOAD_CHUNK_SIZE, DRIVE_SPOOL_THRESHOLD)
+from ..utils.hashing import hash_file, hash_buffer
+from ..utils.text_file import TextFile
+from ..utils.lazy import LazyImport
+from ..utils.metrics import metrics
+from .conversion_cache import ConversionCache
+
+# docling takes seconds to import and loads layout models when converting, so
+# it is only imported once a document actually has to be converted
+DocumentConverter = LazyImport("docling.document_converter", "DocumentConverter")
+DocumentStream = LazyImport("docling.datamodel.base_models", "DocumentStream")
+
+# Extra time the parent waits past the per-file timeout before killing a worker
+# whose conversion ignored the in-worker alarm (e.g. stuck in native code).
+TIMEOUT_GRACE_SECONDS = 10
+
+# How often the parent looks for files that workers have started converting
+START_POLL_SECONDS = 0.5
+
+# Converter owned by each pool worker process, created once by _init_worker,
+# and the queue on which the worker reports each file it starts converting
+_worker_processor = None
+_worker_started = None
+
+def _init_worker(started: Optional[Any] = None):
+    """Create the worker's DocumentProcessor once per process."""
+    global _worker_processor, _worker_started
+    _worker_processor = DocumentProcessor()
+    _worker_started = started
+
+def _convert_in_worker(file_path: str, timeout: Optional[float],
+                       checksum: Optional[str]) -> Tuple[Optional[Dict[str, Any]], float]:
+    """Convert a single file inside a pool worker, returning the result and the time it took."""
+    if _worker_started is not None:
+        # The file's deadline runs from now, not from when it was queued behind others
+        _worker_started.put((file_path, time()))
+    started = perf_counter()
+    result = _worker_processor.process_document(file_path, timeout=timeout, checksum=checksum)
+    return result, perf_counter() - started
+
+_converters: Dict[Any, Any] = {}
+_converters_lock = threading.Lock()
+
+def get_document_converter(converter_class: Any = None) -> Any:
+    """Return the process-wide docling converter, creating it on first use."""
+    converter_class = converter_class or DocumentConverter
+    converter = _converters.get(converter_class)
+    if converter is None:
+        with _converters_lock:
+            converter = _converters.get(converter_class)
+            if converter is None:
+                converter = _converters[converter_class] = converter_class()
+    return converter
+
+class ConversionTimeout(Exception):
+    """Raised when a single document takes longer than the allowed time to convert."""
+
+def _raise_timeout(signum, frame):
+    raise ConversionTimeout()
+
+def _alarm_available() -> bool:
+    """Whether SIGALRM can interrupt a conversion here: only on the main thread, and not on Windows."""
+    return hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+# Set once the "timeout not enforced" warning has been printed
+_warned_no_alarm = False
 
 class DocumentProcessor:
-    def __init__(self):
-        self.converter = DocumentConverter()
+    def __init__(self, use_cache: bool = CONVERSION_CACHE_MAX_BYTES > 0):
+        """Create a processor; the converter and conversion cache are set up on first use."""
+        self._converter_class = DocumentConverter
+        self._cache_factory = ConversionCache if use_cache else None
+        self._cache = None
+        self._cache_lock = threading.Lock()
+        self._docling_supported_formats = None
+        
+    @property
+    def converter(self):
+        """The docling converter, shared by every processor in the process."""
+        return get_document_converter(self._converter_class)
+    
+    @property
+    def cache(self) -> Optional[ConversionCache]:
+        if self._cache is None and self._cache_factory is not None:
+            with self._cache_lock:
+                if self._cache is None:
+                    self._cache = self._cache_factory()
+        return self._cache
+    
+    @property
+    def docling_supported_formats(self) -> list:
         # Get list of actually supported formats from docling
-        self.docling_supported_formats = self._get_docling_supported_formats()
+        if self._docling_supported_formats is None:
+            self._docling_supported_formats = self._get_docling_supported_formats()
+        return self._docling_supported_formats
         
     def _get_docling_supported_formats(self) -> list:
         """Get the actual list of formats supported by docling."""
@@ -21,44 +118,136 @@ class DocumentProcessor:
     def is_supported_file(self, file_path: str) -> bool:
         """Check if the file type is supported."""
         extension = Path(file_path).suffix.lower()
-        return any(extension in exts for exts in SUPPORTED_EXTENSIONS.values())
+        return extension in SUPPORTED_EXTENSION_SET
+    
+    def is_plain_text(self, file_path: str) -> bool:
+        """Check if the file is indexed as is, without docling (see ``PLAIN_TEXT_EXTENSIONS``)."""
+        return Path(file_path).suffix.lower() in PLAIN_TEXT_EXTENSIONS
     
     def is_docling_supported(self, file_path: str) -> bool:
         """Check if the file type is actually supported by docling."""
         extension = Path(file_path).suffix.lower()
         return extension in self.docling_supported_formats
     
-    def process_document(self, file_path: str) -> Optional[Dict[str, Any]]:
+    def process_document(self, file_path: str, timeout: Optional[float] = None,
+                         checksum: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Process a document, giving up after ``timeout`` seconds when set.
+        
+        ``checksum`` is the file's content hash if the caller already has it;
+        it keys the conversion cache and saves hashing the file again.
+        """
+        with metrics.stage("convert", Path(file_path).suffix.lower()):
+            return self._with_timeout(self._process_document, (file_path, checksum), file_path, timeout)
+    
+    def process_stream(self, stream: BinaryIO, file_name: str, checksum: Optional[str] = None,
+                       timeout: Optional[float] = None,
+                       max_memory_bytes: int = DRIVE_SPOOL_THRESHOLD) -> Optional[Dict[str, Any]]:
+        """Process a document read from a binary stream, such as a Drive download.
+        
+        ``file_name`` determines the format. Streams up to ``max_memory_bytes``
+        are converted from memory; larger ones are copied in chunks to a
+        temporary file with the document's extension and converted from disk.
+        """
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        stream.seek(0)
+        
+        if size > max_memory_bytes:
+            with tempfile.NamedTemporaryFile(suffix=Path(file_name).suffix) as spilled:
+                shutil.copyfileobj(stream, spilled, DRIVE_DOWNLOAD_CHUNK_SIZE)
+                spilled.flush()
+                result = self.process_document(spilled.name, timeout=timeout, checksum=checksum)
+        else:
+            with metrics.stage("convert", Path(file_name).suffix.lower()):
+                result = self._with_timeout(self._process_buffer, (io.BytesIO(stream.read()), file_name, checksum),
+                                            file_name, timeout)
+        
+        if result:
+            # Describe the document, not the temporary file it was converted from
+            result["metadata"] = {
+                "file_name": file_name,
+                "file_type": Path(file_name).suffix.lower(),
+                "size": size
+            }
+        return result
+    
+    def _with_timeout(self, process: Callable[..., Optional[Dict[str, Any]]], args: tuple, name: str,
+                      timeout: Optional[float]) -> Optional[Dict[str, Any]]:
+        """Run ``process(*args)``, giving up after ``timeout`` seconds when set."""
+        global _warned_no_alarm
+        if not timeout:
+            return process(*args)
+        if not _alarm_available():
+            # iter_process converts in a worker process instead; direct calls run without a limit
+            if not _warned_no_alarm:
+                _warned_no_alarm = True
+                print(f"Warning: conversion timeouts are not enforced on thread {threading.current_thread().name}")
+            return process(*args)
+        
+        previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            return process(*args)
+        except ConversionTimeout:
+            print(f"Timed out after {timeout}s processing document {name}")
+            return None
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+    
+    def _convert(self, source: Union[str, "DocumentStream"], name: str, checksum: Optional[str]) -> Optional[str]:
+        """Convert a path or in-memory stream to markdown, going through the conversion cache."""
+        # Identical content converted before (anywhere in the tree) comes from the cache
+        markdown_content = self.cache.get(checksum) if self.cache else None
+        if markdown_content is not None:
+            print(f"Using cached conversion for {name}")
+            return markdown_content
+        
+        # Add debug logging
+        print(f"Processing document: {name}")
+        
+        # Convert document using docling
+        result = self.converter.convert(source)
+        
+        # Check if conversion produced results
+        if not result or not result.document:
+            print(f"Docling conversion failed for {name}")
+            return None
+        
+        # Extract text content
+        markdown_content = result.document.export_to_markdown()
+        
+        # Add more debugging
+        print(f"Extracted content length: {len(markdown_content) if markdown_content else 0}")
+        
+        if self.cache and markdown_content:
+            self.cache.put(checksum, markdown_content)
+        return markdown_content
+    
+    def _process_document(self, file_path: str, checksum: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """Process a document using docling and return its content and metadata."""
         try:
             if not self.is_supported_file(file_path):
                 raise ValueError(f"Unsupported file type: {file_path}")
             
+            # Plain text needs no conversion
+            if self.is_plain_text(file_path):
+                return self._process_text_file(file_path)
+            
             # Check if docling actually supports this format
             if not self.is_docling_supported(file_path):
                 print(f"Warning: File {file_path} has a supported extension but docling cannot process it")
-                # For text files we can try a simple fallback
-                if Path(file_path).suffix.lower() in [".txt", ".md", ".html", ".htm"]:
+                # For HTML we can try a simple fallback
+                if Path(file_path).suffix.lower() in [".html", ".htm"]:
                     return self._process_text_file(file_path)
                 return None
             
-            # Add debug logging
-            print(f"Processing document: {file_path}")
-            
-            # Convert document using docling
-            result = self.converter.convert(file_path)
-            
-            # Check if conversion produced results
-            if not result or not result.document:
-                print(f"Docling conversion failed for {file_path}")
+            if self.cache:
+                checksum = checksum or hash_file(file_path)
+            markdown_content = self._convert(file_path, file_path, checksum)
+            if markdown_content is None:
                 return None
             
-            # Extract text content
-            markdown_content = result.document.export_to_markdown()
-            
-            # Add more debugging
-            print(f"Extracted content length: {len(markdown_content) if markdown_content else 0}")
-            
             # Get metadata
             metadata = {
                 "file_path": file_path,
@@ -73,16 +262,18 @@ class DocumentProcessor:
                 "metadata": metadata
             }
             
+        except ConversionTimeout:
+            raise
         except Exception as e:
             print(f"Error processing document {file_path}: {str(e)}")
             return None
             
     def _process_text_file(self, file_path: str) -> Optional[Dict[str, Any]]:
-        """Simple processor for text files when docling fails."""
+        """Read a text file directly, without docling."""
         try:
-            # Read the text content directly
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            with TextFile(file_path) as text:
+                content = text.read()
+                stats = text.stats
                 
             print(f"Processed text file directly: {file_path}, content length: {len(content)}")
             
@@ -91,23 +282,189 @@ class DocumentProcessor:
                 "file_path": file_path,
                 "file_name": Path(file_path).name,
                 "file_type": Path(file_path).suffix.lower(),
-                "size": Path(file_path).stat().st_size,
-                "last_modified": Path(file_path).stat().st_mtime
+                "size": stats.st_size,
+                "last_modified": stats.st_mtime
             }
             
             return {
                 "content": content,
                 "metadata": metadata
             }
+        except ConversionTimeout:
+            raise
         except Exception as e:
             print(f"Error processing text file {file_path}: {str(e)}")
             return None
     
-    def batch_process(self, file_paths: list[str]) -> list[Dict[str, Any]]:
+    def _process_buffer(self, buffer: io.BytesIO, file_name: str, checksum: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Process an in-memory document; ``process_stream`` fills in its metadata."""
+        try:
+            if not self.is_supported_file(file_name):
+                raise ValueError(f"Unsupported file type: {file_name}")
+            
+            if self.is_plain_text(file_name):
+                with buffer.getbuffer() as view:
+                    content = str(view, 'utf-8', 'replace')
+            elif self.is_docling_supported(file_name):
+                if self.cache:
+                    if not checksum:
+                        with buffer.getbuffer() as view:
+                            checksum = hash_buffer(view)
+                content = self._convert(DocumentStream(name=file_name, stream=buffer), file_name, checksum)
+            elif Path(file_name).suffix.lower() in [".html", ".htm"]:
+                content = buffer.getvalue().decode('utf-8', errors='replace')
+            else:
+                print(f"Warning: File {file_name} has a supported extension but docling cannot process it")
+                return None
+            
+            if content is None:
+                return None
+            return {"content": content, "metadata": {}}
+        
+        except ConversionTimeout:
+            raise
+        except Exception as e:
+            print(f"Error processing document {file_name}: {str(e)}")
+            return None
+    
+    def batch_process(self, file_paths: list[str], workers: int = CONVERSION_WORKERS,
+                      timeout: Optional[float] = CONVERSION_TIMEOUT) -> list[Dict[str, Any]]:
         """Process multiple documents in batch."""
-        results = []
-        for file_path in file_paths:
-            result = self.process_document(file_path)
-            if result:
-                results.append(result)
-        return results 
\ No newline at end of file
+        return [result for _, result in self.iter_process(file_paths, workers, timeout) if result]
+    
+    def iter_process(self, file_paths: Iterable[str], workers: int = CONVERSION_WORKERS,
+                     timeout: Optional[float] = CONVERSION_TIMEOUT,
+                     checksums: Optional[Dict[str, str]] = None,
+                     ready: Optional[Dict[str, Optional[Dict[str, Any]]]] = None
+                     ) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+        """Convert documents and yield ``(file_path, result)`` pairs as each one finishes.
+        
+        With ``workers > 1`` files are converted in a process pool where every
+        worker builds its own converter once. Results arrive in completion order
+        and at most ``2 * workers`` files are in flight, so arbitrarily long
+        inputs are streamed rather than held in memory. Failed or timed-out
+        files yield ``None`` as their result. ``checksums`` maps paths to
+        already known content hashes and is read as each file is submitted.
+        ``ready`` maps inputs the caller already has a result for (such as
+        plain text it opened itself) to that result: they are not converted,
+        and their result is yielded as soon as they are read from
+        ``file_paths``, and removed from ``ready``.
+        
+        A single worker converts in this process, except when ``timeout`` is
+        set and this is not the main thread, where the timeout's alarm signal
+        cannot be used: conversions then go to a one-process pool.
+        """
+        checksums = checksums if checksums is not None else {}
+        ready = ready if ready is not None else {}
+        if workers <= 1 and (not timeout or _alarm_available()):
+            for file_path in file_paths:
+                if file_path in ready:
+                    yield file_path, ready.pop(file_path)
+                else:
+                    yield file_path, self.process_document(file_path, timeout=timeout, checksum=checksums.get(file_path))
+            return
+        
+        yield from _ConversionPool(max(1, workers), timeout).run(file_paths, checksums, ready)
+
+class _ConversionPool:
+    """Process pool that streams conversions and enforces per-file deadlines.
+    
+    A file's deadline starts when a worker reports that it began converting
+    it, so files queued behind a slow conversion are not timed out early.
+    """
+    
+    def __init__(self, workers: int, timeout: Optional[float]):
+        self.workers = workers
+        self.timeout = timeout
+        self.context = multiprocessing.get_context("spawn")
+        self.executor = None
+        self.started = None
+        
+    def _start(self):
+        # A new queue for every pool: a worker killed while reporting can leave the old one locked
+        self.started = self.context.SimpleQueue() if self.timeout else None
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=self.context,
+            initializer=_init_worker,
+            initargs=(self.started,)
+        )
+        
+    def _restart(self):
+        """Kill every worker, including one stuck in native code, and start fresh."""
+        # ProcessPoolExecutor has no public way to kill a running task
+        for process in list(getattr(self.executor, "_processes", {}).values()):
+            process.kill()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self._start()
+        
+    def _submit(self, in_flight: dict, file_path: str, checksum: Optional[str] = None):
+        future = self.executor.submit(_convert_in_worker, file_path, self.timeout, checksum)
+        # [file_path, deadline]; the deadline is set once a worker starts the file
+        in_flight[future] = [file_path, None]
+        
+    def _start_deadlines(self, in_flight: dict):
+        """Set the deadline of every file a worker has reported starting."""
+        while not self.started.empty():
+            file_path, started = self.started.get()
+            for entry in in_flight.values():
+                if entry[0] == file_path and entry[1] is None:
+                    entry[1] = started + self.timeout + TIMEOUT_GRACE_SECONDS
+                    break
+        
+    def run(self, file_paths: Iterable[str], checksums: Dict[str, str],
+            ready: Dict[str, Optional[Dict[str, Any]]]) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+        self._start()
+        pending = iter(file_paths)
+        in_flight = {}
+        max_in_flight = 2 * self.workers
+        try:
+            while True:
+                for file_path in pending:
+                    if file_path in ready:
+                        # Needing no conversion: never sent to a worker
+                        yield file_path, ready.pop(file_path)
+                        continue
+                    self._submit(in_flight, file_path, checksums.get(file_path))
+                    if len(in_flight) >= max_in_flight:
+                        break
+                if not in_flight:
+                    return
+                
+                wait_for = None
+                if self.timeout:
+                    self._start_deadlines(in_flight)
+                    deadlines = [deadline for _, deadline in in_flight.values() if deadline]
+                    if deadlines:
+                        wait_for = max(0.0, min(deadlines) - time())
+                    if len(deadlines) < len(in_flight):
+                        # Some files are still queued: check again soon for the moment they start
+                        wait_for = min(wait_for, START_POLL_SECONDS) if wait_for is not None else START_POLL_SECONDS
+                done, _ = wait(in_flight, timeout=wait_for, return_when=FIRST_COMPLETED)
+                
+                for future in done:
+                    file_path, _ = in_flight.pop(future)
+                    try:
+                        result, seconds = future.result()
+                    except Exception as e:
+                        print(f"Error processing document {file_path}: {str(e)}")
+                        yield file_path, None
+                        continue
+                    # The worker's own metrics stay in its process
+                    metrics.observe("convert", seconds, Path(file_path).suffix.lower())
+                    yield file_path, result
+                        
+                expired = [f for f, (_, deadline) in in_flight.items() if deadline and deadline <= time()]
+                if expired:
+                    for future in expired:
+                        file_path, _ = in_flight.pop(future)
+                        print(f"Timed out after {self.timeout}s processing document {file_path}, killing worker")
+                        yield file_path, None
+                    # Resubmit the innocent conversions that die with the pool
+                    survivors = [file_path for file_path, _ in in_flight.values()]
+                    in_flight.clear()
+                    self._restart()
+                    for file_path in survivors:
+                        self._submit(in_flight, file_path, checksums.get(file_path))
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
@@ -1,10 +1,12 @@
 import json
 from pathlib import Path
 from typing import Dict, Any, List
-from aixplain.factories import ModelFactory
 from ..config.settings import INDEXED_DIR, MAX_FILE_SIZE, BATCH_SIZE
+from ..utils.lazy import LazyImport
 from .document_processor import DocumentProcessor
 
+ModelFactory = LazyImport("aixplain.factories", "ModelFactory")
+
 class FileIndexer:
     def __init__(self, model_id: str):
         self.model = ModelFactory.get(model_id)
@@ -21,6 +23,7 @@ class FileIndexer:
     
     def _save_index(self):
         """Save the current index to disk."""
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
         with open(self.index_path, "w") as f:
             json.dump(self.document_index, f, indent=2)
             
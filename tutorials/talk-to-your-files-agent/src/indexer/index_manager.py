@@ -1,39 +1,107 @@
-from typing import List, Dict, Any
+import os
+import copy
+import json
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Any, Iterable, Iterator, Optional, Tuple, Union
 from pathlib import Path
-from aixplain.factories import IndexFactory
-from aixplain.modules.model.record import Record
 from .document_processor import DocumentProcessor
 from .index_storage import IndexStorage
+from .chunker import MarkdownChunker
+from .pipeline import stream_stage, UpsertBatch, UpsertScheduler
+from .jobs import IndexJob
+from .retrieval_backends import RetrievalBackend, create_retrieval_backend, matches_filter
+from .sparse_index import SparseIndex, tokenize, reciprocal_rank_fusion
 from ..connectors.local_connector import LocalConnector
 from ..connectors.drive_connector import DriveConnector
-from ..config.settings import INDEXED_DIR
+from ..connectors.drive_crawler import BATCH_LIMIT, FOLDER_MIME_TYPE, is_supported_name
+from ..config.settings import (INDEXED_DIR, PIPELINE_QUEUE_SIZE, UPSERT_BATCH_RECORDS, UPSERT_BATCH_BYTES,
+                               SEARCH_CACHE_MAX_ENTRIES, SEARCH_CACHE_TTL, SEARCH_MAX_WORKERS, RETRIEVAL_BACKEND,
+                               HYBRID_SEARCH, RRF_K, DELETE_BATCH_SIZE, DELETE_MAX_WORKERS, STATE_COMPACT_RATIO,
+                               UPSERT_MIN_BATCH_RECORDS, UPSERT_MAX_IN_FLIGHT, UPSERT_RETRY_BASE_DELAY,
+                               UPSERT_RETRY_MAX_DELAY, UPSERT_TARGET_LATENCY, MAX_RETRIES)
+from ..utils.cache import LRUCache
+from ..utils.hashing import reusable_checksum, stat_signature
+from ..utils.lazy import LazyImport
 from ..utils.logging_config import get_logger
+from ..utils.text_file import TextFile
+from ..utils.metrics import metrics
 
 logger = get_logger('indexer')
 
+# The aiXplain SDK takes most of a second to import
+IndexFactory = LazyImport("aixplain.factories", "IndexFactory")
+Record = LazyImport("aixplain.modules.model.record", "Record")
+
+def _file_type(file_name: Optional[str]) -> str:
+    return Path(file_name).suffix.lower() if file_name else ""
+
+def _drive_file_type(metadata: Dict[str, Any]) -> str:
+    return metadata.get("file_type") or _file_type(metadata.get("file_name"))
+
+def _count(stats: Dict[str, int], outcome: str, file_type: str):
+    """Count a file's outcome in the run's stats and in the indexer metrics."""
+    stats[outcome] += 1
+    metrics.inc("indexer_files_total", outcome=outcome, file_type=file_type)
+
 class IndexManager:
-    def __init__(self, name: str, description: str, agent_id: str):
-        """Initialize the index manager with a unique index for each agent."""
+    def __init__(self, name: str, description: str, agent_id: str,
+                 backend: Union[str, RetrievalBackend] = RETRIEVAL_BACKEND,
+                 local_connector: Optional[LocalConnector] = None,
+                 drive_connector: Optional[DriveConnector] = None,
+                 state_dir: Optional[Path] = None):
+        """Initialize the index manager with a unique index for each agent.
+        
+        ``backend`` selects where chunks are indexed and searched: "aixplain"
+        (the remote index service), "local" (an offline index stored next to
+        the index state) or a ``RetrievalBackend`` instance. The connectors
+        default to new ones; pass the agent's to share them. The index state
+        is kept in ``state_dir``, by default ``INDEXED_DIR / agent_id``.
+        """
         # Create a unique directory for each agent's index state
-        agent_index_dir = INDEXED_DIR / agent_id
+        agent_index_dir = Path(state_dir) if state_dir else INDEXED_DIR / agent_id
         agent_index_dir.mkdir(parents=True, exist_ok=True)
         
         self.storage = IndexStorage(agent_index_dir)
         self.document_processor = DocumentProcessor()
-        self.local_connector = LocalConnector()
-        self.drive_connector = DriveConnector()
+        self.local_connector = local_connector or LocalConnector()
+        self.drive_connector = drive_connector or DriveConnector()
+        self.chunker = MarkdownChunker()
+        self.last_stats = {}
+        self.search_cache = LRUCache(SEARCH_CACHE_MAX_ENTRIES, ttl=SEARCH_CACHE_TTL)
+        
+        if backend == "aixplain":
+            self.index = self._open_index(name, description)
+        else:
+            self.index = create_retrieval_backend(backend, agent_index_dir) if isinstance(backend, str) else backend
+            stored_index_id = self.storage.get_index_id()
+            if stored_index_id != self.index.id:
+                if stored_index_id:
+                    # The stored file states describe another index's contents
+                    logger.warning(f"Index state belongs to index {stored_index_id}; all files will be re-indexed")
+                    self.storage.clear_files()
+                self.storage.set_index_id(self.index.id)
         
+        # The remote index only searches semantically; a local keyword index kept in
+        # step with the upserts lets exact identifiers be found as well
+        self.sparse_index = None
+        if HYBRID_SEARCH and not (isinstance(self.index, RetrievalBackend) and self.index.keyword_search):
+            self.sparse_index = SparseIndex(agent_index_dir / "keyword_index.db", store_documents=True)
+            if not len(self.sparse_index) and next(self.storage.iter_file_keys(), None):
+                logger.warning("Keyword index is empty; re-index with force=True to use hybrid search on existing files")
+            
+    def _open_index(self, name: str, description: str):
+        """Reuse the agent's aiXplain index, or create one."""
         # Try to reuse existing index if available
         existing_index_id = self.storage.get_index_id()
         if existing_index_id:
             try:
-                self.index = IndexFactory.get(existing_index_id)
+                index = IndexFactory.get(existing_index_id)
                 logger.info(f"Reusing existing index: {existing_index_id}")
+                return index
             except Exception as e:
                 logger.warning(f"Failed to get existing index: {e}")
-                self.index = self._create_new_index(name, description)
-        else:
-            self.index = self._create_new_index(name, description)
+        return self._create_new_index(name, description)
             
     def _create_new_index(self, name: str, description: str):
         """Create a new aiXplain index."""
@@ -51,110 +119,662 @@ class IndexManager:
                 raise
             
         
-    def add_documents(self, documents: List[Dict[str, Any]]):
-        """Add documents to the index, processing them and skipping unchanged files."""
-        records_to_index = []
-        skipped_count = 0
-        error_count = 0
+    def start_job(self, source: str, resume: bool = True, **options) -> IndexJob:
+        """Start an indexing job over ``source``, resuming its unfinished previous job if any."""
+        return IndexJob.start(self.storage, source, resume=resume, **options)
         
-        for doc_info in documents:
+    def add_documents(self, documents: Iterable[Dict[str, Any]], job: Optional[IndexJob] = None) -> int:
+        """Add documents to the index, processing them and skipping unchanged files.
+        
+        Documents flow through a streaming pipeline (metadata/skip check ->
+        convert -> chunk -> upsert) with bounded queues between the stages.
+        Only chunks whose content hash changed since the last run are
+        re-upserted, and chunks that no longer exist are deleted. Upserts are
+        flushed whenever the pending batch reaches the current record limit
+        (at most ``UPSERT_BATCH_RECORDS``) or ``UPSERT_BATCH_BYTES`` bytes and
+        sent by an ``UpsertScheduler``, which retries failed upserts and adapts
+        the batch size and number of requests in flight to the index. A file's
+        state is only committed once the flush containing it succeeded.
+        
+        With a ``job`` each flush is checkpointed in the job, which is marked
+        completed or failed at the end (see ``IndexJob``).
+        """
+        stats = {"indexed": 0, "skipped": 0, "errors": 0}
+        # Unchanged files found under a new stat signature, stored with the next commit
+        refreshed: List[Tuple[str, Dict[str, Any], Dict[str, Any]]] = []
+        checked = stream_stage(self._check_documents(documents, stats, job, refreshed), PIPELINE_QUEUE_SIZE,
+                               "check")
+        converted = stream_stage(self._convert_documents(checked, stats), PIPELINE_QUEUE_SIZE, "convert")
+        prepared = stream_stage(self._build_records(converted), PIPELINE_QUEUE_SIZE, "chunk")
+        
+        scheduler = UpsertScheduler(self._upload, UPSERT_BATCH_RECORDS, UPSERT_MIN_BATCH_RECORDS,
+                                    UPSERT_MAX_IN_FLIGHT, MAX_RETRIES, UPSERT_RETRY_BASE_DELAY,
+                                    UPSERT_RETRY_MAX_DELAY, UPSERT_TARGET_LATENCY)
+        batch = UpsertBatch(scheduler.record_limit, UPSERT_BATCH_BYTES)
+        try:
+            for prepared_file in prepared:
+                if prepared_file.get("unchanged"):
+                    _count(stats, "skipped", prepared_file["metadata"].get("file_type", ""))
+                    refreshed.append((prepared_file["file_key"], prepared_file["metadata"],
+                                      prepared_file["stored_state"]))
+                    continue
+                batch.add(prepared_file)
+                if batch.is_full:
+                    self._commit(scheduler.reserve(), stats, job, refreshed=refreshed)
+                    scheduler.submit(batch)
+                    batch = UpsertBatch(scheduler.record_limit, UPSERT_BATCH_BYTES)
+            if batch:
+                self._commit(scheduler.reserve(), stats, job, refreshed=refreshed)
+                scheduler.submit(batch)
+            self._commit(scheduler.drain(), stats, job, refreshed=refreshed)
+        except BaseException as e:
+            # Keep the batches the index acknowledged before giving up
+            self._commit(scheduler.drain(), stats, job, raise_errors=False, refreshed=refreshed)
+            if job:
+                job.fail(e)
+            raise
+        else:
+            if job:
+                job.complete(stats)
+        finally:
+            scheduler.close()
+            prepared.close()
+            self.last_stats = stats
+                
+        logger.info(f"Indexing summary: {stats['indexed']} indexed, {stats['skipped']} skipped, {stats['errors']} errors")
+        return stats["indexed"]
+    
+    def _check_documents(self, documents: Iterable[Dict[str, Any]], stats: Dict[str, int],
+                         job: Optional[IndexJob] = None,
+                         refreshed: Optional[List[Tuple[str, Dict[str, Any], Dict[str, Any]]]] = None
+                         ) -> Iterator[Dict[str, Any]]:
+        """Pipeline stage: collect metadata and drop files that have not changed.
+        
+        Files whose content is unchanged but whose stat signature is not (after
+        a touch, checkout or copy) are appended to ``refreshed`` as ``(key,
+        metadata, stored_state)``, so their new signature can be stored.
+        """
+        for doc_info in self._with_drive_metadata(documents):
+            file_path = doc_info.get("file_path")
+            file_id = doc_info.get("file_id")
+            text = None
             try:
-                file_path = doc_info.get("file_path")
-                file_id = doc_info.get("file_id")
-                metadata = doc_info.get("metadata", {})
-                content = None
-                force = doc_info.get("force", False)
+                key = file_path or file_id
+                stored_state = self.storage.get_file_state(key) if key else None
+                # A resumed job does not force files it already committed again
+                force = doc_info.get("force", False) and not (job and job.committed(stored_state))
                 
                 # Handle local files
                 if file_path:
-                    # Get metadata with checksum but WITHOUT processing the document content
-                    file_metadata = self.local_connector.get_file_metadata(file_path)
+                    previous = stored_state["metadata"] if stored_state else None
+                    file_stats = doc_info.get("stats")
+                    if file_stats is None:
+                        with metrics.stage("stat", _file_type(file_path)):
+                            file_stats = os.stat(file_path)
                     
-                    # Skip if file hasn't changed and we're not forcing reindex
-                    if not force and not self.storage.needs_indexing(file_path, file_metadata):
+                    # Stat-only fast path: an unchanged (size, mtime, inode) means the
+                    # file does not have to be opened at all
+                    if not force and reusable_checksum(file_stats, previous):
                         logger.debug(f"Skipping unchanged file: {file_path}")
-                        skipped_count += 1
+                        _count(stats, "skipped", _file_type(file_path))
                         continue
                     
-                    # Only process the document content if we determined it needs indexing
-                    processed_doc = self.document_processor.process_document(file_path)
-                    if not processed_doc:
-                        logger.error(f"No content extracted for document {file_path}")
+                    # Plain text is opened here but read once, by the chunk stage, which
+                    # hashes it while decoding it and drops it there if it is unchanged
+                    if self.document_processor.is_plain_text(file_path):
+                        text = TextFile(file_path)
+                    
+                    # Get metadata with checksum but WITHOUT processing the document content,
+                    # reusing the stored checksum when the file's stat signature is unchanged
+                    # (plain text gets its checksum in the chunk stage)
+                    metadata = self.local_connector.get_file_metadata(file_path, previous=previous, stats=file_stats,
+                                                                      text=text)
+                    
+                    # Skip if file hasn't changed and we're not forcing reindex
+                    if not force and not self.storage.needs_indexing(file_path, metadata):
+                        logger.debug(f"Skipping unchanged file: {file_path}")
+                        _count(stats, "skipped", _file_type(file_path))
+                        if text is not None:
+                            text.close()
+                        if refreshed is not None and stored_state and metadata.get("checksum") and \
+                                any(previous.get(field) != value for field, value in stat_signature(file_stats).items()):
+                            # Otherwise the file is hashed again on every scan instead of taking the fast path
+                            refreshed.append((file_path, metadata, stored_state))
                         continue
-                        
-                    # Keep the checksum we already calculated
-                    processed_doc["metadata"]["checksum"] = file_metadata.get("checksum", "")
-                    metadata = processed_doc["metadata"]
-                    content = processed_doc["content"]
-                
+                    
                 # Handle Google Drive files
                 elif file_id:
+                    metadata = doc_info.get("metadata", {})
                     if not metadata:
-                        # This should already be provided by the agent but just in case
+                        # Only files the batched lookup could not fetch get here
                         metadata = self.drive_connector.get_file_metadata(file_id)
                     
                     # For Drive files, we use the file_id as the key
-                    if not self.storage.needs_indexing(file_id, metadata):
+                    if not force and not self.storage.needs_indexing(file_id, metadata):
                         logger.debug(f"Skipping unchanged Drive file: {file_id}")
-                        skipped_count += 1
-                        continue
-                    
-                    # Download and process the file
-                    file_content = self.drive_connector.download_file(file_id)
-                    if not file_content:
+                        _count(stats, "skipped", _drive_file_type(metadata))
                         continue
+                else:
+                    continue
                     
-                    # Process the document (this would need to be updated to handle file content)
-                    # For now, just use the plain content as text
-                    content = file_content.getvalue().decode('utf-8', errors='replace')
+                yield {"file_path": file_path, "file_id": file_id, "metadata": metadata, "force": force, "text": text}
                 
-                if not content:
-                    logger.error(f"No content extracted for document {file_path or file_id}")
-                    continue
+            except Exception as e:
+                if text is not None:
+                    text.close()
+                _count(stats, "errors", _file_type(file_path))
+                logger.error(f"Error checking document {file_path or file_id}: {e}", exc_info=True)
                 
-                # Create record for indexing
-                record = Record(
-                    value=content,
-                    value_type="text",
-                    id=file_path or file_id,
-                    attributes=metadata
-                )
-                records_to_index.append(record)
+    def _with_drive_metadata(self, documents: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Fill in the metadata of Drive files given without it, ``BATCH_LIMIT`` files per batch request.
+        
+        Other documents pass straight through, so the Drive files held back
+        for a batch may be yielded after documents that followed them.
+        """
+        waiting: List[Dict[str, Any]] = []
+        
+        def lookup():
+            found = self.drive_connector.get_files_metadata([doc["file_id"] for doc in waiting])
+            for doc in waiting:
+                yield {**doc, "metadata": found.get(doc["file_id"], {})}
+            waiting.clear()
+        
+        for doc_info in documents:
+            if doc_info.get("file_path") or not doc_info.get("file_id") or doc_info.get("metadata"):
+                yield doc_info
+                continue
+            waiting.append(doc_info)
+            if len(waiting) >= BATCH_LIMIT:
+                yield from lookup()
+        if waiting:
+            yield from lookup()
                 
-                # Update storage with new state
-                file_key = file_path or file_id
-                if file_key:
-                    self.storage.update_file_state(file_key, metadata)
-                    logger.info(f"Prepared file for indexing: {file_key} (size: {metadata.get('size', 0)} bytes)")
+    def _convert_documents(self, items: Iterable[Dict[str, Any]], stats: Dict[str, int]) -> Iterator[Dict[str, Any]]:
+        """Pipeline stage: extract the text content of changed files."""
+        pending = {}
+        checksums = {}
+        ready = {}
+        drive_keys = set()
+        
+        def local_paths():
+            # Local files are handed to the document processor (which may convert
+            # them in a process pool); Drive files are converted inline and passed
+            # through as ready results, so each reaches the chunk stage in turn.
+            for item in items:
+                if item["file_path"]:
+                    if item["file_path"] not in pending:
+                        pending[item["file_path"]] = item
+                        checksums[item["file_path"]] = item["metadata"].get("checksum")
+                        if item["text"] is not None:
+                            ready[item["file_path"]] = {"content": item["text"], "metadata": {}}
+                        yield item["file_path"]
+                    elif item["text"] is not None:
+                        item["text"].close()
+                else:
+                    key = f"drive:{item['file_id']}"
+                    drive_keys.add(key)
+                    ready[key] = self._convert_drive_file(item, stats)
+                    yield key
+        
+        for file_path, processed_doc in self.document_processor.iter_process(local_paths(), checksums=checksums,
+                                                                             ready=ready):
+            if file_path in drive_keys:
+                # Failed Drive files were already counted and logged
+                drive_keys.discard(file_path)
+                if processed_doc:
+                    yield processed_doc
+                continue
+            item = pending.pop(file_path)
+            checksums.pop(file_path, None)
+            if processed_doc and processed_doc.get("content"):
+                # Keep the checksum and stat signature we already calculated
+                metadata = {**processed_doc["metadata"], **item["metadata"]}
+                yield {"file_key": file_path, "metadata": metadata, "content": processed_doc["content"],
+                       "force": item["force"]}
+            else:
+                if item["text"] is not None:
+                    item["text"].close()
+                _count(stats, "errors", _file_type(file_path))
+                logger.error(f"No content extracted for document {file_path}")
+            
+    def _convert_drive_file(self, item: Dict[str, Any], stats: Dict[str, int]) -> Optional[Dict[str, Any]]:
+        """Stream a Drive file to a spooled temporary file and convert it like a local one."""
+        file_id = item["file_id"]
+        try:
+            file_content = self.drive_connector.download_file(file_id)
+            if not file_content:
+                _count(stats, "errors", _drive_file_type(item["metadata"]))
+                return None
+            
+            with file_content:
+                processed_doc = self.document_processor.process_stream(
+                    file_content, item["metadata"].get("file_name", file_id),
+                    checksum=item["metadata"].get("checksum")
+                )
+            if not processed_doc or not processed_doc.get("content"):
+                _count(stats, "errors", _drive_file_type(item["metadata"]))
+                logger.error(f"No content extracted for document {file_id}")
+                return None
+            metadata = {**processed_doc["metadata"], **item["metadata"]}
+            return {"file_key": file_id, "metadata": metadata, "content": processed_doc["content"],
+                    "force": item["force"]}
+        except Exception as e:
+            _count(stats, "errors", _drive_file_type(item["metadata"]))
+            logger.error(f"Error processing document {file_id}: {e}", exc_info=True)
+            return None
+            
+    def _build_records(self, items: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Pipeline stage: chunk extracted content and keep only chunks that changed.
+        
+        Plain text that reached this stage without a checksum is hashed while
+        it is decoded; if its content turns out unchanged (the file was only
+        touched), it is passed on marked ``unchanged`` with no records.
+        """
+        for item in items:
+            file_key = item["file_key"]
+            metadata = item["metadata"]
+            content = item["content"]
+            with metrics.stage("chunk", metadata.get("file_type", "")):
+                if isinstance(content, TextFile):
+                    # Decoded a block at a time, so the file is never held as one string
+                    with content:
+                        chunks = self.chunker.chunk(file_key, content.lines())
+                    if metadata.get("checksum") is None:
+                        metadata["checksum"] = content.checksum()
+                else:
+                    chunks = self.chunker.chunk(file_key, content)
+            
+            stored_state = self.storage.get_file_state(file_key) or {}
+            if not item["force"] and stored_state and metadata.get("checksum") and \
+                    stored_state["metadata"].get("checksum") == metadata["checksum"]:
+                logger.debug(f"Skipping unchanged file: {file_key}")
+                yield {"file_key": file_key, "metadata": metadata, "stored_state": stored_state, "unchanged": True}
+                continue
+            previous_chunks = stored_state.get("chunks")
+            if previous_chunks is None:
+                # Indexed before chunking existed: the whole file was a single record
+                previous_chunks = {}
+                stale_ids = [file_key] if stored_state else []
+            else:
+                current_ids = {chunk["id"] for chunk in chunks}
+                stale_ids = [chunk_id for chunk_id in previous_chunks if chunk_id not in current_ids]
                 
-            except Exception as e:
-                error_count += 1
-                logger.error(f"Error processing document {file_path or file_id}: {e}", exc_info=True)
+            records = [
+                Record(
+                    value=chunk["text"],
+                    value_type="text",
+                    id=chunk["id"],
+                    attributes={
+                        **metadata,
+                        "source": file_key,
+                        "chunk_index": chunk["index"],
+                        "section": chunk["section"]
+                    }
+                )
+                for chunk in chunks
+                if item["force"] or previous_chunks.get(chunk["id"]) != chunk["hash"]
+            ]
+            logger.info(f"Prepared file for indexing: {file_key} (size: {metadata.get('size', 0)} bytes, "
+                        f"{len(records)}/{len(chunks)} chunks changed)")
+            yield {
+                "file_key": file_key,
+                "metadata": metadata,
+                "records": records,
+                "chunks": {chunk["id"]: chunk["hash"] for chunk in chunks},
+                "stale_ids": stale_ids
+            }
+            
+    def _upload(self, batch: UpsertBatch):
+        """Upsert a batch's records and delete its files' stale chunks (runs on a scheduler thread)."""
+        with metrics.stage("upsert", num_bytes=batch.num_bytes, records=len(batch.records)):
+            if batch.records:
+                self.index.upsert(batch.records)
+            stale_ids = [stale_id for file in batch.files for stale_id in file["stale_ids"]]
+            for stale_id in stale_ids:
+                self.index.delete_record(stale_id)
+        metrics.inc("indexer_records_total", len(batch.records), operation="upsert")
+        metrics.inc("indexer_records_total", len(stale_ids), operation="delete")
+        if self.sparse_index is not None:
+            self.sparse_index.add((record.id, record.value, record.attributes) for record in batch.records)
+            self.sparse_index.remove(stale_ids)
+            
+    def _commit(self, finished: List[Tuple[UpsertBatch, Optional[BaseException]]], stats: Dict[str, int],
+                job: Optional[IndexJob] = None, raise_errors: bool = True,
+                refreshed: Optional[List[Tuple[str, Dict[str, Any], Dict[str, Any]]]] = None):
+        """Commit the file states of the batches the index acknowledged, then raise the first failure.
+        
+        The new stat signatures collected in ``refreshed`` are stored first.
+        """
+        if refreshed:
+            with self.storage.batch():
+                while refreshed:
+                    key, metadata, stored_state = refreshed.pop()
+                    self.storage.update_file_state(key, metadata, chunks=stored_state.get("chunks"),
+                                                   last_indexed=stored_state.get("last_indexed"))
+        error = None
+        for batch, batch_error in finished:
+            if batch_error is not None:
+                logger.error(f"Error upserting documents to index: {batch_error}", exc_info=batch_error)
+                error = error or batch_error
+                continue
+            with metrics.stage("state_commit", files=len(batch)), self.storage.batch():
+                for file in batch.files:
+                    self.storage.update_file_state(file["file_key"], file["metadata"], chunks=file["chunks"])
+                    logger.debug(f"Successfully indexed file: {file['file_key']}")
+                self.storage.mark_updated()
+                if job:
+                    job.checkpoint(len(batch), len(batch.records))
+            for file in batch.files:
+                _count(stats, "indexed", file["metadata"].get("file_type", ""))
+            logger.info(f"Successfully indexed {len(batch)} new or modified documents "
+                        f"({len(batch.records)} chunks, {batch.num_bytes} bytes)")
+        if error is not None and raise_errors:
+            raise error
+            
+    def remove_documents(self, keys: Iterable[str]) -> int:
+        """Remove files (local paths or Drive IDs) from the index and the state store.
+        
+        Files are removed ``DELETE_BATCH_SIZE`` at a time: each batch's records
+        are deleted from the index concurrently and the batch's state changes
+        are committed together, so an interrupted removal keeps its progress.
+        A file whose records could not all be deleted stays in the state and
+        is retried by the next removal.
+        """
+        removed = 0
+        keys = iter(keys)
+        while True:
+            batch = list(itertools.islice(keys, DELETE_BATCH_SIZE))
+            if not batch:
+                return removed
+            removed += self._remove_batch(batch)
+    
+    def _remove_batch(self, keys: List[str]) -> int:
+        records = {}
+        for key in keys:
+            stored_state = self.storage.get_file_state(key)
+            if stored_state is not None:
+                records[key] = list(stored_state.get("chunks") or [key])
+        if not records:
+            return 0
         
-        # Only make API call if there are documents to index
-        if records_to_index:
+        failed = self._delete_records([record_id for record_ids in records.values() for record_id in record_ids])
+        removed = [key for key, record_ids in records.items() if failed.isdisjoint(record_ids)]
+        with self.storage.batch():
+            for key in removed:
+                self.storage.remove_file(key)
+                logger.info(f"Removed file from index: {key}")
+            if removed:
+                self.storage.mark_updated()
+        if self.sparse_index is not None:
+            self.sparse_index.remove(record_id for key in removed for record_id in records[key])
+        for key in records.keys() - set(removed):
+            logger.warning(f"Failed to delete {key} from index; it will be retried")
+        return len(removed)
+    
+    def _delete_records(self, record_ids: List[str]) -> set:
+        """Delete records from the index concurrently, returning the IDs that could not be deleted."""
+        def delete(record_id: str) -> Optional[str]:
             try:
-                self.index.upsert(records_to_index)
-                logger.info(f"Successfully indexed {len(records_to_index)} new or modified documents")
-                for record in records_to_index:
-                    logger.debug(f"Successfully indexed file: {record.id}")
+                self.index.delete_record(record_id)
             except Exception as e:
-                logger.error(f"Error upserting documents to index: {e}", exc_info=True)
-                raise
-                
-        logger.info(f"Indexing summary: {len(records_to_index)} indexed, {skipped_count} skipped, {error_count} errors")
-        return len(records_to_index)
-            
-    def search(self, query: str, **kwargs):
-        """Search the index with the given query."""
+                logger.warning(f"Failed to delete record {record_id} from index: {e}")
+                return record_id
+            return None
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(DELETE_MAX_WORKERS, len(record_ids))),
+                                thread_name_prefix="index-delete") as executor:
+            return {record_id for record_id in executor.map(delete, record_ids) if record_id is not None}
+    
+    def remove_directory(self, directory_path: str) -> int:
+        """Remove every indexed file below a directory."""
+        prefix = os.path.join(directory_path, "")
+        return self.remove_documents(list(self.storage.iter_file_keys(prefix)))
+    
+    def reconcile(self, seen: Iterable[str], candidates: Iterable[str], compact: bool = True) -> int:
+        """Remove the files among ``candidates`` that are not in ``seen``, the keys a completed scan found.
+        
+        ``candidates`` are the stored keys the scan covered, e.g. every key
+        below a scanned directory. Only keys are compared, so the diff costs one
+        pass over the state and no second scan; stale files are then removed
+        in batches, and with ``compact`` the state store is compacted when at
+        least ``STATE_COMPACT_RATIO`` of it was removed.
+        """
+        seen = seen if isinstance(seen, (set, frozenset)) else set(seen)
+        removed = self.remove_documents(key for key in candidates if key not in seen)
+        if removed:
+            logger.info(f"Reconciled index state: removed {removed} files that no longer exist")
+            if compact and removed >= (self.storage.count_files() + removed) * STATE_COMPACT_RATIO:
+                self.storage.compact()
+        return removed
+    
+    def reconcile_directory(self, directory_path: str, seen: Iterable[str], recursive: bool = True,
+                            failed_dirs: Iterable[str] = (), select: Optional[Callable[[str], bool]] = None,
+                            compact: bool = True) -> int:
+        """Remove indexed files below a directory that its latest scan did not find.
+        
+        Files in subdirectories are left alone after a non-recursive scan, and
+        so are files below ``failed_dirs`` (directories the scan could not read).
+        A scan restricted by ``select`` only reconciles the files it accepts.
+        """
+        prefix = os.path.join(directory_path, "")
+        protected = tuple(os.path.join(failed_dir, "") for failed_dir in failed_dirs)
+        if prefix in protected:
+            return 0
+        
+        def candidates():
+            for key in self.storage.iter_file_keys(prefix):
+                if not recursive and os.sep in key[len(prefix):]:
+                    continue
+                if not key.startswith(protected) and (select is None or select(key)):
+                    yield key
+        return self.reconcile(seen, candidates(), compact)
+
+    def sync_drive_folder(self, folder_id: str, recursive: bool = True, max_size: int = 10**6,
+                          full: bool = False) -> int:
+        """Index a Google Drive folder, incrementally if it has been synced before.
+
+        The first sync crawls the whole folder. Later syncs replay the Drive
+        change log from the page token saved in the index state, so only files
+        changed since then are looked at. Changes are detected from Drive's
+        server-side md5Checksum (or size and modifiedTime), so unchanged files
+        are never downloaded.
+        """
+        sync_state = None if full else self.storage.get_drive_sync_state(folder_id)
+        if sync_state and sync_state.get("recursive") == recursive:
+            return self._sync_drive_changes(folder_id, recursive, max_size, sync_state)
+
+        # Take the token before crawling so changes made during the crawl are replayed next time
+        page_token = self.drive_connector.get_start_page_token()
+        folders, failed, seen = set(), [], set()
+        job = self.start_job(f"drive:{folder_id}", recursive=recursive, max_size=max_size)
+        indexed = self.add_documents(self._drive_documents(folder_id, recursive, max_size, folders, failed, seen), job)
+        if not failed:
+            # Files indexed from these folders that the crawl did not find anymore
+            self.reconcile(seen, self._drive_keys_in(folders, skip=seen))
+        self._save_drive_sync_state(folder_id, page_token, folders, recursive, failed)
+        return indexed
+
+    def _drive_keys_in(self, folders: set, skip: set) -> Iterator[str]:
+        """Yield the stored Drive file keys, except those in ``skip``, whose parents include one of ``folders``.
+        
+        Drive files are keyed by file ID and local files by absolute path, so
+        only keys are listed and just the states of Drive files are loaded.
+        """
+        for key in self.storage.iter_file_keys():
+            if key in skip or os.path.isabs(key):
+                continue
+            state = self.storage.get_file_state(key)
+            if state and folders.intersection(state["metadata"].get("parents") or ()):
+                yield key
+
+    def _drive_documents(self, folder_id: str, recursive: bool, max_size: int,
+                         folders: set, failed: list, seen: Optional[set] = None) -> Iterator[Dict[str, Any]]:
+        """Crawl a Drive folder into documents for ``add_documents``."""
+        for file_info in self.drive_connector.scan_folder(folder_id, recursive, folders, failed):
+            if file_info["metadata"]["size"] <= max_size:
+                if seen is not None:
+                    seen.add(file_info["id"])
+                yield {"file_id": file_info["id"], "metadata": file_info["metadata"]}
+
+    def _sync_drive_changes(self, folder_id: str, recursive: bool, max_size: int,
+                            sync_state: Dict[str, Any]) -> int:
+        """Apply the Drive changes made since the saved page token to the index."""
+        folders = set(sync_state["folders"])
+        changes, page_token = self.drive_connector.list_changes(sync_state["page_token"])
+        documents, removed, new_folders = {}, set(), []
+
+        for change in changes:
+            file_id = change.get("fileId")
+            file = change.get("file") or {}
+            gone = change.get("removed") or file.get("trashed", False)
+            in_tree = any(parent in folders for parent in file.get("parents", []))
+
+            if file.get("mimeType") == FOLDER_MIME_TYPE:
+                if (gone or not in_tree) and file_id != folder_id:
+                    # Files that were inside stay indexed until the next full sync
+                    folders.discard(file_id)
+                elif recursive and not gone and file_id not in folders:
+                    # A folder created in or moved into the tree: its existing files
+                    # produce no changes of their own, so it has to be crawled
+                    folders.add(file_id)
+                    new_folders.append(file_id)
+                continue
+
+            if not gone and in_tree:
+                if is_supported_name(file.get("name", "")):
+                    metadata = self.drive_connector.metadata_from_file(file)
+                    if metadata["size"] <= max_size:
+                        documents[file_id] = {"file_id": file_id, "metadata": metadata}
+                        removed.discard(file_id)
+                continue
+
+            # Deleted, trashed or moved out of the tree: drop it if we indexed it from here
+            documents.pop(file_id, None)
+            stored_state = self.storage.get_file_state(file_id)
+            if stored_state:
+                stored_parents = stored_state["metadata"].get("parents")
+                if gone or not stored_parents or folders.intersection(stored_parents):
+                    removed.add(file_id)
+
+        logger.info(f"Drive folder {folder_id}: {len(changes)} changes since last sync, "
+                    f"{len(documents)} candidate files, {len(removed)} removed, {len(new_folders)} new folders")
+        if removed:
+            self.remove_documents(removed)
+
+        failed = []
+        crawled = (doc for new_folder in new_folders
+                   for doc in self._drive_documents(new_folder, True, max_size, folders, failed))
+        indexed = self.add_documents(itertools.chain(documents.values(), crawled))
+        self._save_drive_sync_state(folder_id, page_token, folders, recursive, failed)
+        return indexed
+
+    def _save_drive_sync_state(self, folder_id: str, page_token: str, folders: set, recursive: bool, failed: list):
+        """Advance the saved page token, unless some files or folders failed and must be retried."""
+        if failed or self.last_stats.get("errors"):
+            logger.warning(f"Drive sync of {folder_id} had errors; keeping the previous page token "
+                           f"so the failed files are retried next time")
+            return
+        self.storage.set_drive_sync_state(folder_id, page_token, folders, recursive)
+
+    @property
+    def version(self) -> Optional[str]:
+        """Stamp that changes whenever documents are added to or removed from the index."""
+        return self.storage.get_last_update()
+        
+    def _search_key(self, query: str, kwargs: Dict[str, Any]) -> Tuple[str, str, Optional[str]]:
+        # Filters are objects; key them by their attributes
+        options = json.dumps(kwargs, sort_keys=True, default=lambda value: getattr(value, "__dict__", repr(value)))
+        return query, options, self.version
+        
+    def search(self, query: str, use_cache: bool = True, hybrid: bool = True, rerank: bool = True, **kwargs):
+        """Search the index with the given query.
+        
+        With ``hybrid`` (and a local keyword index), the index results are fused
+        with BM25 keyword hits by reciprocal-rank fusion, so chunks containing
+        exact identifiers are found even when semantic search misses them.
+        ``rerank`` then moves hits that contain the query's identifiers (codes
+        with digits or separators, e.g. "INC-4521") verbatim to the front.
+        The response keeps the index's shape, with the fused score in ``score``.
+        
+        Results are memoized per ``(query, kwargs, index version)``, so repeated
+        searches against an unchanged index are answered locally. The memoized
+        result object is shared between callers and should not be modified.
+        """
+        hybrid = hybrid and self.sparse_index is not None
+        key = self._search_key(query, {**kwargs, "hybrid": hybrid, "rerank": rerank}) if use_cache else None
+        if key is not None:
+            result = self.search_cache.get(key)
+            if result is not None:
+                logger.debug(f"Search cache hit for query: {query}")
+                return result
         try:
             logger.debug(f"Searching index with query: {query}")
             result = self.index.search(query, **kwargs)
             logger.debug(f"Search completed successfully")
-            return result
         except Exception as e:
             logger.error(f"Search failed: {e}", exc_info=True)
             raise
+        if getattr(result, "status", None) == "FAILED":
+            return result
+        if hybrid:
+            result = self._hybrid_results(query, result, rerank, kwargs.get("top_k", 10), kwargs.get("filters") or [])
+        if key is not None:
+            self.search_cache.put(key, result)
+        return result
+        
+    def _hybrid_results(self, query: str, result: Any, rerank: bool, top_k: int, filters: List[Any]) -> Any:
+        """Fuse the index's hits with keyword hits, optionally re-ranking exact identifier matches."""
+        sparse_hits = []
+        for doc_id, _ in self.sparse_index.search(query, top_k * 2 if not filters else top_k * 10):
+            stored = self.sparse_index.get(doc_id)
+            if stored and all(matches_filter(stored[1], index_filter) for index_filter in filters):
+                sparse_hits.append({"score": 0.0, "data": stored[0], "document": doc_id, "metadata": stored[1]})
+        sparse_hits = sparse_hits[:top_k * 2]
+        if not sparse_hits:
+            return result
+        
+        dense_hits = result.details if isinstance(getattr(result, "details", None), list) else []
+        hits = {}
+        for hit in itertools.chain(dense_hits, sparse_hits):
+            hits.setdefault(self._hit_id(hit), hit)
+        fused = reciprocal_rank_fusion([[self._hit_id(hit) for hit in dense_hits],
+                                        [self._hit_id(hit) for hit in sparse_hits]], k=RRF_K)
+        ranked = [{**hits[hit_id], "score": score} for hit_id, score in fused]
+        
+        if rerank:
+            identifiers = [token for token in tokenize(query) if not token.isalpha()]
+            if identifiers:
+                # Stable sort: exact matches keep their fused order, ahead of the rest
+                ranked.sort(key=lambda hit: not any(token in str(hit.get("data", "")).lower()
+                                                    for token in identifiers))
+        
+        fused_result = copy.copy(result)
+        fused_result.details = ranked[:top_k]
+        if isinstance(result.data, str) and fused_result.details:
+            fused_result.data = fused_result.details[0].get("data", result.data)
+        return fused_result
+        
+    @staticmethod
+    def _hit_id(hit: Dict[str, Any]) -> str:
+        return hit.get("document") or hit.get("id") or str(hit.get("data"))
+        
+    def search_many(self, queries: Iterable[str], max_workers: int = SEARCH_MAX_WORKERS, **kwargs) -> List[Any]:
+        """Run several searches, returning results in input order.
+        
+        Duplicate queries are searched once, memoized results are reused and
+        the remaining searches run concurrently.
+        """
+        queries = list(queries)
+        unique = list(dict.fromkeys(queries))
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(unique))),
+                                thread_name_prefix="index-search") as executor:
+            results = dict(zip(unique, executor.map(lambda query: self.search(query, **kwargs), unique)))
+        return [results[query] for query in queries]
+        
+    @property
+    def search_stats(self) -> Dict[str, int]:
+        """Hit/miss counters and size of the search memoization cache."""
+        return self.search_cache.stats
     
     def get_indexed_files(self) -> Dict[str, Dict[str, Any]]:
         """Get information about all indexed files."""
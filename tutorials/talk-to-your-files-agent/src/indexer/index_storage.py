@@ -1,83 +1,63 @@
 """Module for managing persistent storage of index information."""
 
-import json
-import os
 import logging
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Iterable, Iterator
 from datetime import datetime
+from .state_backends import create_state_backend
+from ..config.settings import STATE_BACKEND
 
 logger = logging.getLogger(__name__)
 
 class IndexStorage:
-    def __init__(self, storage_dir: str):
-        """Initialize the index storage."""
+    def __init__(self, storage_dir: str, backend: str = STATE_BACKEND):
+        """Initialize the index storage on top of the configured state backend."""
         self.storage_dir = Path(storage_dir)
         self.index_file = self.storage_dir / "index_state.json"
         self.storage_dir.mkdir(parents=True, exist_ok=True)
-        self._load_state()
-        
-    def _load_state(self):
-        """Load the index state from disk."""
-        try:
-            if self.index_file.exists():
-                with open(self.index_file, 'r') as f:
-                    self.state = json.load(f)
-                logger.info(f"Loaded index state from {self.index_file}")
-            else:
-                self.state = {
-                    "files": {},  # File states
-                    "last_update": None,  # Last update timestamp
-                    "index_id": None,  # aiXplain index ID
-                }
-                logger.info("Created new index state")
-        except Exception as e:
-            logger.error(f"Error loading index state: {e}")
-            self.state = {
-                "files": {},
-                "last_update": None,
-                "index_id": None,
-            }
-            
-    def _save_state(self):
-        """Save the current state to disk."""
-        backup_file = None
+        self.backend = create_state_backend(backend, self.storage_dir)
+        logger.info(f"Loaded index state from {self.storage_dir} ({self.backend.name} backend)")
+
+    @contextmanager
+    def batch(self):
+        """Group state updates into a single commit.
+
+        Updates made inside the block are written together when it exits and
+        discarded if it raises.
+        """
+        self.backend.begin()
         try:
-            # Create a backup of the current state file
-            if self.index_file.exists():
-                backup_file = self.index_file.with_suffix('.json.bak')
-                self.index_file.rename(backup_file)
-            
-            # Write new state
-            with open(self.index_file, 'w') as f:
-                json.dump(self.state, f, indent=2)
-                
-            # Remove backup if save was successful
-            if backup_file and backup_file.exists():
-                backup_file.unlink()
-                
-            logger.debug("Successfully saved index state")
-            
-        except Exception as e:
-            logger.error(f"Error saving index state: {e}")
-            # Restore backup if available
-            if backup_file and backup_file.exists():
-                backup_file.rename(self.index_file)
-                logger.info("Restored index state from backup")
+            yield self
+        except Exception:
+            self.backend.rollback()
             raise
+        else:
+            self.backend.commit()
+
+    def close(self):
+        """Flush pending writes and release the backend."""
+        self.backend.close()
             
     def get_file_state(self, file_path: str) -> Optional[Dict[str, Any]]:
         """Get the stored state of a file."""
-        return self.state["files"].get(str(file_path))
+        return self.backend.get_file(str(file_path))
+        
+    def update_file_state(self, file_path: str, metadata: Dict[str, Any], chunks: Optional[Dict[str, str]] = None,
+                          last_indexed: Optional[str] = None):
+        """Update the state of a file, including the content hash of each indexed chunk.
         
-    def update_file_state(self, file_path: str, metadata: Dict[str, Any]):
-        """Update the state of a file."""
+        ``last_indexed`` keeps the time the file was last indexed when only its
+        metadata is refreshed; by default it is now.
+        """
         try:
-            self.state["files"][str(file_path)] = {
+            state = {
                 "metadata": metadata,
-                "last_indexed": datetime.now().isoformat()
+                "last_indexed": last_indexed or datetime.now().isoformat()
             }
-            self._save_state()
+            if chunks is not None:
+                state["chunks"] = chunks
+            self.backend.put_file(str(file_path), state)
             logger.debug(f"Updated state for file: {file_path}")
         except Exception as e:
             logger.error(f"Error updating file state for {file_path}: {e}")
@@ -86,13 +66,18 @@ class IndexStorage:
     def remove_file(self, file_path: str):
         """Remove a file from the index state."""
         try:
-            self.state["files"].pop(str(file_path), None)
-            self._save_state()
+            self.backend.delete_file(str(file_path))
             logger.debug(f"Removed file from state: {file_path}")
         except Exception as e:
             logger.error(f"Error removing file {file_path} from state: {e}")
             raise
         
+    def clear_files(self):
+        """Forget the state of every file, e.g. after switching to a different index."""
+        with self.batch():
+            for key in list(self.iter_file_keys()):
+                self.backend.delete_file(key)
+        
     def needs_indexing(self, file_path: str, current_metadata: Dict[str, Any]) -> bool:
         """Check if a file needs to be indexed based on its current state."""
         try:
@@ -134,9 +119,9 @@ class IndexStorage:
     def set_index_id(self, index_id: str):
         """Set the aiXplain index ID."""
         try:
-            self.state["index_id"] = index_id
-            self.state["last_update"] = datetime.now().isoformat()
-            self._save_state()
+            with self.batch():
+                self.backend.set_meta("index_id", index_id)
+                self.backend.set_meta("last_update", datetime.now().isoformat())
             logger.info(f"Set index ID: {index_id}")
         except Exception as e:
             logger.error(f"Error setting index ID: {e}")
@@ -144,8 +129,50 @@ class IndexStorage:
         
     def get_index_id(self) -> Optional[str]:
         """Get the stored aiXplain index ID."""
-        return self.state.get("index_id")
+        return self.backend.get_meta("index_id")
+        
+    def mark_updated(self):
+        """Record that the index contents changed; ``last_update`` serves as the index version."""
+        self.backend.set_meta("last_update", datetime.now().isoformat())
+        
+    def get_last_update(self) -> Optional[str]:
+        """Get the time the index contents last changed."""
+        return self.backend.get_meta("last_update")
+        
+    def get_drive_sync_state(self, folder_id: str) -> Optional[Dict[str, Any]]:
+        """Get the saved Drive sync state (changes page token and known folders) of a folder."""
+        return self.backend.get_meta(f"drive_sync:{folder_id}")
+
+    def set_drive_sync_state(self, folder_id: str, page_token: str, folder_ids: Iterable[str], recursive: bool):
+        """Save the Drive changes page token to resume an incremental folder sync from."""
+        self.backend.set_meta(f"drive_sync:{folder_id}", {
+            "page_token": page_token,
+            "folders": sorted(folder_ids),
+            "recursive": recursive,
+            "last_sync": datetime.now().isoformat()
+        })
+        logger.debug(f"Saved Drive sync state for folder {folder_id}")
+
+    def get_job(self, source: str) -> Optional[Dict[str, Any]]:
+        """Get the state of the latest indexing job over a source."""
+        return self.backend.get_meta(f"job:{source}")
+
+    def set_job(self, source: str, state: Dict[str, Any]):
+        """Save the state of an indexing job."""
+        self.backend.set_meta(f"job:{source}", state)
+
+    def iter_file_keys(self, prefix: Optional[str] = None) -> Iterator[str]:
+        """Iterate over stored file keys, optionally only those starting with ``prefix``."""
+        return self.backend.iter_keys(prefix)
+
+    def count_files(self) -> int:
+        """Number of files in the index state."""
+        return self.backend.count_files()
+
+    def compact(self):
+        """Reclaim the space left behind by removed files."""
+        self.backend.compact()
         
     def get_indexed_files(self) -> Dict[str, Dict[str, Any]]:
         """Get all indexed files and their states."""
-        return self.state["files"] 
\ No newline at end of file
+        return dict(self.backend.iter_files()) 
\ No newline at end of file
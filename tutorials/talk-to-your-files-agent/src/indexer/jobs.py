@@ -0,0 +1,83 @@
+"""Checkpointed indexing jobs that can resume after an interruption."""
+
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional
+from ..utils.logging_config import get_logger
+
+logger = get_logger('indexer')
+
+
+class IndexJob:
+    """One indexing run over a source (a directory, a Drive folder, ...).
+
+    The job's progress is saved in the index state in the same commit as the
+    file states of every flushed batch, so it always matches what the index
+    acknowledged. A job that did not complete (it failed, or the process was
+    killed) is resumed by the next run over the same source: files committed
+    since the job started and unchanged since are skipped even when the run
+    forces re-indexing, so the run continues from its last committed batch.
+    """
+
+    def __init__(self, storage, source: str, options: Optional[Dict[str, Any]] = None,
+                 state: Optional[Dict[str, Any]] = None):
+        self.storage = storage
+        self.source = source
+        state = state or {
+            "id": uuid.uuid4().hex,
+            "options": options or {},
+            "status": "running",
+            "started": datetime.now().isoformat(),
+            "batches": 0,
+            "files": 0,
+            "records": 0
+        }
+        self.state = state
+        self.resumed = False
+
+    @classmethod
+    def start(cls, storage, source: str, resume: bool = True, **options) -> "IndexJob":
+        """Resume the unfinished job of ``source`` with the same options, or start a new one."""
+        state = storage.get_job(source)
+        if resume and state and state["status"] != "completed" and state["options"] == options:
+            job = cls(storage, source, state=state)
+            job.resumed = True
+            job.state["status"] = "running"
+            logger.info(f"Resuming indexing job {job.id} for {source} after {state['files']} files "
+                        f"in {state['batches']} batches")
+        else:
+            job = cls(storage, source, options)
+        job.save()
+        return job
+
+    @property
+    def id(self) -> str:
+        return self.state["id"]
+
+    @property
+    def status(self) -> str:
+        return self.state["status"]
+
+    def committed(self, file_state: Optional[Dict[str, Any]]) -> bool:
+        """Whether a file's stored state was committed by this job."""
+        return bool(self.resumed and file_state and file_state.get("last_indexed", "") >= self.state["started"])
+
+    def checkpoint(self, files: int, records: int):
+        """Record a flushed batch; call inside the state batch that commits its files."""
+        self.state["batches"] += 1
+        self.state["files"] += files
+        self.state["records"] += records
+        self.save()
+
+    def complete(self, stats: Dict[str, int]):
+        self.state.update(status="completed", finished=datetime.now().isoformat(), stats=stats)
+        self.save()
+
+    def fail(self, error: BaseException):
+        self.state.update(status="failed", finished=datetime.now().isoformat(), error=str(error))
+        self.save()
+        logger.warning(f"Indexing job {self.id} for {self.source} stopped after {self.state['files']} files; "
+                       f"the next run resumes it")
+
+    def save(self):
+        self.storage.set_job(self.source, self.state)
@@ -0,0 +1,203 @@
+"""Helpers for running indexing stages concurrently with bounded memory."""
+
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED, ALL_COMPLETED
+from typing import Callable, Dict, Iterable, Iterator, Any, List, Optional, Tuple
+from ..utils.logging_config import get_logger
+from ..utils.metrics import metrics
+
+logger = get_logger('indexer')
+
+_DONE = object()
+
+
+class _StageError:
+    """Wraps an exception raised inside a stage so it can cross the queue."""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def stream_stage(source: Iterable[Any], maxsize: int, name: str = "stage") -> Iterator[Any]:
+    """Drain ``source`` on a background thread into a bounded queue.
+
+    The producing generator runs ahead of the consumer by at most ``maxsize``
+    items, so chaining stages gives a pipeline whose memory use is bounded by
+    the queue sizes rather than by the input size. Exceptions raised by the
+    source are re-raised in the consumer. Closing the returned iterator (or
+    letting it be garbage collected) stops the background thread.
+    """
+    items: "queue.Queue[Any]" = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run():
+        try:
+            for item in source:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(_StageError(e))
+            return
+        finally:
+            # Propagate shutdown to upstream stages
+            close = getattr(source, "close", None)
+            if close:
+                close()
+        put(_DONE)
+
+    thread = threading.Thread(target=run, name=f"indexer-{name}", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _StageError):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+
+
+class UpsertBatch:
+    """Accumulates prepared files until a record-count or byte threshold is hit.
+
+    A prepared file is a dict with ``file_key``, ``metadata`` and the
+    ``records`` to upsert for it (plus whatever state the flush needs).
+    """
+
+    def __init__(self, max_records: int, max_bytes: int):
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.clear()
+
+    def clear(self):
+        self.records = []
+        self.files = []
+        self.num_bytes = 0
+
+    def add(self, prepared_file: dict):
+        """Add one prepared file with all of its records, so a file is never split across flushes."""
+        records = prepared_file["records"]
+        self.records.extend(records)
+        self.files.append(prepared_file)
+        self.num_bytes += sum(len(str(record.value).encode('utf-8')) for record in records)
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    @property
+    def is_full(self) -> bool:
+        return len(self.records) >= self.max_records or self.num_bytes >= self.max_bytes
+
+
+class UpsertScheduler:
+    """Sends upsert batches in the background with retries and adaptive sizing.
+
+    At most ``max_in_flight`` batches are sent at once. A failed send is
+    retried up to ``max_retries`` times after a jittered exponential backoff
+    (a random delay of up to ``base_delay * 2 ** attempt``, capped at
+    ``max_delay``). The batch size and in-flight window adapt AIMD-style:
+    every fast send raises ``record_limit`` by a tenth of ``max_records`` and
+    the window by one, while an error halves both and a send slower than
+    ``target_latency`` halves the batch size, so bulk loads settle near the
+    throughput the service sustains without tripping its rate limits.
+
+    ``reserve``, ``submit`` and ``drain`` return ``(payload, error)`` pairs for
+    the sends that finished, where ``error`` is None on success.
+    """
+
+    def __init__(self, send: Callable[[Any], Any], max_records: int, min_records: int = 1,
+                 max_in_flight: int = 4, max_retries: int = 3, base_delay: float = 1.0,
+                 max_delay: float = 30.0, target_latency: float = 10.0):
+        self.send = send
+        self.max_records = max(1, max_records)
+        self.min_records = max(1, min(min_records, self.max_records))
+        self.record_limit = self.max_records
+        self.step = max(1, self.max_records // 10)
+        self.max_in_flight = max(1, max_in_flight)
+        self.window = self.max_in_flight
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.target_latency = target_latency
+        self.stats = {"requests": 0, "retries": 0, "failures": 0}
+        self._in_flight: Dict[Future, Any] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="index-upsert")
+
+    def reserve(self) -> List[Tuple[Any, Optional[BaseException]]]:
+        """Wait until the window has room for another send, returning the sends that finished meanwhile.
+
+        Callers that stop on the first failure call this before building the
+        next payload, so nothing more is sent once a failure is known.
+        """
+        finished = []
+        while len(self._in_flight) >= self.window:
+            finished.extend(self._collect(FIRST_COMPLETED))
+        return finished
+
+    def submit(self, payload: Any) -> List[Tuple[Any, Optional[BaseException]]]:
+        """Queue a send once the window has room, returning the sends that finished meanwhile."""
+        finished = self.reserve()
+        self._in_flight[self._executor.submit(self._send, payload)] = payload
+        return finished
+
+    def drain(self) -> List[Tuple[Any, Optional[BaseException]]]:
+        """Wait for every queued send to finish."""
+        return self._collect(ALL_COMPLETED) if self._in_flight else []
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def _collect(self, return_when: str) -> List[Tuple[Any, Optional[BaseException]]]:
+        done, _ = wait(list(self._in_flight), return_when=return_when)
+        return [(self._in_flight.pop(future), future.exception()) for future in done]
+
+    def _send(self, payload: Any):
+        for attempt in range(self.max_retries + 1):
+            started = time.monotonic()
+            try:
+                with self._lock:
+                    self.stats["requests"] += 1
+                self.send(payload)
+            except Exception as e:
+                self._adapt(error=True)
+                if attempt == self.max_retries:
+                    with self._lock:
+                        self.stats["failures"] += 1
+                    metrics.inc("indexer_upsert_failures_total")
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                logger.warning(f"Upsert failed ({e}); retrying in {delay:.1f}s "
+                               f"(attempt {attempt + 1} of {self.max_retries})")
+                with self._lock:
+                    self.stats["retries"] += 1
+                metrics.inc("indexer_upsert_retries_total")
+                time.sleep(delay)
+            else:
+                self._adapt(latency=time.monotonic() - started)
+                return
+
+    def _adapt(self, latency: float = 0.0, error: bool = False):
+        with self._lock:
+            if error or latency > self.target_latency:
+                self.record_limit = max(self.min_records, self.record_limit // 2)
+            else:
+                self.record_limit = min(self.max_records, self.record_limit + self.step)
+            if error:
+                self.window = max(1, self.window // 2)
+            else:
+                self.window = min(self.max_in_flight, self.window + 1)
@@ -0,0 +1,289 @@
+"""Retrieval backends that IndexManager upserts chunks to and searches.
+
+A backend offers the part of the aiXplain ``IndexModel`` interface that
+IndexManager uses (``id``, ``upsert``, ``delete_record``, ``search`` and
+``count``), so the remote aiXplain index and the local implementations here
+are interchangeable. ``LocalIndex`` runs entirely offline, which makes the
+indexing pipeline testable and benchmarkable without the service.
+"""
+
+import json
+import math
+import sqlite3
+import threading
+import uuid
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from ..config.settings import EMBEDDING_DIM
+from ..utils.lazy import LazyImport
+from .sparse_index import SparseIndex, tokenize, reciprocal_rank_fusion
+
+np = LazyImport("numpy")
+ResponseStatus = LazyImport("aixplain.enums", "ResponseStatus")
+Record = LazyImport("aixplain.modules.model.record", "Record")
+ModelResponse = LazyImport("aixplain.modules.model.response", "ModelResponse")
+
+
+class RetrievalBackend:
+    """Interface for retrieval backends (the aiXplain index satisfies it as is)."""
+
+    id: str
+    # Whether search already ranks exact keyword matches, so no separate keyword index is needed
+    keyword_search: bool = False
+    # Whether several processes may write to the same index at once (the remote index can)
+    process_safe: bool = False
+
+    def upsert(self, documents: List["Record"]) -> "ModelResponse":
+        raise NotImplementedError
+
+    def delete_record(self, record_id: str) -> "ModelResponse":
+        raise NotImplementedError
+
+    def search(self, query: str, top_k: int = 10, filters: Optional[List[Any]] = None,
+               score_threshold: float = 0.0) -> "ModelResponse":
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class HashingEmbedder:
+    """Dependency-free text embedder based on feature hashing.
+
+    Words and their character trigrams are hashed into ``dim`` signed buckets
+    with sublinear term weighting, and the result is L2-normalized. It needs
+    no model download, which is what offline tests and benchmarks want; pass a
+    real embedding model to ``LocalIndex`` for better semantic recall.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> Counter:
+        features = Counter()
+        for token, tf in Counter(tokenize(text)).items():
+            weight = 1.0 + math.log(tf)
+            features[token] += weight
+            padded = f"#{token}#"
+            for i in range(len(padded) - 2):
+                features[padded[i:i + 3]] += 0.5 * weight
+        return features
+
+    def __call__(self, texts: Sequence[str]) -> "np.ndarray":
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text).items():
+                h = zlib.crc32(feature.encode("utf-8"))
+                vectors[row, h % self.dim] += weight if h & 0x80000000 else -weight
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+def matches_filter(attributes: Dict[str, Any], index_filter: Any) -> bool:
+    """Evaluate an ``IndexFilter`` (field, value, operator) against record attributes."""
+    operator = getattr(index_filter.operator, "value", index_filter.operator)
+    value = attributes.get(index_filter.field)
+    expected = index_filter.value
+    try:
+        if operator == "==":
+            return value == expected
+        if operator == "!=":
+            return value != expected
+        if operator == "in":
+            return value is not None and expected in value
+        if operator == "not in":
+            return value is None or expected not in value
+        if operator == ">":
+            return value is not None and value > expected
+        if operator == "<":
+            return value is not None and value < expected
+        if operator == ">=":
+            return value is not None and value >= expected
+        if operator == "<=":
+            return value is not None and value <= expected
+    except TypeError:
+        return False
+    raise ValueError(f"Unsupported filter operator: {operator}")
+
+
+class LocalIndex(RetrievalBackend):
+    """Offline hybrid index: a memory-mapped embedding matrix plus a BM25 inverted index.
+
+    Files in ``directory``:
+
+    - ``embeddings.f32``: float32 matrix with one row per record, memory-mapped
+      and grown by doubling; rows of deleted records are reused
+    - ``records.db``: SQLite table of record ID, matrix row, text and attributes
+    - ``bm25.db``: the keyword index (see ``SparseIndex``)
+
+    ``search`` ranks by cosine similarity and BM25 separately and fuses the two
+    rankings with reciprocal-rank fusion; a hit's ``score`` is its fused score.
+    The row map is held in memory, so only one process may write to an index.
+    Results follow the aiXplain response shape: ``details`` is a list of
+    ``{"score", "data", "document", "metadata"}`` hits and ``data`` is the text
+    of the best hit.
+    """
+
+    keyword_search = True
+
+    def __init__(self, directory: Path, embedder: Optional[Callable[[Sequence[str]], "np.ndarray"]] = None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.embedder = embedder or HashingEmbedder()
+        self.id = f"local:{self.directory}"
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.directory / "records.db"), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS records (id TEXT PRIMARY KEY, row INTEGER UNIQUE NOT NULL, "
+            "value TEXT NOT NULL, attributes TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.sparse = SparseIndex(self.directory / "bm25.db")
+
+        self._rows: Dict[str, int] = dict(self._conn.execute("SELECT id, row FROM records"))
+        self._matrix_path = self.directory / "embeddings.f32"
+        self._matrix = None
+        self.dim = len(self.embedder(["dimension probe"])[0])
+        self._open_matrix(max(len(self._rows), 1))
+        self._free = sorted(set(range(self._matrix.shape[0])) - set(self._rows.values()), reverse=True)
+
+        embedder_name = getattr(self.embedder, "name", type(self.embedder).__name__)
+        stored = self._conn.execute("SELECT value FROM meta WHERE key = 'embedder'").fetchone()
+        if stored and stored[0] != embedder_name and self._rows:
+            self._reembed()
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('embedder', ?)", (embedder_name,))
+
+    def _open_matrix(self, min_rows: int):
+        """Map the embedding file, growing it (by doubling) to at least ``min_rows`` rows."""
+        row_bytes = self.dim * 4
+        current = self._matrix_path.stat().st_size // row_bytes if self._matrix_path.exists() else 0
+        rows = current
+        if rows < min_rows:
+            rows = max(min_rows, 2 * current, 64)
+            if self._matrix is not None:
+                self._matrix.flush()
+                self._matrix = None
+            with open(self._matrix_path, "ab") as f:
+                f.truncate(rows * row_bytes)
+        if self._matrix is None or self._matrix.shape[0] != rows:
+            self._matrix = np.memmap(self._matrix_path, dtype=np.float32, mode="r+", shape=(rows, self.dim))
+        if rows > current and current and hasattr(self, "_free"):
+            self._free = sorted(set(self._free) | set(range(current, rows)), reverse=True)
+
+    def _allocate_row(self) -> int:
+        if not self._free:
+            self._open_matrix(self._matrix.shape[0] + 1)
+        return self._free.pop()
+
+    def _reembed(self):
+        """Recompute every stored embedding after the embedder changed."""
+        rows = self._conn.execute("SELECT row, value FROM records").fetchall()
+        for start in range(0, len(rows), 256):
+            batch = rows[start:start + 256]
+            self._matrix[[row for row, _ in batch]] = self.embedder([value for _, value in batch])
+        self._matrix.flush()
+
+    def upsert(self, documents: List["Record"]) -> "ModelResponse":
+        """Insert or replace records, embedding and keyword-indexing their text."""
+        vectors = self.embedder([str(doc.value) for doc in documents])
+        payloads = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for doc, vector in zip(documents, vectors):
+                    doc.id = doc.id or str(uuid.uuid4())
+                    row = self._rows.get(doc.id)
+                    if row is None:
+                        row = self._allocate_row()
+                    self._matrix[row] = vector
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO records (id, row, value, attributes) VALUES (?, ?, ?, ?)",
+                        (doc.id, row, str(doc.value), json.dumps(doc.attributes or {}, default=str))
+                    )
+                    self._rows[doc.id] = row
+                    payloads.append(doc.to_dict())
+                self._matrix.flush()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._rows = dict(self._conn.execute("SELECT id, row FROM records"))
+                raise
+            self.sparse.add((doc.id, str(doc.value)) for doc in documents)
+        return ModelResponse(status=ResponseStatus.SUCCESS, data=payloads, completed=True)
+
+    def delete_record(self, record_id: str) -> "ModelResponse":
+        """Delete a record; deleting an unknown ID is a no-op."""
+        with self._lock:
+            row = self._rows.pop(record_id, None)
+            if row is not None:
+                self._conn.execute("DELETE FROM records WHERE id = ?", (record_id,))
+                self._matrix[row] = 0
+                self._free.append(row)
+                self.sparse.remove([record_id])
+        return ModelResponse(status=ResponseStatus.SUCCESS, data=record_id, completed=True)
+
+    def search(self, query: str, top_k: int = 10, filters: Optional[List[Any]] = None,
+               score_threshold: float = 0.0) -> "ModelResponse":
+        """Hybrid dense + BM25 search; filters are applied to record attributes."""
+        filters = filters or []
+        with self._lock:
+            if not self._rows:
+                return ModelResponse(status=ResponseStatus.SUCCESS, data="", details=[], completed=True)
+            ids = list(self._rows)
+            # Filtered searches rank everything so that filtering cannot starve the top k
+            candidates = len(ids) if filters else max(top_k * 5, 50)
+
+            rows = np.fromiter((self._rows[doc_id] for doc_id in ids), dtype=np.int64, count=len(ids))
+            query_vector = np.asarray(self.embedder([query])[0], dtype=np.float32)
+            similarities = self._matrix[rows] @ query_vector
+            if candidates < len(ids):
+                top = np.argpartition(-similarities, candidates - 1)[:candidates]
+            else:
+                top = np.arange(len(ids))
+            dense_ranking = [ids[i] for i in top[np.argsort(-similarities[top])]]
+            sparse_ranking = [doc_id for doc_id, _ in self.sparse.search(query, candidates)]
+
+            hits = []
+            for doc_id, score in reciprocal_rank_fusion([dense_ranking, sparse_ranking]):
+                if score < score_threshold or len(hits) == top_k:
+                    break
+                row = self._conn.execute("SELECT value, attributes FROM records WHERE id = ?", (doc_id,)).fetchone()
+                if row is None:
+                    continue
+                attributes = json.loads(row[1])
+                if all(matches_filter(attributes, index_filter) for index_filter in filters):
+                    hits.append({"score": score, "data": row[0], "document": doc_id, "metadata": attributes})
+        return ModelResponse(status=ResponseStatus.SUCCESS, data=hits[0]["data"] if hits else "",
+                             details=hits, completed=True)
+
+    def count(self) -> int:
+        return len(self._rows)
+
+    def close(self):
+        with self._lock:
+            if self._matrix is not None:
+                self._matrix.flush()
+            self._conn.close()
+            self.sparse.close()
+
+
+RETRIEVAL_BACKENDS = {
+    "local": LocalIndex,
+}
+
+
+def create_retrieval_backend(name: str, directory: Path) -> RetrievalBackend:
+    """Create a local retrieval backend by name, storing its files in ``directory``."""
+    try:
+        backend_class = RETRIEVAL_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown retrieval backend '{name}', expected 'aixplain' or one of {sorted(RETRIEVAL_BACKENDS)}")
+    return backend_class(Path(directory) / f"{name}_index")
@@ -0,0 +1,154 @@
+"""Indexing of many directory roots, sharded across worker processes.
+
+``ShardedIndexer`` assigns every file to one of ``workers`` shards by a
+stable hash of its path. Each worker process lists the roots but only stats,
+hashes, converts and upserts the files of its own shard, and reconciles only
+its own shard's stored files, so no two workers ever touch the same file
+state or index record. The workers share one index and one state store,
+which must be safe for concurrent processes: the SQLite state backend (WAL
+mode) and the remote aiXplain index are, the local index is single-writer.
+"""
+
+import multiprocessing
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Type, Union
+from .index_manager import IndexManager
+from .retrieval_backends import RETRIEVAL_BACKENDS, RetrievalBackend
+from .state_backends import STATE_BACKENDS
+from ..config.aixplain_config import MAX_FILE_SIZE
+from ..config.settings import INDEXED_DIR, INDEX_WORKERS, RETRIEVAL_BACKEND, STATE_BACKEND, STATE_COMPACT_RATIO
+from ..utils.logging_config import get_logger
+from ..utils.metrics import metrics
+
+logger = get_logger('indexer')
+
+Backend = Union[str, Type[RetrievalBackend]]
+
+
+def shard_of(path: str, shards: int) -> int:
+    """The shard a file path belongs to; unlike ``hash()`` it is the same in every process."""
+    return zlib.crc32(os.fsencode(path)) % shards
+
+
+def _open_backend(backend: Backend, state_dir: Path) -> Union[str, RetrievalBackend]:
+    return backend if isinstance(backend, str) else backend(state_dir / "index")
+
+
+def _index_roots(manager: IndexManager, roots: Sequence[str], shard: int, shards: int, recursive: bool,
+                 force: bool, prune: bool, resume: bool) -> Dict[str, Any]:
+    """Index one shard of every root with ``manager``, as ``FileAgent.index_directory`` does for one root."""
+    select = (lambda path: shard_of(path, shards) == shard) if shards > 1 else None
+    stats: Dict[str, int] = {}
+    removed = 0
+    for root in roots:
+        scanned, failed_dirs = set(), []
+
+        def documents():
+            for file_path, file_stats in manager.local_connector.scan_directory_entries(
+                    root, recursive, failed_dirs, select=select):
+                if file_stats.st_size <= MAX_FILE_SIZE:
+                    scanned.add(file_path)
+                    doc = {"file_path": file_path, "size": file_stats.st_size, "stats": file_stats}
+                    if force:
+                        doc["force"] = True
+                    yield doc
+
+        # Each shard is its own job, so an interrupted shard resumes without the others
+        source = f"directory:{root}" if shards == 1 else f"directory:{root}#shard{shard}/{shards}"
+        job = manager.start_job(source, resume=resume, recursive=recursive, force=force)
+        manager.add_documents(documents(), job)
+        for outcome, count in manager.last_stats.items():
+            stats[outcome] = stats.get(outcome, 0) + count
+        if prune:
+            # Compacting is left to the coordinator, once every worker is done writing
+            removed += manager.reconcile_directory(root, scanned, recursive, failed_dirs, select, compact=False)
+    return {"stats": stats, "removed": removed}
+
+
+def _run_worker(config: Dict[str, Any], backend: Backend, roots: Sequence[str], shard: int, shards: int,
+                options: Dict[str, bool]) -> Dict[str, Any]:
+    """Entry point of a worker process: index a shard and report its stats and metrics."""
+    manager = IndexManager(**config, backend=_open_backend(backend, config["state_dir"]))
+    try:
+        result = _index_roots(manager, roots, shard, shards, **options)
+    finally:
+        manager.storage.close()
+        if manager.sparse_index is not None:
+            manager.sparse_index.close()
+        if isinstance(manager.index, RetrievalBackend):
+            manager.index.close()
+    result["metrics"] = metrics.snapshot()
+    return result
+
+
+class ShardedIndexer:
+    """Indexes many directory roots into one index with a pool of worker processes.
+
+    Every worker opens its own ``IndexManager`` on the shared state directory
+    (by default ``INDEXED_DIR / agent_id``, as for a single agent) and
+    indexes the files whose ``shard_of`` is its number; their stats are
+    summed into ``last_stats`` and their metrics merged into the parent's
+    registry. ``backend`` is a retrieval backend name or a
+    ``RetrievalBackend`` class, instantiated in each worker with a directory
+    in the state directory. With more than one worker the state backend
+    (``STATE_BACKEND``) and the retrieval backend must be ``process_safe``.
+    ``index_manager``, an open manager of the same index, is reused for work
+    done in this process instead of opening a second one.
+    """
+
+    def __init__(self, name: str, description: str, agent_id: str, backend: Backend = RETRIEVAL_BACKEND,
+                 state_dir: Optional[Path] = None, workers: int = INDEX_WORKERS,
+                 index_manager: Optional[IndexManager] = None):
+        self.workers = max(1, workers)
+        self.backend = backend
+        self.state_dir = Path(state_dir) if state_dir else INDEXED_DIR / agent_id
+        if self.workers > 1:
+            if not STATE_BACKENDS[STATE_BACKEND].process_safe:
+                raise ValueError(f"The '{STATE_BACKEND}' state backend cannot be shared by worker processes; "
+                                 f"use 'sqlite' or a single worker")
+            backend_class = RETRIEVAL_BACKENDS.get(backend) if isinstance(backend, str) else backend
+            if backend != "aixplain" and not getattr(backend_class, "process_safe", False):
+                raise ValueError(f"The retrieval backend {backend!r} cannot be shared by worker processes; "
+                                 f"use 'aixplain' or a single worker")
+        self.config = {"name": name, "description": description, "agent_id": agent_id, "state_dir": self.state_dir}
+        # Opened before any worker starts, so the index is created (and its ID stored) only once
+        self.index_manager = index_manager or IndexManager(**self.config,
+                                                           backend=_open_backend(backend, self.state_dir))
+        self.last_stats: Dict[str, int] = {}
+
+    def index_directories(self, directory_paths: Sequence[str], recursive: bool = True, force: bool = False,
+                          prune: bool = True, resume: bool = True) -> int:
+        """Index every supported file below ``directory_paths``; returns the number of files indexed.
+
+        ``recursive``, ``force``, ``prune`` and ``resume`` mean what they do for
+        ``FileAgent.index_directory``; each shard is a separate checkpointed job.
+        """
+        roots = [os.path.normpath(path) for path in directory_paths]
+        options = {"recursive": recursive, "force": force, "prune": prune, "resume": resume}
+        if self.workers == 1:
+            results = [_index_roots(self.index_manager, roots, 0, 1, **options)]
+        else:
+            # Spawned rather than forked: the parent holds SQLite connections and threads
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(self.workers, mp_context=context) as executor:
+                futures = [executor.submit(_run_worker, self.config, self.backend, roots, shard, self.workers, options)
+                           for shard in range(self.workers)]
+                results = [future.result() for future in futures]
+            for result in results:
+                metrics.merge(result.pop("metrics"))
+
+        stats: Dict[str, int] = {}
+        for result in results:
+            for outcome, count in result["stats"].items():
+                stats[outcome] = stats.get(outcome, 0) + count
+        removed = sum(result["removed"] for result in results)
+        storage = self.index_manager.storage
+        if removed and removed >= (storage.count_files() + removed) * STATE_COMPACT_RATIO:
+            storage.compact()
+        self.last_stats = {**stats, "removed": removed}
+        logger.info(f"Indexed {len(roots)} roots with {self.workers} workers: {stats.get('indexed', 0)} indexed, "
+                    f"{stats.get('skipped', 0)} skipped, {stats.get('errors', 0)} errors, {removed} removed")
+        return stats.get("indexed", 0)
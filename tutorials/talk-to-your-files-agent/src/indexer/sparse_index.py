@@ -0,0 +1,174 @@
+"""Persistent BM25 keyword index and rank fusion helpers."""
+
+import json
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Words and identifiers such as "INC-4521", "v2.3.1" or "part_no_77"
+_TOKEN = re.compile(r"[0-9a-z]+(?:[-_./:#][0-9a-z]+)*")
+_PART = re.compile(r"[0-9a-z]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase terms.
+
+    Compound identifiers are kept whole, so exact codes match exactly, and
+    are also split into their parts.
+    """
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(_PART.findall(token))
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse several rankings of IDs into one, scoring each ID by ``sum(1 / (k + rank))``."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class SparseIndex:
+    """BM25 inverted index stored in SQLite and updated one document at a time.
+
+    Postings live in a ``(term, doc_id) -> tf`` table, so adding or removing a
+    document touches only that document's rows and nothing is rebuilt. With
+    ``store_documents`` the text and attributes of each document are kept as
+    well, so keyword hits can be returned without another lookup. Several
+    processes may share one index file: the cached totals are reloaded
+    whenever another connection has committed.
+    """
+
+    def __init__(self, path: Path, k1: float = 1.5, b: float = 0.75, store_documents: bool = False):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.k1 = k1
+        self.b = b
+        self.store_documents = store_documents
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs (doc_id TEXT PRIMARY KEY, length INTEGER NOT NULL, "
+            "text TEXT, attributes TEXT)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(docs)")}
+        for column in ("text", "attributes"):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE docs ADD COLUMN {column} TEXT")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings (term TEXT NOT NULL, doc_id TEXT NOT NULL, tf INTEGER NOT NULL, "
+            "PRIMARY KEY (term, doc_id)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id)")
+        self._data_version = None
+        self._sync_totals()
+
+    def add(self, documents: Iterable[Tuple]):
+        """Index ``(doc_id, text)`` or ``(doc_id, text, attributes)`` tuples, replacing earlier versions."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._sync_totals()
+                for doc_id, text, *attributes in documents:
+                    self._remove(doc_id)
+                    terms = Counter(tokenize(text))
+                    length = sum(terms.values())
+                    stored = (text, json.dumps(attributes[0] if attributes else {}, default=str)) \
+                        if self.store_documents else (None, None)
+                    self._conn.execute("INSERT INTO docs (doc_id, length, text, attributes) VALUES (?, ?, ?, ?)",
+                                       (doc_id, length, *stored))
+                    self._conn.executemany(
+                        "INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)",
+                        ((term, doc_id, tf) for term, tf in terms.items())
+                    )
+                    self._num_docs += 1
+                    self._total_length += length
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._reload_totals()
+                raise
+
+    def remove(self, doc_ids: Iterable[str]):
+        """Remove documents from the index."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._sync_totals()
+                for doc_id in doc_ids:
+                    self._remove(doc_id)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._reload_totals()
+                raise
+
+    def _remove(self, doc_id: str):
+        row = self._conn.execute("SELECT length FROM docs WHERE doc_id = ?", (doc_id,)).fetchone()
+        if row is None:
+            return
+        self._conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+        self._conn.execute("DELETE FROM docs WHERE doc_id = ?", (doc_id,))
+        self._num_docs -= 1
+        self._total_length -= row[0]
+
+    def _reload_totals(self):
+        self._num_docs, self._total_length = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs").fetchone()
+
+    def _sync_totals(self):
+        """Reload the totals if another connection committed since they were computed."""
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version:
+            self._data_version = version
+            self._reload_totals()
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        """Return up to ``top_k`` ``(doc_id, bm25_score)`` pairs, best first."""
+        terms = set(tokenize(query))
+        with self._lock:
+            self._sync_totals()
+            if not terms or not self._num_docs:
+                return []
+            avg_length = self._total_length / self._num_docs
+            scores: Dict[str, float] = {}
+            for term in terms:
+                rows = self._conn.execute(
+                    "SELECT p.doc_id, p.tf, d.length FROM postings p JOIN docs d ON d.doc_id = p.doc_id "
+                    "WHERE p.term = ?", (term,)
+                ).fetchall()
+                if not rows:
+                    continue
+                idf = math.log(1 + (self._num_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+                for doc_id, tf, length in rows:
+                    norm = tf + self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+    def get(self, doc_id: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Return the stored ``(text, attributes)`` of a document, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT text, attributes FROM docs WHERE doc_id = ?", (doc_id,)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return row[0], json.loads(row[1] or "{}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._sync_totals()
+            return self._num_docs
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
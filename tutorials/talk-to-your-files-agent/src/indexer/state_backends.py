@@ -0,0 +1,502 @@
+"""Pluggable persistence engines for the index state.
+
+Every backend stores two things: per-file states keyed by path (or Drive file
+ID) and a small set of metadata values such as ``index_id`` and
+``last_update``. ``IndexStorage`` talks to them through ``StateBackend`` so the
+on-disk format can be chosen per deployment.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Any, Optional, Iterator, Tuple
+
+from ..utils.logging_config import get_logger
+
+logger = get_logger('state')
+
+LEGACY_STATE_FILE = "index_state.json"
+
+
+class StateBackend(ABC):
+    """Base class for index state backends.
+
+    Writes made between ``begin()`` and ``commit()`` are grouped into a single
+    durable unit; writes made outside of a batch are committed immediately.
+    """
+
+    name = "base"
+    # Whether several processes may read and write the same store at once
+    process_safe = False
+
+    def __init__(self, storage_dir: Path):
+        self.storage_dir = Path(storage_dir)
+        self.bytes_written = 0
+        self._batch_depth = 0
+
+    @abstractmethod
+    def get_file(self, key: str) -> Optional[Dict[str, Any]]:
+        """The stored state of a file, or ``None``."""
+
+    @abstractmethod
+    def put_file(self, key: str, state: Dict[str, Any]):
+        """Store the state of a file, replacing any previous one."""
+
+    @abstractmethod
+    def delete_file(self, key: str):
+        """Forget a file's state."""
+
+    @abstractmethod
+    def iter_files(self, prefix: Optional[str] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yield ``(key, state)`` for every file, or those whose key starts with ``prefix``."""
+
+    def iter_keys(self, prefix: Optional[str] = None) -> Iterator[str]:
+        for key, _ in self.iter_files(prefix):
+            yield key
+
+    def count_files(self) -> int:
+        return sum(1 for _ in self.iter_files())
+
+    @abstractmethod
+    def get_meta(self, key: str, default: Any = None) -> Any:
+        """A metadata value, or ``default``."""
+
+    @abstractmethod
+    def set_meta(self, key: str, value: Any):
+        """Store a metadata value."""
+
+    def begin(self):
+        """Start (or nest into) a batch of writes."""
+        self._batch_depth += 1
+
+    def commit(self):
+        """Finish a batch, flushing it to disk when the outermost batch ends."""
+        self._batch_depth = max(0, self._batch_depth - 1)
+        if self._batch_depth == 0:
+            self._flush()
+
+    def rollback(self):
+        """Abandon the outermost batch."""
+        self._batch_depth = 0
+        self._discard()
+
+    @property
+    def in_batch(self) -> bool:
+        return self._batch_depth > 0
+
+    def compact(self):
+        """Reclaim space used by deleted or superseded entries."""
+
+    def close(self):
+        """Flush pending writes and release resources."""
+        self._flush()
+
+    def _flush(self):
+        """Make pending writes durable."""
+
+    def _discard(self):
+        """Drop pending writes that have not been flushed."""
+
+    def _autocommit(self):
+        if not self.in_batch:
+            self._flush()
+
+
+def _load_legacy_state(path: Path) -> Optional[Dict[str, Any]]:
+    """Read a legacy ``index_state.json`` file, falling back to its backup."""
+    for candidate in (path, path.with_suffix('.json.bak')):
+        if not candidate.exists():
+            continue
+        try:
+            with open(candidate, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading index state from {candidate}: {e}")
+    return None
+
+
+def _write_json_atomically(path: Path, data: Dict[str, Any], indent: Optional[int] = None) -> int:
+    """Write JSON to a temporary file and atomically move it into place."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    payload = json.dumps(data, indent=indent)
+    with open(tmp_path, 'w') as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(payload)
+
+
+class JsonStateBackend(StateBackend):
+    """Original single-document JSON format, rewritten in full on every commit.
+
+    Kept for compatibility and small collections; prefer ``journal`` or
+    ``sqlite`` for large trees.
+    """
+
+    name = "json"
+
+    def __init__(self, storage_dir: Path):
+        super().__init__(storage_dir)
+        self.path = self.storage_dir / LEGACY_STATE_FILE
+        self._load()
+
+    def _load(self):
+        state = _load_legacy_state(self.path) or {}
+        self.files: Dict[str, Dict[str, Any]] = state.pop("files", {})
+        self.meta: Dict[str, Any] = state
+        self._dirty = False
+
+    def get_file(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.files.get(key)
+
+    def put_file(self, key: str, state: Dict[str, Any]):
+        self.files[key] = state
+        self._dirty = True
+        self._autocommit()
+
+    def delete_file(self, key: str):
+        if self.files.pop(key, None) is not None:
+            self._dirty = True
+            self._autocommit()
+
+    def iter_files(self, prefix: Optional[str] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for key, state in list(self.files.items()):
+            if prefix is None or key.startswith(prefix):
+                yield key, state
+
+    def count_files(self) -> int:
+        return len(self.files)
+
+    def get_meta(self, key: str, default: Any = None) -> Any:
+        return self.meta.get(key, default)
+
+    def set_meta(self, key: str, value: Any):
+        self.meta[key] = value
+        self._dirty = True
+        self._autocommit()
+
+    def _flush(self):
+        if not self._dirty:
+            return
+        self.bytes_written += _write_json_atomically(self.path, {**self.meta, "files": self.files}, indent=2)
+        self._dirty = False
+
+    def _discard(self):
+        self._load()
+
+
+class JournalStateBackend(StateBackend):
+    """Append-only journal on top of a periodically compacted JSON snapshot.
+
+    Each write appends one JSON line to ``index_state.journal``; the snapshot
+    (``index_state.json``, the legacy file format) is only rewritten when the
+    journal grows past ``compact_threshold`` entries. On startup the snapshot
+    is loaded and the journal replayed; a torn trailing line left by a crash is
+    ignored and cut off before new entries are appended.
+    """
+
+    name = "journal"
+
+    def __init__(self, storage_dir: Path, compact_threshold: int = 50000):
+        super().__init__(storage_dir)
+        self.snapshot_path = self.storage_dir / LEGACY_STATE_FILE
+        self.journal_path = self.storage_dir / "index_state.journal"
+        self.compact_threshold = compact_threshold
+        self._pending = []
+        self._load()
+        self._open_journal()
+
+    def _open_journal(self):
+        """Open the journal for appending, truncating it after its last complete entry."""
+        if self.journal_path.exists() and self.journal_path.stat().st_size > self._valid_bytes:
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(self._valid_bytes)
+                os.fsync(f.fileno())
+        self._journal = open(self.journal_path, 'a')
+
+    def _load(self):
+        state = _load_legacy_state(self.snapshot_path) or {}
+        self.files: Dict[str, Dict[str, Any]] = state.pop("files", {})
+        self.meta: Dict[str, Any] = state
+        self._journal_entries = 0
+        # Bytes of complete entries; anything after them is a torn write
+        self._valid_bytes = 0
+        if not self.journal_path.exists():
+            return
+        with open(self.journal_path, 'rb') as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    # An entry is written together with its newline, so one without it is torn
+                    if not line.endswith(b"\n"):
+                        raise ValueError("missing newline")
+                    entry = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Ignoring torn journal entry at {self.journal_path}:{line_number}")
+                    break
+                self._apply(entry)
+                self._journal_entries += 1
+                self._valid_bytes += len(line)
+
+    def _apply(self, entry: Dict[str, Any]):
+        op = entry.get("op")
+        if op == "put":
+            self.files[entry["key"]] = entry["value"]
+        elif op == "del":
+            self.files.pop(entry["key"], None)
+        elif op == "meta":
+            self.meta[entry["key"]] = entry["value"]
+
+    def _append(self, entry: Dict[str, Any]):
+        self._apply(entry)
+        self._pending.append(entry)
+        self._autocommit()
+
+    def get_file(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.files.get(key)
+
+    def put_file(self, key: str, state: Dict[str, Any]):
+        self._append({"op": "put", "key": key, "value": state})
+
+    def delete_file(self, key: str):
+        if key in self.files:
+            self._append({"op": "del", "key": key})
+
+    def iter_files(self, prefix: Optional[str] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for key, state in list(self.files.items()):
+            if prefix is None or key.startswith(prefix):
+                yield key, state
+
+    def count_files(self) -> int:
+        return len(self.files)
+
+    def get_meta(self, key: str, default: Any = None) -> Any:
+        return self.meta.get(key, default)
+
+    def set_meta(self, key: str, value: Any):
+        self._append({"op": "meta", "key": key, "value": value})
+
+    def _flush(self):
+        if not self._pending:
+            return
+        payload = "".join(json.dumps(entry) + "\n" for entry in self._pending)
+        self._journal.write(payload)
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self.bytes_written += len(payload)
+        self._journal_entries += len(self._pending)
+        self._pending = []
+        if self._journal_entries >= self.compact_threshold:
+            self.compact()
+
+    def _discard(self):
+        self._pending = []
+        self._journal.close()
+        self._load()
+        self._open_journal()
+
+    def compact(self):
+        """Fold the journal into a fresh snapshot and truncate it."""
+        self._flush_pending_only()
+        self.bytes_written += _write_json_atomically(self.snapshot_path, {**self.meta, "files": self.files})
+        self._journal.close()
+        self._journal = open(self.journal_path, 'w')
+        self._journal_entries = 0
+        logger.info(f"Compacted index state journal into {self.snapshot_path}")
+
+    def _flush_pending_only(self):
+        if self._pending:
+            payload = "".join(json.dumps(entry) + "\n" for entry in self._pending)
+            self._journal.write(payload)
+            self._journal.flush()
+            # Durable before the snapshot that replaces the journal is written
+            os.fsync(self._journal.fileno())
+            self.bytes_written += len(payload)
+            self._pending = []
+
+    def close(self):
+        super().close()
+        self._journal.close()
+
+
+class SqliteStateBackend(StateBackend):
+    """Embedded SQLite table keyed by path, running in WAL mode.
+
+    Updates are single-row upserts, so cost does not depend on the number of
+    tracked files. WAL mode keeps readers unblocked and lets several processes
+    share one state store.
+    """
+
+    name = "sqlite"
+    process_safe = True
+
+    def __init__(self, storage_dir: Path, db_name: str = "index_state.db"):
+        super().__init__(storage_dir)
+        self.path = self.storage_dir / db_name
+        self._lock = threading.RLock()
+        is_new = not self.path.exists()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files (key TEXT PRIMARY KEY, state TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        if is_new:
+            self._migrate_legacy_state()
+
+    def _migrate_legacy_state(self):
+        """Import an existing ``index_state.json`` into the database once."""
+        legacy_path = self.storage_dir / LEGACY_STATE_FILE
+        state = _load_legacy_state(legacy_path)
+        if state is None:
+            return
+        files = state.pop("files", {})
+        self.begin()
+        try:
+            for key, file_state in files.items():
+                self.put_file(key, file_state)
+            for key, value in state.items():
+                self.set_meta(key, value)
+            self.commit()
+        except Exception:
+            self.rollback()
+            raise
+        for stale in (legacy_path, legacy_path.with_suffix('.json.bak')):
+            if stale.exists():
+                stale.rename(stale.with_name(stale.name + ".migrated"))
+        logger.info(f"Migrated {len(files)} file states from {legacy_path} to {self.path}")
+
+    def _execute(self, sql: str, params: tuple = ()):
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def begin(self):
+        # The lock is held until the batch ends: statements from other threads
+        # wait instead of joining (and being rolled back with) this transaction
+        self._lock.acquire()
+        if self._batch_depth == 0:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+            except BaseException:
+                self._lock.release()
+                raise
+        self._batch_depth += 1
+
+    def commit(self):
+        with self._lock:
+            if self._batch_depth == 0:
+                return
+            try:
+                if self._batch_depth == 1:
+                    self._conn.execute("COMMIT")
+            finally:
+                self._batch_depth -= 1
+                self._lock.release()
+
+    def rollback(self):
+        with self._lock:
+            depth, self._batch_depth = self._batch_depth, 0
+            try:
+                if depth:
+                    self._conn.execute("ROLLBACK")
+            finally:
+                for _ in range(depth):
+                    self._lock.release()
+
+    def get_file(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self._execute("SELECT state FROM files WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_file(self, key: str, state: Dict[str, Any]):
+        payload = json.dumps(state)
+        self._execute(
+            "INSERT INTO files (key, state) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET state = excluded.state",
+            (key, payload)
+        )
+        self.bytes_written += len(key) + len(payload)
+
+    def delete_file(self, key: str):
+        self._execute("DELETE FROM files WHERE key = ?", (key,))
+
+    def iter_files(self, prefix: Optional[str] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        if prefix is None:
+            rows = self._execute("SELECT key, state FROM files ORDER BY key").fetchall()
+        else:
+            # Range scan on the primary key instead of LIKE so '%' and '_' in paths are literal
+            rows = self._execute(
+                "SELECT key, state FROM files WHERE key >= ? AND key < ? ORDER BY key",
+                (prefix, prefix + "\U0010ffff")
+            ).fetchall()
+        for key, state in rows:
+            yield key, json.loads(state)
+
+    def iter_keys(self, prefix: Optional[str] = None) -> Iterator[str]:
+        # Keys only: reconciling a large tree does not have to decode every state
+        if prefix is None:
+            rows = self._execute("SELECT key FROM files ORDER BY key").fetchall()
+        else:
+            rows = self._execute(
+                "SELECT key FROM files WHERE key >= ? AND key < ? ORDER BY key",
+                (prefix, prefix + "\U0010ffff")
+            ).fetchall()
+        for (key,) in rows:
+            yield key
+
+    def count_files(self) -> int:
+        return self._execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def get_meta(self, key: str, default: Any = None) -> Any:
+        row = self._execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key: str, value: Any):
+        payload = json.dumps(value)
+        self._execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, payload)
+        )
+        self.bytes_written += len(key) + len(payload)
+
+    def compact(self):
+        """Checkpoint the WAL and rebuild the database file."""
+        with self._lock:
+            if self._batch_depth:
+                return
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.execute("VACUUM")
+        logger.info(f"Compacted index state database {self.path}")
+
+    def close(self):
+        with self._lock:
+            depth, self._batch_depth = self._batch_depth, 0
+            try:
+                if depth:
+                    self._conn.execute("COMMIT")
+                self._conn.close()
+            finally:
+                for _ in range(depth):
+                    self._lock.release()
+
+
+STATE_BACKENDS = {
+    JsonStateBackend.name: JsonStateBackend,
+    JournalStateBackend.name: JournalStateBackend,
+    SqliteStateBackend.name: SqliteStateBackend,
+}
+
+
+def create_state_backend(name: str, storage_dir: Path) -> StateBackend:
+    """Create a state backend by name."""
+    try:
+        backend_cls = STATE_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown state backend: {name}. Choose from {sorted(STATE_BACKENDS)}")
+    return backend_cls(storage_dir)
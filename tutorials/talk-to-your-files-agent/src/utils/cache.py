@@ -0,0 +1,101 @@
+"""Thread-safe in-memory LRU cache with TTL, entry-count and byte caps."""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterator, Optional, Tuple
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Least-recently-used cache whose entries also expire after ``ttl`` seconds.
+
+    The cache holds at most ``max_entries`` entries and roughly ``max_bytes``
+    bytes, as measured by ``sizeof`` (``sys.getsizeof`` of the ``str()`` of the
+    value by default). Inserting past either cap evicts the least recently
+    used entries. A ``ttl`` of None keeps entries until they are evicted.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: Optional[int] = None, ttl: Optional[float] = None,
+                 sizeof: Optional[Callable[[Any], int]] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof or (lambda value: sys.getsizeof(str(value)))
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the value for ``key`` (marking it recently used), or ``default``."""
+        with self._lock:
+            value = self._get(key)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def _get(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        value, expires, _ = entry
+        if expires and expires <= time.monotonic():
+            self._pop(key)
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        """Store a value, evicting least recently used entries to stay within the caps."""
+        size = self.sizeof(value)
+        if self.max_entries <= 0 or (self.max_bytes is not None and size > self.max_bytes):
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else 0.0
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (value, expires, size)
+            self.num_bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes is not None and self.num_bytes > self.max_bytes):
+                self._pop(next(iter(self._entries)))
+
+    def _pop(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.num_bytes -= entry[2]
+
+    def discard(self, key: Hashable):
+        """Remove ``key`` if present."""
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        """Remove every entry (the hit/miss counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self.num_bytes = 0
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        """Iterate over a snapshot of the live (unexpired) entries, least recently used first."""
+        now = time.monotonic()
+        with self._lock:
+            snapshot = [(key, value) for key, (value, expires, _) in self._entries.items()
+                        if not expires or expires > now]
+        return iter(snapshot)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and (not entry[1] or entry[1] > time.monotonic())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "bytes": self.num_bytes, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,74 @@
+"""Content hashing used for file change detection."""
+
+import os
+import hashlib
+from typing import Optional, Dict, Any
+
+try:
+    import xxhash
+except ImportError:  # pragma: no cover - optional speedup
+    xxhash = None
+
+# xxh3 is several times faster than any cryptographic hash; blake2b is the
+# fastest option in the standard library when xxhash is not installed.
+HASH_ALGORITHM = "xxh3_128" if xxhash else "blake2b"
+
+# Bytes handed to the hasher per update, and the read buffer size of hash_file
+HASH_BLOCK_SIZE = 16 * 1024 * 1024
+
+
+def new_hasher():
+    """Create a hasher for ``HASH_ALGORITHM``."""
+    if xxhash:
+        return xxhash.xxh3_128()
+    return hashlib.blake2b(digest_size=16)
+
+
+def hash_buffer(buffer) -> str:
+    """Hash a bytes-like object and return a checksum tagged with the algorithm."""
+    hasher = new_hasher()
+    with memoryview(buffer) as view:
+        for offset in range(0, len(view), HASH_BLOCK_SIZE):
+            hasher.update(view[offset:offset + HASH_BLOCK_SIZE])
+    return f"{HASH_ALGORITHM}:{hasher.hexdigest()}"
+
+
+def hash_file(file_path: str) -> str:
+    """Hash the full content of a file, read into one reused buffer.
+
+    Like ``TextFile``, the file is not memory-mapped, so one truncated while
+    it is hashed reads short instead of killing the process with SIGBUS.
+    """
+    hasher = new_hasher()
+    # Unbuffered: readinto fills the reused buffer straight from the file
+    with open(file_path, 'rb', buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        view = memoryview(bytearray(min(HASH_BLOCK_SIZE, max(size, 1))))
+        while True:
+            read = f.readinto(view)
+            if not read:
+                break
+            hasher.update(view[:read])
+    return f"{HASH_ALGORITHM}:{hasher.hexdigest()}"
+
+
+def stat_signature(stats: os.stat_result) -> Dict[str, int]:
+    """Return the stat fields that must all be unchanged for content to be trusted."""
+    return {
+        "size": stats.st_size,
+        "mtime_ns": stats.st_mtime_ns,
+        "inode": stats.st_ino,
+    }
+
+
+def reusable_checksum(stats: os.stat_result, previous: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Return the previously computed checksum if the file's stat signature is unchanged."""
+    if not previous:
+        return None
+    checksum = previous.get("checksum") or ""
+    if not checksum.startswith(f"{HASH_ALGORITHM}:"):
+        return None
+    signature = stat_signature(stats)
+    if all(previous.get(field) == value for field, value in signature.items()):
+        return checksum
+    return None
@@ -0,0 +1,49 @@
+"""Deferred imports for heavy optional dependencies."""
+
+import importlib
+import threading
+from typing import Any, Optional
+
+
+class LazyImport:
+    """Stand-in for a module, or an attribute of one, that is imported on first use.
+
+    ``DocumentConverter = LazyImport("docling.document_converter", "DocumentConverter")``
+    costs nothing at import time; calling it, or reading or setting any of its
+    attributes, imports the module and forwards to the real object. It also
+    works as a ``unittest.mock.patch`` target, both replaced as a whole and
+    patched attribute by attribute.
+    """
+
+    def __init__(self, module: str, name: Optional[str] = None):
+        object.__setattr__(self, "_module", module)
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_target", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _resolve(self) -> Any:
+        target = self._target
+        if target is None:
+            with self._lock:
+                target = self._target
+                if target is None:
+                    target = importlib.import_module(self._module)
+                    if self._name:
+                        target = getattr(target, self._name)
+                    object.__setattr__(self, "_target", target)
+        return target
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._resolve(), attr)
+
+    def __setattr__(self, attr: str, value: Any):
+        setattr(self._resolve(), attr, value)
+
+    def __delattr__(self, attr: str):
+        delattr(self._resolve(), attr)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self._resolve()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        return f"<lazy {self._module}{'.' + self._name if self._name else ''}>"
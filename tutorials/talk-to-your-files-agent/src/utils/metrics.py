@@ -0,0 +1,291 @@
+"""Counters, latency histograms and optional tracing spans for the indexer.
+
+Every indexing stage (scan, stat, hash, convert, chunk, upsert, state_commit)
+reports its latency to the process-wide ``metrics`` registry, labelled with
+the file type where there is one, so a slow run shows whether docling,
+hashing, the disk or the network is the bottleneck. The registry exports a
+JSON snapshot or the Prometheus text format, optionally served over HTTP.
+"""
+
+import bisect
+import json
+import math
+import threading
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+STAGES = ("scan", "stat", "hash", "convert", "chunk", "upsert", "state_commit")
+
+# Upper bounds in seconds, from a single stat call to a slow docling conversion
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+
+STAGE_METRIC = "indexer_stage_duration_seconds"
+
+_HELP = {
+    STAGE_METRIC: "Time spent in each indexing stage",
+    "indexer_stage_bytes_total": "Bytes processed by each indexing stage",
+    "indexer_stage_errors_total": "Indexing stage calls that raised",
+    "indexer_files_total": "Files handled by the indexer, by outcome",
+    "indexer_records_total": "Index records written, by operation",
+    "indexer_upsert_retries_total": "Upserts retried after a failure",
+    "indexer_upsert_failures_total": "Upserts that failed after their last retry",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus style."""
+
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating inside its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[i - 1] if i else 0.0
+                upper = self.bounds[i] if not math.isinf(self.bounds[i]) else lower
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.bounds[-2]
+
+    def snapshot(self) -> Dict[str, Any]:
+        cumulative, buckets = 0, {}
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            buckets["+Inf" if math.isinf(bound) else repr(bound)] = cumulative
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": buckets
+        }
+
+
+class _Stage:
+    """Context manager timing one stage call, inside a tracing span when tracing is on."""
+
+    __slots__ = ("metrics", "stage", "file_type", "num_bytes", "attributes", "span", "started")
+
+    def __init__(self, metrics: "Metrics", stage: str, file_type: str, num_bytes: Optional[int],
+                 attributes: Dict[str, Any]):
+        self.metrics = metrics
+        self.stage = stage
+        self.file_type = file_type
+        self.num_bytes = num_bytes
+        self.attributes = attributes
+        self.span = None
+
+    def __enter__(self) -> "_Stage":
+        tracer = self.metrics.tracer
+        if tracer is not None:
+            self.span = tracer.start_as_current_span(
+                f"indexer.{self.stage}",
+                attributes={"stage": self.stage, "file_type": self.file_type, **self.attributes}
+            )
+            self.span.__enter__()
+        self.started = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.metrics.observe(self.stage, perf_counter() - self.started, self.file_type, self.num_bytes)
+        if exc_type is not None:
+            self.metrics.inc("indexer_stage_errors_total", stage=self.stage, file_type=self.file_type)
+        if self.span is not None:
+            return self.span.__exit__(exc_type, exc, traceback)
+        return False
+
+
+class Metrics:
+    """Thread-safe registry of counters and per-stage, per-file-type latency histograms."""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.tracer = None
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._listeners: List[Callable[[str, str, float], None]] = []
+        self._server = None
+
+    def inc(self, name: str, amount: float = 1, **labels: str):
+        """Add ``amount`` to the counter ``name`` with ``labels``."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, stage: str, seconds: float, file_type: str = "", num_bytes: Optional[int] = None):
+        """Record one call of ``stage`` that took ``seconds`` (and processed ``num_bytes``)."""
+        key = (stage, file_type)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+            if num_bytes:
+                counter = ("indexer_stage_bytes_total", (("file_type", file_type), ("stage", stage)))
+                self._counters[counter] = self._counters.get(counter, 0) + num_bytes
+        for listener in self._listeners:
+            listener(stage, file_type, seconds)
+
+    def stage(self, stage: str, file_type: str = "", num_bytes: Optional[int] = None, **attributes: Any) -> _Stage:
+        """Time a ``with`` block as one call of ``stage``; a span is recorded when tracing is on."""
+        return _Stage(self, stage, file_type, num_bytes, attributes)
+
+    def add_listener(self, listener: Callable[[str, str, float], None]):
+        """Call ``listener(stage, file_type, seconds)`` for every observation (e.g. for benchmarks)."""
+        self._listeners = self._listeners + [listener]
+
+    def remove_listener(self, listener: Callable[[str, str, float], None]):
+        self._listeners = [existing for existing in self._listeners if existing != listener]
+
+    def enable_tracing(self, tracer: Any = None):
+        """Record a span for every timed stage.
+
+        ``tracer`` is anything with OpenTelemetry's ``start_as_current_span``;
+        by default the ``opentelemetry-api`` package's global tracer is used.
+        """
+        if tracer is None:
+            try:
+                from opentelemetry import trace
+            except ImportError:
+                raise ImportError("Tracing needs the opentelemetry-api package: pip install opentelemetry-api")
+            tracer = trace.get_tracer("talk-to-your-files.indexer")
+        self.tracer = tracer
+
+    def disable_tracing(self):
+        self.tracer = None
+
+    def reset(self):
+        """Drop every recorded value."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def counter(self, name: str, **labels: str) -> float:
+        """Current value of one counter."""
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def histogram(self, stage: str, file_type: str = "") -> Optional[Histogram]:
+        return self._histograms.get((stage, file_type))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """All counters and stage histograms as JSON-serializable data."""
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            stages: Dict[str, Dict[str, Any]] = {}
+            for (stage, file_type), histogram in sorted(self._histograms.items()):
+                stages.setdefault(stage, {})[file_type or "all"] = histogram.snapshot()
+        return {"stages": stages, "counters": counters}
+
+    def merge(self, snapshot: Dict[str, Any]):
+        """Add the values of another registry's ``snapshot()``, e.g. one taken in a worker process."""
+        with self._lock:
+            for counter in snapshot["counters"]:
+                key = (counter["name"], tuple(sorted(counter["labels"].items())))
+                self._counters[key] = self._counters.get(key, 0) + counter["value"]
+            for stage, file_types in snapshot["stages"].items():
+                for file_type, values in file_types.items():
+                    key = (stage, "" if file_type == "all" else file_type)
+                    histogram = self._histograms.get(key)
+                    if histogram is None:
+                        histogram = self._histograms[key] = Histogram(self.buckets)
+                    previous = 0
+                    for i, cumulative in enumerate(values["buckets"].values()):
+                        histogram.counts[i] += cumulative - previous
+                        previous = cumulative
+                    histogram.count += values["count"]
+                    histogram.sum += values["sum"]
+
+    def write_snapshot(self, path: str):
+        """Write ``snapshot()`` to a JSON file."""
+        Path(path).write_text(json.dumps(self.snapshot(), indent=2))
+
+    def to_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, histogram.snapshot()) for key, histogram in self._histograms.items())
+
+        lines = []
+        if histograms:
+            lines += [f"# HELP {STAGE_METRIC} {_HELP[STAGE_METRIC]}", f"# TYPE {STAGE_METRIC} histogram"]
+            for (stage, file_type), snapshot in histograms:
+                labels = f'stage="{stage}",file_type="{_escape(file_type)}"'
+                for bound, count in snapshot["buckets"].items():
+                    lines.append(f'{STAGE_METRIC}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f"{STAGE_METRIC}_sum{{{labels}}} {snapshot['sum']!r}")
+                lines.append(f"{STAGE_METRIC}_count{{{labels}}} {snapshot['count']}")
+
+        previous = None
+        for (name, labels), value in counters:
+            if name != previous:
+                lines += [f"# HELP {name} {_HELP.get(name, name)}", f"# TYPE {name} counter"]
+                previous = name
+            rendered = ",".join(f'{key}="{_escape(label)}"' for key, label in labels)
+            lines.append(f"{name}{{{rendered}}} {value!r}" if rendered else f"{name} {value!r}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "127.0.0.1"):
+        """Serve ``/metrics`` (Prometheus text) and ``/metrics.json`` from a background thread."""
+        if self._server is not None:
+            return self._server
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = registry.to_prometheus(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = json.dumps(registry.snapshot()), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                payload = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True).start()
+        return self._server
+
+    def stop_serving(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Process-wide registry the indexer reports to
+metrics = Metrics()
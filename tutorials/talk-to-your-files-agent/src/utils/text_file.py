@@ -0,0 +1,98 @@
+"""Text files hashed and decoded through one reusable read buffer."""
+
+import codecs
+import os
+from typing import Iterator, Optional
+from .hashing import HASH_ALGORITHM, new_hasher
+from ..config.settings import TEXT_DECODE_BLOCK_SIZE
+
+
+class TextFile:
+    """A text file opened once and read ``block_size`` bytes at a time.
+
+    The content hash and the decoded text both come from the same read loop
+    over one reused buffer: ``lines()`` and ``read()`` feed each block to the
+    hasher as they decode it, so a file that is hashed and decoded is read
+    once, and is never held as bytes in full. ``lines()`` decodes it a block
+    at a time, so a large log or CSV file is never held as one string either.
+    Invalid UTF-8 is replaced rather than failing the file.
+
+    The file is not memory-mapped: a ``TextFile`` stays open from the check
+    stage to the chunk stage, and a mapped file truncated in between kills
+    the process with SIGBUS on the next read. Reads just come up short instead.
+    """
+
+    def __init__(self, path: str, block_size: int = TEXT_DECODE_BLOCK_SIZE):
+        self.path = str(path)
+        self.block_size = block_size
+        self._checksum: Optional[str] = None
+        # Unbuffered: readinto fills the reused buffer straight from the file
+        self._file = open(self.path, 'rb', buffering=0)
+        try:
+            self.stats = os.fstat(self._file.fileno())
+        except BaseException:
+            self._file.close()
+            raise
+        self._buffer = bytearray(min(block_size, max(self.stats.st_size, 1)))
+
+    def __enter__(self) -> "TextFile":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _blocks(self) -> Iterator[memoryview]:
+        """Read the file from the start, yielding each block as a view of the reused buffer."""
+        self._file.seek(0)
+        view = memoryview(self._buffer)
+        while True:
+            read = self._file.readinto(view)
+            if not read:
+                return
+            yield view[:read]
+
+    def _hashed_blocks(self) -> Iterator[memoryview]:
+        """Like ``_blocks()``, hashing each block until the checksum is known."""
+        if self._checksum is not None:
+            yield from self._blocks()
+            return
+        hasher = new_hasher()
+        for block in self._blocks():
+            hasher.update(block)
+            yield block
+        # Only a read that got to the end of the file hashed all of it
+        self._checksum = f"{HASH_ALGORITHM}:{hasher.hexdigest()}"
+
+    def checksum(self) -> str:
+        """Content hash of the file, as ``hash_file`` computes it.
+
+        Free after a complete ``lines()`` or ``read()``, which hash the file
+        while decoding it; otherwise the file is read once just to hash it.
+        """
+        if self._checksum is None:
+            for _ in self._hashed_blocks():
+                pass
+        return self._checksum
+
+    def read(self) -> str:
+        """The whole text, decoded a block at a time."""
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        parts = [decoder.decode(block) for block in self._hashed_blocks()]
+        parts.append(decoder.decode(b"", final=True))
+        return "".join(parts)
+
+    def lines(self) -> Iterator[str]:
+        """Decode the text incrementally, yielding lines as ``str.splitlines`` splits them."""
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        pending = ""
+        for block in self._hashed_blocks():
+            lines = (pending + decoder.decode(block)).splitlines(True)
+            # The last line may continue in the next block, and so may a "\r" that starts a "\r\n"
+            last = lines[-1] if lines else ""
+            pending = lines.pop() if last and (last.endswith("\r") or last.splitlines()[0] == last) else ""
+            for line in lines:
+                yield line.splitlines()[0]
+        yield from (pending + decoder.decode(b"", final=True)).splitlines()
+
+    def close(self):
+        self._file.close()
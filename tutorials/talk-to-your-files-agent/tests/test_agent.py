@@ -114,4 +114,25 @@ def test_error_handling(file_agent):
     file_agent.agent.run.side_effect = Exception("Test error")
     response = file_agent.query("Test question")
     assert "error" in response
-    assert response["output"].startswith("I apologize") 
\ No newline at end of file
+    assert response["output"].startswith("I apologize")
+
+def test_query_sends_hybrid_search_hits_when_enabled(mock_agent, tmp_path):
+    """Test that questions reach the agent with hybrid search hits only when AGENT_CONTEXT_HITS is set."""
+    (tmp_path / "outage.md").write_text("Ticket INC-4521: the VPN outage was caused by an expired certificate.")
+    with patch('src.indexer.index_manager.INDEXED_DIR', tmp_path / "indexed"), \
+         patch('src.indexer.document_processor.DocumentConverter'):
+        agent = FileAgent()
+        agent.index_manager = IndexManager(name="Test", description="Test", agent_id="test", backend="local")
+    agent.index_manager.add_documents([{"file_path": str(tmp_path / "outage.md")}])
+    agent.agent = mock_agent
+
+    with patch.object(agent.index_manager, 'search', wraps=agent.index_manager.search) as search:
+        assert agent.query("What happened in INC-4521?")["output"] == "Test response"
+        search.assert_not_called()
+    mock_agent.run.assert_called_once_with("What happened in INC-4521?")
+
+    with patch('src.agent.agent.AGENT_CONTEXT_HITS', 5):
+        assert agent.query("What happened in INC-4521?", use_cache=False)["output"] == "Test response"
+    prompt = mock_agent.run.call_args.args[0]
+    assert prompt.startswith("What happened in INC-4521?")
+    assert "expired certificate" in prompt
@@ -0,0 +1,29 @@
+"""Test suite for the AnswerCache class."""
+
+from src.agent.answer_cache import AnswerCache, normalize_question
+
+def test_normalized_questions_share_answers():
+    """Test that case, whitespace and trailing punctuation do not matter."""
+    cache = AnswerCache()
+    cache.put("What is the  vacation policy?", "v1", {"output": "20 days"})
+    assert normalize_question(" what is the vacation policy ?! ") == "what is the vacation policy"
+    assert cache.get("what is the vacation policy", "v1") == {"output": "20 days"}
+
+def test_new_index_version_invalidates():
+    """Test that answers computed against an older index are dropped."""
+    cache = AnswerCache()
+    cache.put("Who is the CEO?", "v1", {"output": "Alice"})
+    assert cache.get("Who is the CEO?", "v2") is None
+    assert cache.get("Who is the CEO?", "v1") is None
+
+def test_embedding_similarity_match():
+    """Test that similar questions match through the embedding function."""
+    vectors = {
+        "how many vacation days do i get": (1.0, 0.1, 0.0),
+        "how many days of vacation do i get": (0.98, 0.12, 0.0),
+        "where is the office": (0.0, 0.0, 1.0),
+    }
+    cache = AnswerCache(embed=vectors.__getitem__, similarity_threshold=0.95)
+    cache.put("How many vacation days do I get?", "v1", {"output": "20"})
+    assert cache.get("How many days of vacation do I get?", "v1") == {"output": "20"}
+    assert cache.get("Where is the office?", "v1") is None
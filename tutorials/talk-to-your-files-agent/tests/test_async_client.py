@@ -0,0 +1,99 @@
+"""Test suite for the AsyncAgentClient class."""
+
+import asyncio
+import json
+import httpx
+import pytest
+from unittest.mock import Mock
+from src.agent.async_client import AsyncAgentClient, AgentRunError
+
+@pytest.fixture
+def agent():
+    """Create a stand-in for an aiXplain agent."""
+    return Mock(id="agent-1", api_key="key", url="https://agents.test/run", instructions=None)
+
+class FakeAgentService:
+    """Answers each run after ``polls_needed`` polls and tracks concurrent runs."""
+
+    def __init__(self, polls_needed=2, error=None):
+        self.polls_needed = polls_needed
+        self.error = error
+        self.polls = {}
+        self.active = 0
+        self.max_active = 0
+
+    async def __call__(self, request):
+        if request.method == "POST":
+            question = json.loads(request.content)["query"]["input"]
+            run_id = f"run-{len(self.polls)}"
+            self.polls[run_id] = (question, 0)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            return httpx.Response(200, json={"data": f"https://agents.test/poll/{run_id}"})
+
+        run_id = request.url.path.rsplit("/", 1)[1]
+        question, count = self.polls[run_id]
+        self.polls[run_id] = (question, count + 1)
+        if count + 1 < self.polls_needed:
+            return httpx.Response(200, json={"completed": False})
+        self.active -= 1
+        if self.error:
+            return httpx.Response(200, json={"completed": True, "error_message": self.error})
+        return httpx.Response(200, json={"completed": True, "data": {"output": f"Answer to {question}"}})
+
+def make_client(service, **kwargs):
+    return AsyncAgentClient(transport=httpx.MockTransport(service), poll_interval=0.001, **kwargs)
+
+def test_run_polls_until_completed(agent):
+    """Test that a run is submitted, polled and its data returned."""
+    service = FakeAgentService(polls_needed=3)
+
+    async def main():
+        async with make_client(service) as client:
+            return await client.run(agent, "What is in the report?")
+
+    assert asyncio.run(main()) == {"output": "Answer to What is in the report?"}
+    assert service.polls["run-0"][1] == 3
+
+def test_concurrency_limit(agent):
+    """Test that no more than ``max_concurrency`` runs are in flight."""
+    service = FakeAgentService(polls_needed=3)
+
+    async def main():
+        async with make_client(service, max_concurrency=4) as client:
+            return await asyncio.gather(*(client.run(agent, f"q{i}") for i in range(50)))
+
+    results = asyncio.run(main())
+    assert [r["output"] for r in results] == [f"Answer to q{i}" for i in range(50)]
+    assert service.max_active == 4
+
+def test_timeout_and_cancellation_release_slots(agent):
+    """Test that timed-out and cancelled runs free their slot for later runs."""
+    service = FakeAgentService(polls_needed=10 ** 6)
+
+    async def main():
+        async with make_client(service, max_concurrency=1) as client:
+            with pytest.raises(asyncio.TimeoutError):
+                await client.run(agent, "slow", timeout=0.05)
+
+            task = asyncio.create_task(client.run(agent, "cancelled"))
+            await asyncio.sleep(0.02)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+            service.polls_needed = 1
+            return await client.run(agent, "fast", timeout=1)
+
+    assert asyncio.run(main()) == {"output": "Answer to fast"}
+
+def test_failed_run_raises(agent):
+    """Test that service-side failures surface as AgentRunError."""
+    service = FakeAgentService(polls_needed=1, error="Tool failed")
+
+    async def main():
+        async with make_client(service) as client:
+            await client.run(agent, "question")
+
+    with pytest.raises(AgentRunError, match="Tool failed"):
+        asyncio.run(main())
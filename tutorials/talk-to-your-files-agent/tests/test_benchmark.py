@@ -0,0 +1,51 @@
+"""Test suite for the indexing benchmark harness."""
+
+import copy
+from unittest.mock import patch
+from benchmarks.corpus import generate_corpus, modify_corpus
+from benchmarks.indexing import compare, percentile, run_corpus
+
+def test_generate_corpus_is_deterministic_and_reused(tmp_path):
+    """Test that a corpus is reproducible, mixes formats and is not regenerated."""
+    first = generate_corpus(tmp_path / "a", 8)
+    second = generate_corpus(tmp_path / "b", 8)
+    assert first == second
+    assert first["files"] == 8
+    names = sorted(path.name for path in (tmp_path / "a").rglob("doc_*"))
+    assert [name.rsplit(".", 1)[1] for name in names[:4]] == ["txt", "md", "html", "pdf"]
+    assert (tmp_path / "a" / "d0000" / "doc_000003.pdf").read_bytes().startswith(b"%PDF-1.4")
+
+    # A second call with the same arguments writes nothing
+    with patch.dict("benchmarks.corpus._GENERATORS", {name: None for name in ("txt", "md", "html", "pdf")}):
+        assert generate_corpus(tmp_path / "a", 8) == first
+
+    assert len(modify_corpus(tmp_path / "a", 0.5)) == 3
+
+def test_percentile():
+    """Test nearest-rank percentiles."""
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 50) == 0.0
+
+def test_run_corpus_reports_phases(tmp_path):
+    """Test a small in-process run against the local index."""
+    with patch('src.indexer.document_processor.DocumentConverter'):
+        result = run_corpus(6, ["txt", "md"], str(tmp_path))
+
+    cold, rescan, modified = (result["phases"][phase] for phase in ("cold", "rescan", "modified"))
+    assert cold["indexed"] == 6 and cold["errors"] == 0
+    assert {"scan", "stat", "chunk", "upsert", "state_commit"} <= set(cold["stages"])
+    # Plain text is hashed while it is chunked, without a conversion
+    assert "hash" not in cold["stages"] and "convert" not in cold["stages"]
+    assert cold["stages"]["stat"]["count"] == 6
+    assert cold["state_bytes_written"] > 0
+    assert rescan["indexed"] == 0 and rescan["skipped"] == 6
+    assert modified["indexed"] == 1
+    assert result["peak_rss_bytes"] > 0
+
+    slower = copy.deepcopy({"scenarios": [result]})
+    slower["scenarios"][0]["phases"]["cold"]["files_per_sec"] *= 0.5
+    report = compare(slower, {"scenarios": [result]})
+    assert report[0].startswith("REGRESSION")
+    assert all(line.startswith("ok") for line in report[1:])
@@ -0,0 +1,28 @@
+"""Test suite for the LRUCache class."""
+
+from unittest.mock import patch
+from src.utils.cache import LRUCache
+
+def test_evicts_least_recently_used():
+    """Test that the entry cap evicts the least recently used entry."""
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats["hits"] == 3
+
+def test_byte_cap_and_ttl():
+    """Test that entries are evicted past the byte cap and expire after the TTL."""
+    cache = LRUCache(max_entries=100, max_bytes=30, ttl=10, sizeof=len)
+    cache.put("a", "x" * 20)
+    cache.put("b", "y" * 20)
+    assert "a" not in cache and cache.num_bytes == 20
+    cache.put("huge", "z" * 31)
+    assert "huge" not in cache
+
+    with patch('src.utils.cache.time.monotonic', return_value=10 ** 9):
+        assert cache.get("b") is None
+    assert cache.stats["misses"] == 1 and len(cache) == 0
@@ -0,0 +1,57 @@
+"""Test suite for the MarkdownChunker class."""
+
+import pytest
+from src.indexer.chunker import MarkdownChunker
+
+def test_small_document_is_one_chunk():
+    """Test that a document below the chunk size is kept whole."""
+    chunks = MarkdownChunker(chunk_size=500, overlap=50).chunk("/docs/a.md", "# Title\n\nShort paragraph.")
+    assert len(chunks) == 1
+    assert chunks[0]["id"] == "/docs/a.md#chunk-0"
+    assert chunks[0]["section"] == "Title"
+
+def test_chunks_respect_size_and_sections():
+    """Test that chunks stay within the size limit and track their heading."""
+    text = "\n\n".join(
+        f"## Section {i}\n\n" + " ".join(f"Sentence {i}.{j} about the topic." for j in range(20))
+        for i in range(10)
+    )
+    chunks = MarkdownChunker(chunk_size=400, overlap=40).chunk("/docs/a.md", text)
+    assert len(chunks) > 10
+    assert all(len(chunk["text"]) <= 400 for chunk in chunks)
+    assert [chunk["index"] for chunk in chunks] == list(range(len(chunks)))
+    assert chunks[-1]["section"] == "Section 9"
+
+def test_large_table_repeats_header():
+    """Test that an oversized table is split by rows with its header repeated."""
+    header = "| id | name |\n| --- | --- |"
+    rows = "\n".join(f"| {i} | item {i} |" for i in range(100))
+    chunks = MarkdownChunker(chunk_size=300, overlap=20).chunk("/docs/t.md", f"{header}\n{rows}")
+    assert len(chunks) > 1
+    assert all("| id | name |" in chunk["text"] for chunk in chunks)
+    assert all(len(chunk["text"]) <= 300 for chunk in chunks)
+
+def test_overlap_and_separator_fit_in_the_chunk():
+    """Test that a full-size block after an overlap tail does not push a chunk past the size limit."""
+    paragraphs = [" ".join(f"w{i}{j:02d}" for j in range(30)) for i in range(20)]
+    chunker = MarkdownChunker(chunk_size=100, overlap=20)
+    chunks = chunker.chunk("/docs/a.md", "\n\n".join(paragraphs))
+    assert len(chunks) > 20
+    assert all(len(chunk["text"]) <= 100 for chunk in chunks)
+    assert all(len(chunk["text"]) <= 100 for chunk in chunker.chunk("/docs/b.md", "x" * 1000))
+
+def test_chunk_hashes_are_stable():
+    """Test that only edited chunks change their hash."""
+    chunker = MarkdownChunker(chunk_size=200, overlap=0)
+    paragraphs = [f"Paragraph {i} " + "x" * 150 for i in range(5)]
+    before = chunker.chunk("/docs/a.md", "\n\n".join(paragraphs))
+    paragraphs[3] = paragraphs[3].replace("x", "y")
+    after = chunker.chunk("/docs/a.md", "\n\n".join(paragraphs))
+    changed = [b["id"] for a, b in zip(before, after) if a["hash"] != b["hash"]]
+    assert changed == ["/docs/a.md#chunk-3"]
+    assert all(len(chunk["text"]) <= 200 for chunk in before + after)
+
+def test_invalid_overlap():
+    """Test that an overlap as large as the chunk size is rejected."""
+    with pytest.raises(ValueError):
+        MarkdownChunker(chunk_size=100, overlap=100)
@@ -0,0 +1,42 @@
+"""Test suite for the ConversionCache class."""
+
+import os
+from unittest.mock import patch
+from src.indexer.conversion_cache import ConversionCache
+from src.indexer.document_processor import DocumentProcessor
+
+def test_round_trip_and_miss(tmp_path):
+    """Test storing and reading back a conversion."""
+    cache = ConversionCache(tmp_path, max_bytes=1024 * 1024)
+    assert cache.get("xxh3_128:abcd") is None
+    cache.put("xxh3_128:abcd", "# Converted\n\nContent")
+    assert cache.get("xxh3_128:abcd") == "# Converted\n\nContent"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # A new instance sees entries written by an earlier one
+    assert ConversionCache(tmp_path).size_bytes == cache.size_bytes
+
+def test_evicts_least_recently_used(tmp_path):
+    """Test that the oldest unused entries are evicted first."""
+    cache = ConversionCache(tmp_path, max_bytes=10 ** 6)
+    for i in range(3):
+        cache.put(f"xxh3_128:{i:04x}", os.urandom(2000).hex())
+        os.utime(cache._path(f"xxh3_128:{i:04x}"), ns=(i * 10 ** 9, i * 10 ** 9))
+    cache.get("xxh3_128:0000")
+
+    cache.evict(target_bytes=cache.size_bytes - 1)
+    assert cache.get("xxh3_128:0001") is None
+    assert cache.get("xxh3_128:0000") is not None
+    assert cache.get("xxh3_128:0002") is not None
+
+def test_duplicate_files_are_converted_once(tmp_path):
+    """Test that identical documents reuse one docling conversion."""
+    with patch('src.indexer.document_processor.DocumentConverter') as mock_converter, \
+         patch('src.indexer.document_processor.ConversionCache', lambda: ConversionCache(tmp_path / "cache")):
+        mock_converter.return_value.get_supported_formats.side_effect = AttributeError
+        mock_converter.return_value.convert.return_value.document.export_to_markdown.return_value = "# Report"
+        processor = DocumentProcessor()
+        for name in ("a.pdf", "b.pdf"):
+            (tmp_path / name).write_bytes(b"%PDF-1.4 same bytes")
+            assert processor.process_document(str(tmp_path / name))["content"] == "# Report"
+    assert mock_converter.return_value.convert.call_count == 1
@@ -0,0 +1,141 @@
+"""Test suite for the DocumentProcessor class."""
+
+import io
+import os
+import queue
+import tempfile
+import threading
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
+from docling.datamodel.base_models import DocumentStream
+from src.indexer.document_processor import DocumentProcessor, _ConversionPool, _init_worker
+
+@pytest.fixture
+def processor():
+    """Create a DocumentProcessor with the docling converter mocked out."""
+    with patch('src.indexer.document_processor.DocumentConverter') as converter_class:
+        # Fall back to the built-in list of docling formats
+        converter_class.return_value.get_supported_formats.side_effect = AttributeError
+        yield DocumentProcessor(use_cache=False)
+
+def test_batch_process_text_files(processor, tmp_path):
+    """Test serial batch processing of plain-text files."""
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"doc_{i}.txt"
+        path.write_text(f"Document {i}")
+        paths.append(str(path))
+
+    results = processor.batch_process(paths, workers=1)
+    assert sorted(r["content"] for r in results) == ["Document 0", "Document 1", "Document 2"]
+
+def test_plain_text_formats_skip_docling(processor, tmp_path):
+    """Test that plain-text formats are read from disk without the converter."""
+    path = tmp_path / "config.yaml"
+    path.write_text("name: indexer\nworkers: 4\n")
+    result = processor.process_document(str(path))
+    assert result["content"] == "name: indexer\nworkers: 4\n"
+    assert result["metadata"]["size"] == path.stat().st_size
+    processor.converter.convert.assert_not_called()
+
+def test_iter_process_streams_failures(processor, tmp_path):
+    """Test that unconvertible files are reported instead of dropped."""
+    good = tmp_path / "good.txt"
+    good.write_text("Readable")
+    missing = tmp_path / "missing.txt"
+
+    results = dict(processor.iter_process([str(good), str(missing)], workers=1))
+    assert results[str(good)]["content"] == "Readable"
+    assert results[str(missing)] is None
+
+def test_process_document_timeout(processor, tmp_path):
+    """Test that a slow conversion is abandoned after the per-file timeout."""
+    path = tmp_path / "slow.txt"
+    path.write_text("Slow")
+
+    with patch.object(processor, '_process_document', side_effect=lambda *args: time.sleep(5)):
+        started = time.monotonic()
+        assert processor.process_document(str(path), timeout=0.2) is None
+        assert time.monotonic() - started < 2
+
+def test_timeout_off_the_main_thread_converts_in_a_worker_process(processor, tmp_path):
+    """Test that conversions on a pipeline thread move to a worker process, where the timeout works."""
+    path = tmp_path / "notes.txt"
+    path.write_text("Notes")
+    results = {}
+
+    def convert():
+        results.update(processor.iter_process([str(path)], workers=1, timeout=30))
+
+    with patch.object(_ConversionPool, 'run', autospec=True, side_effect=_ConversionPool.run) as run:
+        thread = threading.Thread(target=convert)
+        thread.start()
+        thread.join()
+        assert run.call_count == 1
+        assert results[str(path)]["content"] == "Notes"
+
+        # On the main thread the alarm works, so the file is converted in-process
+        assert dict(processor.iter_process([str(path)], workers=1, timeout=30))[str(path)]["content"] == "Notes"
+        assert run.call_count == 1
+
+def test_pool_deadlines_start_when_a_worker_starts_the_file():
+    """Test that files queued behind slow conversions are not timed out before they start."""
+    def start(pool):
+        # Threads instead of spawned processes, so the patched conversion is used
+        pool.started = queue.SimpleQueue()
+        pool.executor = ThreadPoolExecutor(pool.workers, initializer=_init_worker, initargs=(pool.started,))
+
+    def convert(self, file_path, timeout=None, checksum=None):
+        time.sleep(0.6)
+        return {"content": file_path, "metadata": {}}
+
+    paths = [f"/docs/slow_{i}.pdf" for i in range(4)]
+    with patch.object(_ConversionPool, '_start', start), \
+            patch.object(DocumentProcessor, 'process_document', convert), \
+            patch.multiple('src.indexer.document_processor', TIMEOUT_GRACE_SECONDS=0, _worker_started=None):
+        # Two files wait 0.6s for a worker, then take 0.6s: over the timeout counted from submission
+        results = dict(_ConversionPool(2, timeout=1).run(paths, {}, {}))
+    assert results == {path: {"content": path, "metadata": {}} for path in paths}
+
+def test_process_stream_converts_small_documents_in_memory(processor):
+    """Test that small binary streams are handed to docling without touching disk."""
+    processor.converter.convert.return_value.document.export_to_markdown.return_value = "# Report"
+    result = processor.process_stream(io.BytesIO(b"%PDF-1.4 tiny"), "report.pdf", checksum="md5:abc")
+
+    source = processor.converter.convert.call_args.args[0]
+    assert isinstance(source, DocumentStream) and source.name == "report.pdf"
+    assert result["content"] == "# Report"
+    assert result["metadata"] == {"file_name": "report.pdf", "file_type": ".pdf", "size": 13}
+
+def test_process_stream_spills_large_documents_to_disk(processor):
+    """Test that streams above the memory limit are converted from a temporary file."""
+    seen = {}
+    def convert(source):
+        seen["path"], seen["size"] = source, os.path.getsize(source)
+        return Mock(**{"document.export_to_markdown.return_value": "# Big"})
+    processor.converter.convert.side_effect = convert
+
+    with tempfile.SpooledTemporaryFile(max_size=16) as stream:
+        stream.write(b"x" * 1000)
+        result = processor.process_stream(stream, "big.pdf", max_memory_bytes=100)
+
+    assert seen["path"].endswith(".pdf") and seen["size"] == 1000
+    assert not os.path.exists(seen["path"])
+    assert result["content"] == "# Big"
+    assert result["metadata"]["file_name"] == "big.pdf"
+
+def test_process_stream_decodes_text(processor):
+    """Test that plain-text streams are decoded instead of converted."""
+    result = processor.process_stream(io.BytesIO("Notes ✓".encode()), "notes.txt")
+    assert result["content"] == "Notes ✓"
+    processor.converter.convert.assert_not_called()
+
+def test_converter_is_created_lazily_and_shared():
+    """Test that processors create no converter until one is needed, and then share it."""
+    with patch('src.indexer.document_processor.DocumentConverter') as converter_class:
+        first, second = DocumentProcessor(use_cache=False), DocumentProcessor(use_cache=False)
+        converter_class.assert_not_called()
+        assert first.converter is second.converter
+        converter_class.assert_called_once()
@@ -0,0 +1,137 @@
+"""Test suite for the DriveCrawler class against a local fake of the Drive v3 API."""
+
+import json
+import re
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import pytest
+import requests
+from unittest.mock import patch
+from src.connectors.drive_crawler import DriveCrawler, FOLDER_MIME_TYPE
+
+class FakeDrive:
+    """In-memory Drive with a folder tree, paging and injectable rate limiting."""
+
+    def __init__(self, page_size=2):
+        self.page_size = page_size
+        self.files = {}
+        self.rate_limited_requests = 0
+        self.request_count = 0
+        self.lock = threading.Lock()
+
+    def add(self, file_id, name, parent, folder=False, size=10):
+        self.files[file_id] = {
+            "id": file_id,
+            "name": name,
+            "mimeType": FOLDER_MIME_TYPE if folder else "text/plain",
+            "parents": [parent],
+            "modifiedTime": "2024-01-01T00:00:00.000Z",
+            "createdTime": "2024-01-01T00:00:00.000Z",
+            **({} if folder else {"size": str(size), "md5Checksum": f"md5-{file_id}"}),
+        }
+
+    def take_rate_limit(self):
+        with self.lock:
+            self.request_count += 1
+            if self.rate_limited_requests:
+                self.rate_limited_requests -= 1
+                return True
+            return False
+
+    def list(self, query, page_token):
+        parent = re.search(r"'([^']+)' in parents", query).group(1)
+        children = sorted((f for f in self.files.values() if parent in f["parents"]), key=lambda f: f["id"])
+        start = int(page_token or 0)
+        page = children[start:start + self.page_size]
+        response = {"files": page}
+        if start + self.page_size < len(children):
+            response["nextPageToken"] = str(start + self.page_size)
+        return response
+
+def make_handler(drive):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body, content_type="application/json", headers=None):
+            payload = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if drive.take_rate_limit():
+                return self._send(429, json.dumps({"error": {"errors": [{"reason": "rateLimitExceeded"}]}}),
+                                  headers={"Retry-After": "0"})
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            self._send(200, json.dumps(drive.list(params["q"][0], params.get("pageToken", [None])[0])))
+
+        def do_POST(self):
+            drive.take_rate_limit()
+            body = self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8")
+            parts = []
+            for content_id, file_id in re.findall(r"Content-ID: <item(\d+)>\r\n\r\nGET /drive/v3/files/([^?]+)", body):
+                file = drive.files.get(file_id)
+                status, payload = ("200 OK", json.dumps(file)) if file else ("404 Not Found", "{}")
+                parts.append(
+                    f"--resp\r\nContent-Type: application/http\r\nContent-ID: <response-item{content_id}>\r\n\r\n"
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n\r\n{payload}\r\n"
+                )
+            self._send(200, "".join(parts) + "--resp--\r\n", content_type="multipart/mixed; boundary=resp")
+
+    return Handler
+
+@pytest.fixture
+def fake_drive():
+    """Serve a fake Drive tree on a local port."""
+    drive = FakeDrive()
+    drive.add("sub", "Sub", "root", folder=True)
+    drive.add("deep", "Deep", "sub", folder=True)
+    for i in range(3):
+        drive.add(f"root-{i}", f"root_{i}.txt", "root")
+        drive.add(f"sub-{i}", f"sub_{i}.pdf", "sub")
+        drive.add(f"deep-{i}", f"deep_{i}.md", "deep")
+    drive.add("skip", "image.png", "root")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(drive))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    drive.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield drive
+    server.shutdown()
+
+def test_crawl_lists_tree_concurrently(fake_drive):
+    """Test that all supported files in all subfolders and pages are found."""
+    crawler = DriveCrawler(requests.Session(), api_root=fake_drive.url, max_workers=4)
+    folders = set()
+    files = {file["id"]: file for file in crawler.crawl("root", seen_folders=folders)}
+    assert len(files) == 9
+    assert "skip" not in files
+    assert files["deep-0"]["md5Checksum"] == "md5-deep-0"
+    assert folders == {"root", "sub", "deep"}
+
+    top_level = {file["id"] for file in crawler.crawl("root", recursive=False)}
+    assert top_level == {"root-0", "root-1", "root-2"}
+
+def test_crawl_backs_off_on_rate_limits(fake_drive):
+    """Test that 429 responses are retried instead of failing the crawl."""
+    fake_drive.rate_limited_requests = 3
+    crawler = DriveCrawler(requests.Session(), api_root=fake_drive.url, max_workers=2)
+    with patch('src.connectors.drive_crawler.time.sleep'):
+        files = list(crawler.crawl("root"))
+    assert len(files) == 9
+
+def test_get_files_uses_batch_requests(fake_drive):
+    """Test that many files.get calls are sent as one batch request."""
+    crawler = DriveCrawler(requests.Session(), api_root=fake_drive.url)
+    ids = [f"sub-{i}" for i in range(3)] + ["missing"]
+    before = fake_drive.request_count
+    files = crawler.get_files(ids)
+    assert fake_drive.request_count - before == 1
+    assert set(files) == {"sub-0", "sub-1", "sub-2"}
+    assert files["sub-1"]["name"] == "sub_1.pdf"
@@ -0,0 +1,83 @@
+"""Test suite for the FileWatcher class."""
+
+import sys
+import threading
+import time
+import pytest
+from src.connectors.file_watcher import FileWatcher
+
+BACKENDS = ["polling"] + (["inotify"] if sys.platform.startswith("linux") else [])
+
+def collect_batches(watcher, stop_event):
+    """Run the watcher on a background thread and collect its batches."""
+    batches = []
+    thread = threading.Thread(target=lambda: batches.extend(watcher.watch(stop_event)), daemon=True)
+    thread.start()
+    return batches, thread
+
+def wait_for(condition, timeout=5.0):
+    """Wait until condition() is true or the timeout expires."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_watcher_coalesces_changes(tmp_path, backend):
+    """Test that a burst of writes, a rename and a delete arrive as one batch."""
+    existing = tmp_path / "existing.txt"
+    existing.write_text("old")
+    (tmp_path / "__pycache__").mkdir()
+    stop_event = threading.Event()
+    watcher = FileWatcher(str(tmp_path), debounce=0.3, poll_interval=0.1, backend=backend)
+    batches, thread = collect_batches(watcher, stop_event)
+
+    new_file = tmp_path / "new.txt"
+    for i in range(5):
+        new_file.write_text(f"version {i}")
+    existing.rename(tmp_path / "renamed.md")
+    (tmp_path / "ignored.bin").write_bytes(b"\0")
+    (tmp_path / "__pycache__" / "readme.md").write_text("tool output")
+
+    assert wait_for(lambda: batches)
+    stop_event.set()
+    thread.join(timeout=5)
+
+    changed = set().union(*(batch.changed for batch in batches))
+    deleted = set().union(*(batch.deleted for batch in batches))
+    assert changed == {str(new_file), str(tmp_path / "renamed.md")}
+    assert deleted == {str(existing)}
+
+def test_inotify_reports_deleted_directories(tmp_path):
+    """Test that removing a watched subdirectory is reported as a directory delete."""
+    if not sys.platform.startswith("linux"):
+        pytest.skip("inotify is only available on Linux")
+    subdir = tmp_path / "sub"
+    subdir.mkdir()
+    (subdir / "doc.txt").write_text("content")
+    stop_event = threading.Event()
+    watcher = FileWatcher(str(tmp_path), debounce=0.3, backend="inotify")
+    batches, thread = collect_batches(watcher, stop_event)
+
+    moved = tmp_path.parent / f"{tmp_path.name}_moved_out"
+    subdir.rename(moved)
+
+    assert wait_for(lambda: batches)
+    stop_event.set()
+    thread.join(timeout=5)
+    assert str(subdir) in set().union(*(batch.deleted_dirs for batch in batches))
+
+def test_polling_watcher_stops_without_waiting_for_the_next_poll(tmp_path):
+    """Test that setting the stop event interrupts the polling backend's wait."""
+    stop_event = threading.Event()
+    watcher = FileWatcher(str(tmp_path), debounce=5, poll_interval=60, backend="polling")
+    _, thread = collect_batches(watcher, stop_event)
+    time.sleep(0.1)
+
+    stopped = time.monotonic()
+    stop_event.set()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert time.monotonic() - stopped < 0.2
@@ -0,0 +1,48 @@
+"""Test suite for gitignore-style scan rules."""
+
+import os
+import pytest
+from src.connectors.ignore_rules import IgnoreMatcher, IgnoreRules
+
+@pytest.mark.parametrize("pattern, path, is_dir, expected", [
+    ("*.log", "a/b/debug.log", False, True),
+    ("*.log", "debug.log.txt", False, None),
+    ("/top.md", "top.md", False, True),
+    ("/top.md", "sub/top.md", False, None),
+    ("docs/*.pdf", "docs/a.pdf", False, True),
+    ("docs/*.pdf", "docs/sub/a.pdf", False, None),
+    ("docs/**/*.pdf", "docs/sub/deep/a.pdf", False, True),
+    ("**/drafts", "x/y/drafts", True, True),
+    ("out/", "a/out", True, True),
+    ("out/", "a/out", False, None),
+    ("secret/**", "secret/a/b.txt", False, True),
+    ("report-?.txt", "report-1.txt", False, True),
+    ("report-[!0-9].txt", "report-1.txt", False, None),
+    ("\\#notes.md", "#notes.md", False, True),
+    ("# comment", "# comment", False, None),
+])
+def test_pattern_semantics(pattern, path, is_dir, expected):
+    """Test gitignore pattern matching against paths relative to the ignore file."""
+    base = os.path.join("root")
+    rules = IgnoreRules([pattern], base)
+    assert rules.match(os.path.join(base, *path.split("/")), is_dir) is expected
+
+def test_later_patterns_and_deeper_files_take_precedence(tmp_path):
+    """Test negation and that a subdirectory's ignore file overrides its parent's."""
+    (tmp_path / ".gitignore").write_text("*.md\n!keep.md\n")
+    sub = tmp_path / "sub"
+    sub.mkdir()
+    (sub / ".indexignore").write_text("!*.md\nkeep.md\n")
+    (tmp_path / "build").mkdir()
+    matcher = IgnoreMatcher(str(tmp_path), patterns=["build/"])
+
+    assert matcher.is_ignored(str(tmp_path / "a.md"))
+    assert not matcher.is_ignored(str(tmp_path / "keep.md"))
+    assert not matcher.is_ignored(str(sub / "a.md"))
+    assert matcher.is_ignored(str(sub / "keep.md"))
+    # Everything inside an ignored directory is ignored
+    assert matcher.is_ignored(str(tmp_path / "build" / "notes.txt"))
+
+    (tmp_path / ".gitignore").write_text("")
+    matcher.invalidate()
+    assert not matcher.is_ignored(str(tmp_path / "a.md"))
@@ -0,0 +1,360 @@
+"""Test suite for the IndexManager indexing pipeline."""
+
+import io
+import os
+import pytest
+from unittest.mock import Mock, patch
+from src.indexer.index_manager import IndexManager
+from src.connectors.drive_connector import DriveConnector
+from src.utils.hashing import hash_file as hash_file_of
+from src.utils.text_file import TextFile
+
+@pytest.fixture
+def mock_index():
+    """Create a mock index."""
+    index = Mock()
+    index.id = "test_index_id"
+    return index
+
+@pytest.fixture
+def index_manager(mock_index, tmp_path):
+    """Create an IndexManager with the remote index and docling mocked out."""
+    with patch('src.indexer.index_manager.IndexFactory.create', return_value=mock_index), \
+         patch('src.indexer.index_manager.INDEXED_DIR', tmp_path / "indexed"), \
+         patch('src.indexer.document_processor.DocumentConverter'):
+        yield IndexManager(name="Test Index", description="Test", agent_id="test_agent")
+
+@pytest.fixture
+def documents(tmp_path):
+    """Create a directory of small text files."""
+    docs_dir = tmp_path / "docs"
+    docs_dir.mkdir()
+    paths = []
+    for i in range(5):
+        path = docs_dir / f"doc_{i}.txt"
+        path.write_text(f"Document number {i}")
+        paths.append(str(path))
+    return [{"file_path": path} for path in paths]
+
+def test_add_documents_flushes_in_batches(index_manager, mock_index, documents):
+    """Test that upserts are flushed at the record-count threshold."""
+    with patch('src.indexer.index_manager.UPSERT_BATCH_RECORDS', 2):
+        assert index_manager.add_documents(documents) == 5
+    assert sorted(len(call.args[0]) for call in mock_index.upsert.call_args_list) == [1, 2, 2]
+    assert len(index_manager.get_indexed_files()) == 5
+
+    # Unchanged files are skipped on the next run
+    assert index_manager.add_documents(documents) == 0
+    assert index_manager.last_stats["skipped"] == 5
+
+def fail_after(successes):
+    """Upsert side effect that fails persistently after the first ``successes`` calls."""
+    calls = []
+    def upsert(records):
+        calls.append(records)
+        if len(calls) > successes:
+            raise Exception("Service unavailable")
+    return upsert
+
+def test_failed_flush_only_commits_acknowledged_files(index_manager, mock_index, documents):
+    """Test that files from a failed upsert are not marked as indexed once its retries are exhausted."""
+    mock_index.upsert.side_effect = fail_after(1)
+    with patch('src.indexer.index_manager.UPSERT_BATCH_RECORDS', 2), \
+         patch('src.indexer.index_manager.UPSERT_MAX_IN_FLIGHT', 1), \
+         patch('src.indexer.index_manager.UPSERT_RETRY_BASE_DELAY', 0):
+        with pytest.raises(Exception, match="Service unavailable"):
+            index_manager.add_documents(documents)
+    assert len(index_manager.get_indexed_files()) == 2
+    assert mock_index.upsert.call_count == 2 + 3  # the failed batch was retried MAX_RETRIES times
+
+def test_transient_upsert_errors_are_retried(index_manager, mock_index, documents):
+    """Test that a run survives transient upsert failures."""
+    mock_index.upsert.side_effect = [Exception("Rate limit exceeded"), None]
+    with patch('src.indexer.index_manager.UPSERT_RETRY_BASE_DELAY', 0):
+        assert index_manager.add_documents(documents) == 5
+    assert len(index_manager.get_indexed_files()) == 5
+
+def test_add_documents_accepts_generator(index_manager, mock_index, documents):
+    """Test that documents can be streamed from a generator."""
+    assert index_manager.add_documents(doc for doc in documents) == 5
+    mock_index.upsert.assert_called_once()
+
+def test_stat_fast_path_skips_without_opening(index_manager, mock_index, tmp_path, documents):
+    """Test that no-op rescans never open files, including files touched since the previous scan."""
+    index_manager.add_documents(documents)
+
+    def rescan():
+        entries = index_manager.local_connector.scan_directory_entries(str(tmp_path / "docs"))
+        assert index_manager.add_documents([{"file_path": path, "stats": stats} for path, stats in entries]) == 0
+        assert index_manager.last_stats["skipped"] == 5
+
+    def opened_documents():
+        return [call.args[0] for call in opened.call_args_list if str(call.args[0]).startswith(str(tmp_path))]
+
+    with patch('builtins.open', side_effect=open) as opened, \
+         patch('src.connectors.local_connector.hash_file') as mock_hash:
+        rescan()
+        assert opened_documents() == []
+
+        # A touched file is read once, then the new signature takes the fast path too
+        os.utime(documents[2]["file_path"], ns=(0, 1_000_000_000))
+        rescan()
+        assert opened_documents() == [documents[2]["file_path"]]
+        rescan()
+        assert opened_documents() == [documents[2]["file_path"]]
+        mock_hash.assert_not_called()
+
+def test_touched_file_is_hashed_once(index_manager, mock_index, documents):
+    """Test that a file touched without a content change is read once and then takes the stat fast path."""
+    index_manager.add_documents(documents)
+    touched = documents[0]["file_path"]
+    os.utime(touched, ns=(0, 1_000_000_000))
+    chunks = index_manager.storage.get_file_state(touched)["chunks"]
+
+    with patch.object(TextFile, '_blocks', autospec=True, side_effect=TextFile._blocks) as reads:
+        for _ in range(3):
+            assert index_manager.add_documents(documents) == 0
+            assert index_manager.last_stats["skipped"] == 5
+    # Hashed while it was decoded, in the same read
+    assert reads.call_count == 1
+    state = index_manager.storage.get_file_state(touched)
+    assert state["metadata"]["mtime_ns"] == 1_000_000_000
+    assert state["chunks"] == chunks
+
+def test_only_changed_chunks_are_upserted(index_manager, mock_index, tmp_path):
+    """Test that editing a file re-upserts its changed chunks and deletes stale ones."""
+    path = tmp_path / "long.md"
+    paragraphs = [f"Paragraph {i} " + "x" * 150 for i in range(5)]
+    path.write_text("\n\n".join(paragraphs))
+    with patch.object(index_manager.chunker, 'chunk_size', 200), patch.object(index_manager.chunker, 'overlap', 0):
+        index_manager.add_documents([{"file_path": str(path)}])
+        assert len(mock_index.upsert.call_args.args[0]) == 5
+
+        paragraphs[1] = paragraphs[1].replace("x", "y")
+        path.write_text("\n\n".join(paragraphs[:4]))
+        index_manager.add_documents([{"file_path": str(path)}])
+
+    assert [record.id for record in mock_index.upsert.call_args.args[0]] == [f"{path}#chunk-1"]
+    mock_index.delete_record.assert_called_once_with(f"{path}#chunk-4")
+    assert len(index_manager.get_indexed_files()[str(path)]["chunks"]) == 4
+
+def test_drive_sync_uses_change_log(index_manager, mock_index, tmp_path):
+    """Test that Drive syncs resume from the saved page token and never download unchanged files."""
+    def drive_file(file_id, md5, parent="root", **extra):
+        return {"id": file_id, "name": f"{file_id}.txt", "size": "10", "md5Checksum": md5,
+                "modifiedTime": "2024-01-01T00:00:00.000Z", "parents": [parent], **extra}
+
+    connector = Mock()
+    connector.metadata_from_file = DriveConnector.metadata_from_file
+    connector.download_file.side_effect = lambda file_id: io.BytesIO(f"Content of {file_id}".encode())
+    connector.get_start_page_token.return_value = "token-1"
+
+    def scan_folder(folder_id, recursive, seen_folders, failed_folders):
+        seen_folders.update({"root", "sub"})
+        for file in [drive_file("a", "1"), drive_file("b", "1", parent="sub")]:
+            yield {"id": file["id"], "metadata": DriveConnector.metadata_from_file(file)}
+    connector.scan_folder.side_effect = scan_folder
+    index_manager.drive_connector = connector
+
+    assert index_manager.sync_drive_folder("root") == 2
+    assert index_manager.storage.get_drive_sync_state("root")["page_token"] == "token-1"
+
+    # Only the changed file is downloaded; the deleted one is removed
+    connector.download_file.reset_mock()
+    connector.list_changes.return_value = ([
+        {"fileId": "a", "removed": False, "file": drive_file("a", "2")},
+        {"fileId": "b", "removed": True},
+        {"fileId": "c", "removed": False, "file": drive_file("c", "1", parent="elsewhere")},
+    ], "token-2")
+    assert index_manager.sync_drive_folder("root") == 1
+    connector.list_changes.assert_called_once_with("token-1")
+    connector.download_file.assert_called_once_with("a")
+    assert set(index_manager.get_indexed_files()) == {"a"}
+    assert index_manager.storage.get_drive_sync_state("root")["page_token"] == "token-2"
+
+    # A full sync reconciles what the crawl no longer finds without loading local files' states
+    local = tmp_path / "local.txt"
+    local.write_text("Local content")
+    index_manager.add_documents([{"file_path": str(local)}])
+    connector.scan_folder.side_effect = lambda folder_id, recursive, seen_folders, failed_folders: \
+        seen_folders.update({"root", "sub"}) or iter(())
+    with patch.object(index_manager.storage, 'get_indexed_files') as get_indexed_files, \
+         patch.object(index_manager.storage, 'get_file_state',
+                      side_effect=index_manager.storage.get_file_state) as get_file_state:
+        index_manager.sync_drive_folder("root", full=True)
+    get_indexed_files.assert_not_called()
+    assert str(local) not in [call.args[0] for call in get_file_state.call_args_list]
+    assert set(index_manager.get_indexed_files()) == {str(local)}
+
+def test_drive_files_are_upserted_while_others_download(index_manager, mock_index):
+    """Test that a Drive-only run streams converted files on instead of downloading them all first."""
+    events = []
+    connector = Mock()
+    def download(file_id):
+        events.append("download")
+        return io.BytesIO(f"Content of {file_id}".encode())
+    connector.download_file.side_effect = download
+    mock_index.upsert.side_effect = lambda records: events.append("upsert")
+    index_manager.drive_connector = connector
+
+    documents = [{"file_id": f"file-{i}", "metadata": {"file_name": f"file-{i}.txt", "checksum": f"md5:{i}"}}
+                 for i in range(20)]
+    with patch('src.indexer.index_manager.UPSERT_BATCH_RECORDS', 1), \
+         patch('src.indexer.index_manager.PIPELINE_QUEUE_SIZE', 1):
+        assert index_manager.add_documents(documents) == 20
+    assert events.index("upsert") < len(events) - 1 - events[::-1].index("download")
+
+def test_drive_metadata_is_fetched_in_batches(index_manager, mock_index):
+    """Test that Drive files given by ID alone get their metadata from batch requests."""
+    connector = Mock()
+    connector.get_files_metadata.side_effect = lambda file_ids: {
+        file_id: {"file_name": f"{file_id}.txt", "checksum": f"md5:{file_id}"} for file_id in file_ids if file_id != "gone"
+    }
+    connector.get_file_metadata.return_value = {}
+    connector.download_file.side_effect = lambda file_id: io.BytesIO(f"Content of {file_id}".encode())
+    index_manager.drive_connector = connector
+
+    documents = [{"file_id": f"file-{i}"} for i in range(150)] + [{"file_id": "gone"}]
+    assert index_manager.add_documents(documents) == 150
+    assert [len(call.args[0]) for call in connector.get_files_metadata.call_args_list] == [100, 51]
+    # Only the file the batches missed is looked up on its own
+    connector.get_file_metadata.assert_called_once_with("gone")
+
+def test_search_is_memoized_per_index_version(index_manager, mock_index, documents):
+    """Test that repeated searches hit the cache until the index changes."""
+    mock_index.search.side_effect = lambda query, **kwargs: Mock(status="SUCCESS", query=query)
+    first = index_manager.search("vacation policy", top_k=5)
+    assert index_manager.search("vacation policy", top_k=5) is first
+    index_manager.search("vacation policy", top_k=10)
+    assert mock_index.search.call_count == 2
+    assert index_manager.search_stats["hits"] == 1
+
+    index_manager.add_documents(documents[:1])
+    assert index_manager.search("vacation policy", top_k=5) is not first
+
+def test_search_many_deduplicates(index_manager, mock_index):
+    """Test that duplicate queries in a batch are searched once, in input order."""
+    mock_index.search.side_effect = lambda query, **kwargs: Mock(status="SUCCESS", query=query)
+    results = index_manager.search_many(["a", "b", "a", "c", "b"])
+    assert [result.query for result in results] == ["a", "b", "a", "c", "b"]
+    assert sorted(call.args[0] for call in mock_index.search.call_args_list) == ["a", "b", "c"]
+
+def test_local_backend_runs_offline(tmp_path, documents):
+    """Test indexing and searching end to end with the local retrieval backend."""
+    with patch('src.indexer.index_manager.INDEXED_DIR', tmp_path / "indexed"), \
+         patch('src.indexer.document_processor.DocumentConverter'):
+        manager = IndexManager(name="Offline", description="Test", agent_id="offline", backend="local")
+    assert manager.add_documents(documents) == 5
+    response = manager.search("Document number 3", top_k=1)
+    assert response.details[0]["metadata"]["source"].endswith("doc_3.txt")
+    assert manager.index.count() == 5
+
+def test_hybrid_search_finds_exact_identifiers(index_manager, mock_index, tmp_path):
+    """Test that keyword hits for an identifier are fused ahead of semantic hits."""
+    docs_dir = tmp_path / "tickets"
+    docs_dir.mkdir()
+    for name, text in [("outage.md", "Ticket INC-4521: the VPN outage was caused by an expired certificate."),
+                       ("network.md", "General notes about network outages and VPN troubleshooting.")]:
+        (docs_dir / name).write_text(text)
+    index_manager.add_documents([{"file_path": str(path)} for path in sorted(docs_dir.iterdir())])
+
+    # Semantic search only returns the generic document
+    network_id = next(iter(index_manager.storage.get_file_state(str(docs_dir / "network.md"))["chunks"]))
+    mock_index.search.return_value = Mock(status="SUCCESS", data="General notes", details=[
+        {"score": 0.8, "data": "General notes", "document": network_id, "metadata": {}}])
+    response = index_manager.search("what happened in INC-4521", top_k=2)
+    assert response.details[0]["metadata"]["source"].endswith("outage.md")
+    assert [hit["document"] for hit in response.details][1] == network_id
+    assert response.data.startswith("Ticket INC-4521")
+
+    dense_only = index_manager.search("what happened in INC-4521", top_k=2, hybrid=False)
+    assert [hit["document"] for hit in dense_only.details] == [network_id]
+
+def test_reconcile_directory_removes_missing_files(index_manager, mock_index, tmp_path, documents):
+    """Test that files missing from a scan are deleted remotely and from the state, in batches."""
+    sub_dir = tmp_path / "docs" / "sub"
+    sub_dir.mkdir()
+    (sub_dir / "nested.txt").write_text("Nested document")
+    index_manager.add_documents(documents + [{"file_path": str(sub_dir / "nested.txt")}])
+    docs_dir = str(tmp_path / "docs")
+
+    # A non-recursive scan, or one that could not read a subdirectory, keeps its files
+    assert index_manager.reconcile_directory(docs_dir, {doc["file_path"] for doc in documents}, recursive=False) == 0
+    assert index_manager.reconcile_directory(docs_dir, {doc["file_path"] for doc in documents},
+                                             failed_dirs=[str(sub_dir)]) == 0
+
+    deleted = {documents[0]["file_path"], documents[3]["file_path"], str(sub_dir / "nested.txt")}
+    seen = {doc["file_path"] for doc in documents} - deleted
+    def delete_record(record_id):
+        if "doc_3" in record_id:
+            raise Exception("Service unavailable")
+    mock_index.delete_record.side_effect = delete_record
+    with patch('src.indexer.index_manager.DELETE_BATCH_SIZE', 2), \
+         patch.object(index_manager.storage, 'compact') as mock_compact:
+        assert index_manager.reconcile_directory(docs_dir, seen) == 2
+        mock_compact.assert_called_once()
+    assert {call.args[0].split("#")[0] for call in mock_index.delete_record.call_args_list} == deleted
+    # The failed deletion stays in the state and is retried next time
+    assert set(index_manager.get_indexed_files()) == seen | {documents[3]["file_path"]}
+
+    mock_index.delete_record.side_effect = None
+    assert index_manager.reconcile_directory(docs_dir, seen) == 1
+    assert set(index_manager.get_indexed_files()) == seen
+
+def test_interrupted_job_resumes_from_last_batch(index_manager, mock_index, documents):
+    """Test that a failed forced run resumes without re-upserting committed batches."""
+    forced = [{**doc, "force": True} for doc in documents]
+    mock_index.upsert.side_effect = fail_after(1)
+    job = index_manager.start_job("directory:docs", force=True)
+    with patch('src.indexer.index_manager.UPSERT_BATCH_RECORDS', 2), \
+         patch('src.indexer.index_manager.UPSERT_MAX_IN_FLIGHT', 1), \
+         patch('src.indexer.index_manager.UPSERT_RETRY_BASE_DELAY', 0):
+        with pytest.raises(Exception, match="Service unavailable"):
+            index_manager.add_documents(forced, job)
+    saved = index_manager.storage.get_job("directory:docs")
+    assert (saved["status"], saved["batches"], saved["files"]) == ("failed", 1, 2)
+
+    mock_index.upsert.reset_mock(side_effect=True)
+    resumed = index_manager.start_job("directory:docs", force=True)
+    assert resumed.resumed and resumed.id == job.id
+    assert index_manager.add_documents(forced, resumed) == 3
+    assert sum(len(call.args[0]) for call in mock_index.upsert.call_args_list) == 3
+    assert index_manager.storage.get_job("directory:docs")["status"] == "completed"
+
+    # A completed job is not resumed: the next forced run indexes everything again
+    assert not index_manager.start_job("directory:docs", force=True).resumed
+
+def test_add_documents_reports_stage_metrics(index_manager, documents):
+    """Test that indexing records per-stage latencies and per-file-type outcomes."""
+    from src.utils.metrics import metrics
+    metrics.reset()
+    index_manager.add_documents(documents)
+    index_manager.add_documents(documents)
+
+    assert metrics.histogram("chunk", ".txt").count == 5
+    # Plain text is hashed while it is chunked, without a conversion
+    assert metrics.histogram("hash", ".txt") is None
+    assert metrics.histogram("convert", ".txt") is None
+    # Both runs stat every file; the second reuses the stored checksums
+    assert metrics.histogram("stat", ".txt").count == 10
+    assert metrics.histogram("upsert").count == 1
+    assert metrics.histogram("state_commit").count == 1
+    assert metrics.counter("indexer_files_total", outcome="indexed", file_type=".txt") == 5
+    assert metrics.counter("indexer_files_total", outcome="skipped", file_type=".txt") == 5
+    assert metrics.counter("indexer_records_total", operation="upsert") == 5
+
+def test_plain_text_is_opened_once(index_manager, mock_index, tmp_path):
+    """Test that a changed plain-text file is hashed and chunked in one read."""
+    path = tmp_path / "events.csv"
+    path.write_text("time,event\n" + "".join(f"{i},event {i}\n" for i in range(2000)))
+    with patch('builtins.open', side_effect=open) as opened, \
+         patch.object(TextFile, '_blocks', autospec=True, side_effect=TextFile._blocks) as reads, \
+         patch('src.connectors.local_connector.hash_file') as hash_file:
+        assert index_manager.add_documents([{"file_path": str(path)}]) == 1
+    assert [call.args[0] for call in opened.call_args_list if str(call.args[0]) == str(path)] == [str(path)]
+    assert reads.call_count == 1
+    hash_file.assert_not_called()
+    records = mock_index.upsert.call_args.args[0]
+    assert len(records) > 1
+    assert records[0].value.startswith("time,event 0,event 0 1,event 1")
+    assert index_manager.get_indexed_files()[str(path)]["metadata"]["checksum"] == hash_file_of(path)
@@ -0,0 +1,109 @@
+"""Test suite for IndexStorage and its state backends."""
+
+import json
+import threading
+import time
+import pytest
+from src.indexer.index_storage import IndexStorage
+from src.indexer.state_backends import StateBackend
+
+BACKENDS = ["json", "journal", "sqlite"]
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_state_round_trip(tmp_path, backend):
+    """Test that file states and the index ID survive a reopen."""
+    storage = IndexStorage(tmp_path, backend=backend)
+    storage.set_index_id("test_index_id")
+    storage.update_file_state("/docs/a.txt", {"size": 1, "checksum": "aa"})
+    storage.update_file_state("/docs/b.txt", {"size": 2, "checksum": "bb"})
+    storage.remove_file("/docs/a.txt")
+    storage.close()
+
+    reopened = IndexStorage(tmp_path, backend=backend)
+    assert reopened.get_index_id() == "test_index_id"
+    assert reopened.get_file_state("/docs/a.txt") is None
+    assert reopened.get_file_state("/docs/b.txt")["metadata"]["checksum"] == "bb"
+    assert list(reopened.get_indexed_files()) == ["/docs/b.txt"]
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_batch_rollback(tmp_path, backend):
+    """Test that a failed batch leaves no partial state behind."""
+    storage = IndexStorage(tmp_path, backend=backend)
+    with pytest.raises(RuntimeError):
+        with storage.batch():
+            storage.update_file_state("/docs/a.txt", {"size": 1})
+            raise RuntimeError("boom")
+    assert storage.get_file_state("/docs/a.txt") is None
+
+def test_journal_ignores_torn_entry(tmp_path):
+    """Test that a partially written journal line from a crash is skipped."""
+    storage = IndexStorage(tmp_path, backend="journal")
+    storage.update_file_state("/docs/a.txt", {"size": 1})
+    storage.close()
+    with open(tmp_path / "index_state.journal", "a") as f:
+        f.write('{"op": "put", "key": "/docs/b.t')
+
+    reopened = IndexStorage(tmp_path, backend="journal")
+    assert reopened.get_file_state("/docs/a.txt") is not None
+    assert reopened.get_file_state("/docs/b.txt") is None
+
+def test_journal_writes_after_torn_entry_survive(tmp_path):
+    """Test that entries written after a crash are not appended to the torn line."""
+    storage = IndexStorage(tmp_path, backend="journal")
+    storage.update_file_state("/docs/a.txt", {"size": 1})
+    storage.close()
+    with open(tmp_path / "index_state.journal", "a") as f:
+        f.write('{"op": "put", "key": "/docs/b.t')
+
+    reopened = IndexStorage(tmp_path, backend="journal")
+    reopened.update_file_state("/docs/c.txt", {"size": 3})
+    reopened.close()
+
+    again = IndexStorage(tmp_path, backend="journal")
+    assert sorted(again.get_indexed_files()) == ["/docs/a.txt", "/docs/c.txt"]
+    again.close()
+
+def test_sqlite_migrates_legacy_json(tmp_path):
+    """Test the one-time import of an existing index_state.json."""
+    legacy = {
+        "files": {"/docs/a.txt": {"metadata": {"size": 1}, "last_indexed": "2024-01-01T00:00:00"}},
+        "last_update": "2024-01-01T00:00:00",
+        "index_id": "legacy_index_id"
+    }
+    (tmp_path / "index_state.json").write_text(json.dumps(legacy))
+
+    storage = IndexStorage(tmp_path, backend="sqlite")
+    assert storage.get_index_id() == "legacy_index_id"
+    assert storage.get_file_state("/docs/a.txt")["metadata"]["size"] == 1
+    assert not (tmp_path / "index_state.json").exists()
+    assert (tmp_path / "index_state.json.migrated").exists()
+
+def test_sqlite_batch_excludes_other_threads(tmp_path):
+    """Test that another thread's write waits for an open batch instead of being rolled back with it."""
+    storage = IndexStorage(tmp_path, backend="sqlite")
+    writer = threading.Thread(target=storage.update_file_state, args=("/docs/b.txt", {"size": 2}))
+    with pytest.raises(RuntimeError):
+        with storage.batch():
+            storage.update_file_state("/docs/a.txt", {"size": 1})
+            writer.start()
+            time.sleep(0.2)
+            assert writer.is_alive()
+            raise RuntimeError("boom")
+    writer.join()
+    assert storage.get_file_state("/docs/a.txt") is None
+    assert storage.get_file_state("/docs/b.txt")["metadata"]["size"] == 2
+    storage.close()
+
+def test_backends_implement_the_whole_interface(tmp_path):
+    """Test that a backend missing part of the interface cannot be created."""
+    class Incomplete(StateBackend):
+        def get_file(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete(tmp_path)
+
+def test_unknown_backend(tmp_path):
+    """Test that an unknown backend name is rejected."""
+    with pytest.raises(ValueError, match="Unknown state backend"):
+        IndexStorage(tmp_path, backend="nope")
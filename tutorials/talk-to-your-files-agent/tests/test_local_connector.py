@@ -0,0 +1,58 @@
+"""Test suite for the LocalConnector class."""
+
+import os
+from unittest.mock import patch
+from src.connectors.local_connector import LocalConnector
+
+def test_checksum_covers_full_file(tmp_path):
+    """Test that edits past the first 8KB change the checksum."""
+    connector = LocalConnector()
+    path = tmp_path / "large.txt"
+    path.write_text("header\n" * 2000 + "tail A")
+    before = connector.get_file_metadata(str(path))["checksum"]
+
+    path.write_text("header\n" * 2000 + "tail B")
+    after = connector.get_file_metadata(str(path))["checksum"]
+    assert before != after
+
+def test_checksum_reused_for_unchanged_stat_signature(tmp_path):
+    """Test that an unchanged (size, mtime_ns, inode) skips re-hashing."""
+    connector = LocalConnector()
+    path = tmp_path / "doc.txt"
+    path.write_text("Some content")
+    previous = connector.get_file_metadata(str(path))
+
+    with patch('src.connectors.local_connector.hash_file') as mock_hash:
+        metadata = connector.get_file_metadata(str(path), previous=previous)
+        mock_hash.assert_not_called()
+    assert metadata["checksum"] == previous["checksum"]
+
+    path.write_text("Other content")
+    metadata = connector.get_file_metadata(str(path), previous=previous)
+    assert metadata["checksum"] != previous["checksum"]
+
+def test_scan_prunes_ignored_directories(tmp_path):
+    """Test that ignored directories are never listed and ignore files are honored."""
+    for relative in ["doc.md", "skip.txt", "__pycache__/pkg/readme.md", ".git/description.txt", "build/notes.md",
+                     "notes/todo.txt", "notes/old/archive.txt", "image.png"]:
+        path = tmp_path / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("content")
+    (tmp_path / ".gitignore").write_text("skip.txt\n")
+    (tmp_path / "notes" / ".indexignore").write_text("old/\n")
+
+    listed = []
+    real_scandir = os.scandir
+    def scandir(path):
+        listed.append(os.path.relpath(path, tmp_path))
+        return real_scandir(path)
+
+    connector = LocalConnector()
+    with patch('src.connectors.local_connector.os.scandir', side_effect=scandir):
+        found = {os.path.relpath(path, tmp_path) for path in connector.scan_directory(str(tmp_path))}
+    # Build outputs can hold real documents and are only excluded by an ignore file
+    assert found == {"doc.md", os.path.join("notes", "todo.txt"), os.path.join("build", "notes.md")}
+    assert sorted(listed) == [".", "build", "notes"]
+
+    assert len(list(connector.scan_directory(str(tmp_path), ignore=False))) == 7
+    assert {os.path.relpath(path, tmp_path) for path in connector.scan_directory(str(tmp_path), recursive=False)} == {"doc.md"}
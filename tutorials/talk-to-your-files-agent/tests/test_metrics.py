@@ -0,0 +1,98 @@
+"""Test suite for the indexer metrics registry."""
+
+import contextlib
+import json
+import urllib.request
+import pytest
+from src.utils.metrics import Metrics, Histogram
+
+class FakeTracer:
+    """Records spans the way an OpenTelemetry tracer would be asked for them."""
+
+    def __init__(self):
+        self.spans = []
+
+    @contextlib.contextmanager
+    def start_as_current_span(self, name, attributes=None):
+        span = {"name": name, "attributes": attributes}
+        self.spans.append(span)
+        try:
+            yield span
+        except Exception as e:
+            span["error"] = str(e)
+            raise
+
+def test_histogram_quantiles():
+    """Test that quantiles are interpolated inside their bucket."""
+    histogram = Histogram((1.0, 2.0, float("inf")))
+    for value in (0.5, 1.5, 1.5, 1.5, 10.0):
+        histogram.observe(value)
+    assert histogram.count == 5
+    assert histogram.sum == 15.0
+    assert histogram.quantile(0.5) == pytest.approx(1.5)
+    assert histogram.snapshot()["buckets"] == {"1.0": 1, "2.0": 4, "+Inf": 5}
+
+def test_stages_counters_and_spans():
+    """Test stage timing per file type, error counts, listeners and tracing spans."""
+    metrics = Metrics()
+    seen = []
+    metrics.add_listener(lambda stage, file_type, seconds: seen.append((stage, file_type)))
+    tracer = FakeTracer()
+    metrics.enable_tracing(tracer)
+
+    with metrics.stage("convert", ".pdf", num_bytes=100, file="a.pdf"):
+        pass
+    with pytest.raises(ValueError):
+        with metrics.stage("convert", ".pdf"):
+            raise ValueError("broken")
+    metrics.disable_tracing()
+    metrics.observe("hash", 0.001, ".txt", num_bytes=50)
+    metrics.inc("indexer_files_total", outcome="indexed", file_type=".pdf")
+
+    assert seen == [("convert", ".pdf"), ("convert", ".pdf"), ("hash", ".txt")]
+    assert metrics.histogram("convert", ".pdf").count == 2
+    assert metrics.counter("indexer_stage_errors_total", stage="convert", file_type=".pdf") == 1
+    assert metrics.counter("indexer_stage_bytes_total", stage="convert", file_type=".pdf") == 100
+    assert [span["name"] for span in tracer.spans] == ["indexer.convert", "indexer.convert"]
+    assert tracer.spans[0]["attributes"] == {"stage": "convert", "file_type": ".pdf", "file": "a.pdf"}
+    assert tracer.spans[1]["error"] == "broken"
+
+    snapshot = metrics.snapshot()
+    assert set(snapshot["stages"]) == {"convert", "hash"}
+    assert snapshot["stages"]["hash"][".txt"]["count"] == 1
+    assert json.loads(json.dumps(snapshot)) == snapshot
+
+    metrics.reset()
+    assert metrics.snapshot() == {"stages": {}, "counters": []}
+
+def test_merge_worker_snapshot():
+    """Test that a snapshot from another registry adds to counters and histograms."""
+    worker, parent = Metrics(), Metrics()
+    worker.observe("hash", 0.002, ".txt", num_bytes=10)
+    worker.observe("upsert", 0.2)
+    parent.observe("hash", 0.002, ".txt")
+    parent.merge(worker.snapshot())
+    assert parent.histogram("hash", ".txt").count == 2
+    assert parent.histogram("upsert").snapshot() == worker.histogram("upsert").snapshot()
+    assert parent.counter("indexer_stage_bytes_total", stage="hash", file_type=".txt") == 10
+
+def test_prometheus_text_and_endpoint():
+    """Test the Prometheus exposition format and the HTTP endpoint."""
+    metrics = Metrics(buckets=(0.1, float("inf")))
+    metrics.observe("upsert", 0.05)
+    metrics.inc("indexer_files_total", outcome="skipped", file_type=".md")
+    text = metrics.to_prometheus()
+    assert "# TYPE indexer_stage_duration_seconds histogram" in text
+    assert 'indexer_stage_duration_seconds_bucket{stage="upsert",file_type="",le="0.1"} 1' in text
+    assert 'indexer_stage_duration_seconds_count{stage="upsert",file_type=""} 1' in text
+    assert 'indexer_files_total{file_type=".md",outcome="skipped"} 1' in text
+
+    server = metrics.serve(0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(f"{url}/metrics") as response:
+            assert response.read().decode() == text
+        with urllib.request.urlopen(f"{url}/metrics.json") as response:
+            assert json.load(response)["stages"]["upsert"]["all"]["count"] == 1
+    finally:
+        metrics.stop_serving()
@@ -0,0 +1,62 @@
+"""Test suite for the upsert scheduler."""
+
+import threading
+import time
+import pytest
+from src.indexer.pipeline import UpsertScheduler
+
+def test_window_bounds_requests_in_flight():
+    """Test that no more than ``max_in_flight`` sends run at once."""
+    lock = threading.Lock()
+    active = []
+    peak = []
+
+    def send(payload):
+        with lock:
+            active.append(payload)
+            peak.append(len(active))
+        time.sleep(0.01)
+        with lock:
+            active.remove(payload)
+
+    scheduler = UpsertScheduler(send, max_records=100, max_in_flight=3, base_delay=0)
+    finished = []
+    for i in range(20):
+        finished.extend(scheduler.submit(i))
+    finished.extend(scheduler.drain())
+    scheduler.close()
+    assert sorted(payload for payload, error in finished if error is None) == list(range(20))
+    assert max(peak) == 3
+
+def test_retries_and_aimd_batch_size():
+    """Test that errors are retried and halve the batch size, which recovers additively."""
+    failures = iter([True, True, False, False, False])
+
+    def send(payload):
+        if next(failures):
+            raise Exception("Rate limit exceeded")
+
+    scheduler = UpsertScheduler(send, max_records=100, min_records=10, max_in_flight=2, base_delay=0)
+    assert scheduler.drain() == []
+    [(payload, error)] = scheduler.submit("batch") + scheduler.drain()
+    assert (payload, error) == ("batch", None)
+    assert scheduler.stats == {"requests": 3, "retries": 2, "failures": 0}
+    assert (scheduler.record_limit, scheduler.window) == (35, 2)
+
+    scheduler.submit("next")
+    scheduler.drain()
+    assert (scheduler.record_limit, scheduler.window) == (45, 2)
+    scheduler.close()
+
+def test_exhausted_retries_return_the_error():
+    """Test that a send failing every attempt is reported with its error."""
+    def send(payload):
+        raise ValueError("Bad record")
+
+    scheduler = UpsertScheduler(send, max_records=10, max_retries=2, base_delay=0)
+    scheduler.submit("batch")
+    [(payload, error)] = scheduler.drain()
+    scheduler.close()
+    assert isinstance(error, ValueError)
+    assert scheduler.stats["requests"] == 3
+    assert scheduler.record_limit == 1
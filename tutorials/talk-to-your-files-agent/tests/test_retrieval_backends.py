@@ -0,0 +1,60 @@
+"""Test suite for the local retrieval backend."""
+
+import pytest
+from aixplain.modules.model.index_model import IndexFilter, IndexFilterOperator
+from aixplain.modules.model.record import Record
+from src.indexer.retrieval_backends import LocalIndex, create_retrieval_backend
+
+@pytest.fixture
+def records():
+    """Create records about a few distinct topics."""
+    texts = [
+        "The vacation policy grants twenty days of paid leave per year.",
+        "Expense reports must be filed within thirty days of travel.",
+        "Incident INC-4521 was caused by an expired TLS certificate.",
+        "The office is closed on public holidays.",
+    ]
+    return [Record(value=text, id=f"doc-{i}", attributes={"file_type": ".pdf" if i % 2 else ".md"})
+            for i, text in enumerate(texts)]
+
+def test_search_finds_keywords_and_identifiers(tmp_path, records):
+    """Test that hybrid search ranks the matching record first."""
+    index = LocalIndex(tmp_path)
+    index.upsert(records)
+    assert index.search("INC-4521", top_k=1).details[0]["document"] == "doc-2"
+    response = index.search("how many days of paid vacation leave", top_k=2)
+    assert response.details[0]["document"] == "doc-0"
+    assert response.data == records[0].value
+    assert set(response.details[0]) == {"score", "data", "document", "metadata"}
+
+def test_filters_delete_and_reopen(tmp_path, records):
+    """Test attribute filters, deletion and persistence across restarts."""
+    index = LocalIndex(tmp_path)
+    index.upsert(records)
+    pdf_only = [IndexFilter(field="file_type", value=".pdf", operator=IndexFilterOperator.EQUALS)]
+    assert {hit["document"] for hit in index.search("days", top_k=10, filters=pdf_only).details} <= {"doc-1", "doc-3"}
+
+    index.delete_record("doc-2")
+    index.upsert([Record(value="Holiday schedule updated", id="doc-3", attributes={})])
+    index.close()
+
+    reopened = LocalIndex(tmp_path)
+    assert reopened.count() == 3
+    assert all(hit["document"] != "doc-2" for hit in reopened.search("INC-4521").details)
+    assert reopened.search("holiday schedule", top_k=1).details[0]["data"] == "Holiday schedule updated"
+
+def test_matrix_grows_and_reuses_rows(tmp_path):
+    """Test that the embedding file grows on demand and deleted rows are reused."""
+    index = LocalIndex(tmp_path)
+    index.upsert([Record(value=f"Note number {i}", id=str(i), attributes={}) for i in range(100)])
+    capacity = index._matrix.shape[0]
+    assert capacity >= 100
+    index.delete_record("5")
+    index.upsert([Record(value="Replacement note", id="new", attributes={})])
+    assert index._matrix.shape[0] == capacity
+    assert index.count() == 100
+
+def test_unknown_backend(tmp_path):
+    """Test that unknown backend names are rejected."""
+    with pytest.raises(ValueError, match="Unknown retrieval backend"):
+        create_retrieval_backend("elastic", tmp_path)
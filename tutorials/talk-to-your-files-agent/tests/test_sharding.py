@@ -0,0 +1,89 @@
+"""Test suite for sharded multi-root indexing."""
+
+import sqlite3
+import pytest
+from unittest.mock import patch
+from src.indexer.retrieval_backends import RetrievalBackend
+from src.indexer.sharding import ShardedIndexer, shard_of
+from src.utils.metrics import metrics
+
+class SharedIndex(RetrievalBackend):
+    """Minimal retrieval backend that several processes can write to: one SQLite table."""
+
+    process_safe = True
+
+    def __init__(self, directory):
+        directory.mkdir(parents=True, exist_ok=True)
+        self.id = "shared"
+        self._conn = sqlite3.connect(str(directory / "records.db"), timeout=30, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS records (id TEXT PRIMARY KEY, value TEXT)")
+
+    def upsert(self, documents):
+        self._conn.executemany("INSERT OR REPLACE INTO records VALUES (?, ?)",
+                               [(record.id, record.value) for record in documents])
+
+    def delete_record(self, record_id):
+        self._conn.execute("DELETE FROM records WHERE id = ?", (record_id,))
+
+    def count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+@pytest.fixture
+def roots(tmp_path):
+    """Create two directory roots of small text files."""
+    paths = []
+    for name in ("sales", "legal"):
+        root = tmp_path / name
+        (root / "sub").mkdir(parents=True)
+        for i in range(6):
+            (root / ("sub" if i % 2 else "") / f"{name}_{i}.txt").write_text(f"{name} document number {i}")
+        paths.append(str(root))
+    return paths
+
+def test_shard_of_is_stable_and_spread():
+    """Test that shards are in range, deterministic and roughly balanced."""
+    paths = [f"/data/share/file_{i}.txt" for i in range(4000)]
+    shards = [shard_of(path, 4) for path in paths]
+    assert shards == [shard_of(path, 4) for path in paths]
+    assert all(800 < shards.count(shard) < 1200 for shard in range(4))
+
+def test_unsafe_backends_need_a_single_worker(tmp_path):
+    """Test that backends which one process owns cannot be shared by workers."""
+    with pytest.raises(ValueError, match="retrieval backend"):
+        ShardedIndexer("Test", "Test", "test", backend="local", state_dir=tmp_path, workers=2)
+    with patch('src.indexer.sharding.STATE_BACKEND', "journal"), pytest.raises(ValueError, match="state backend"):
+        ShardedIndexer("Test", "Test", "test", backend=SharedIndex, state_dir=tmp_path, workers=2)
+
+def test_single_worker_indexes_in_process(tmp_path, roots):
+    """Test the in-process path against the local index."""
+    with patch('src.indexer.document_processor.DocumentConverter'):
+        indexer = ShardedIndexer("Test", "Test", "test", backend="local", state_dir=tmp_path / "state", workers=1)
+        assert indexer.index_directories(roots) == 12
+        assert indexer.index_manager.index.count() == 12
+        assert indexer.index_directories(roots) == 0
+    assert indexer.last_stats == {"indexed": 0, "skipped": 12, "errors": 0, "removed": 0}
+
+def test_workers_share_state_and_merge_stats(tmp_path, roots):
+    """Test that worker processes split the files and report to one state store and registry."""
+    metrics.reset()
+    indexer = ShardedIndexer("Test", "Test", "test", backend=SharedIndex, state_dir=tmp_path / "state", workers=2)
+    assert indexer.index_directories(roots) == 12
+    assert indexer.last_stats == {"indexed": 12, "skipped": 0, "errors": 0, "removed": 0}
+    assert indexer.index_manager.index.count() == 12
+    assert indexer.index_manager.storage.count_files() == 12
+    # Each file was stat'ed by one worker only
+    assert metrics.histogram("stat", ".txt").count == 12
+    # The keyword index kept by the workers is shared as well
+    assert len(indexer.index_manager.sparse_index) == 12
+    assert len(indexer.index_manager.sparse_index.search("sales", 20)) == 6
+
+    (tmp_path / "legal" / "sub" / "legal_3.txt").unlink()
+    assert indexer.index_directories(roots) == 0
+    assert indexer.last_stats == {"indexed": 0, "skipped": 11, "errors": 0, "removed": 1}
+    assert indexer.index_manager.index.count() == 11
+    assert len(indexer.index_manager.sparse_index) == 11
@@ -0,0 +1,47 @@
+"""Test suite for the BM25 keyword index and rank fusion."""
+
+from src.indexer.sparse_index import SparseIndex, tokenize, reciprocal_rank_fusion
+
+def test_tokenize_keeps_identifiers():
+    """Test that compound identifiers are kept whole and split into parts."""
+    assert tokenize("See INC-4521 in v2.3") == ["see", "inc-4521", "inc", "4521", "in", "v2.3", "v2", "3"]
+
+def test_reciprocal_rank_fusion():
+    """Test that documents ranked well in several rankings come first."""
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]], k=1)
+    assert [doc_id for doc_id, _ in fused] == ["b", "a", "d", "c"]
+
+def test_incremental_add_remove_and_reopen(tmp_path):
+    """Test BM25 ranking as documents are replaced, removed and reloaded."""
+    index = SparseIndex(tmp_path / "keywords.db", store_documents=True)
+    index.add([
+        ("a", "Part PN-7731 ships in blue", {"source": "a.md"}),
+        ("b", "Blue widgets and blue paint"),
+        ("c", "Unrelated text about lunch"),
+    ])
+    assert index.search("PN-7731")[0][0] == "a"
+    assert index.search("blue")[0][0] == "b"
+    assert index.get("a") == ("Part PN-7731 ships in blue", {"source": "a.md"})
+
+    index.add([("a", "Part PN-9000 ships in red")])
+    index.remove(["b"])
+    assert index.search("7731") == []
+    assert index.search("blue") == []
+    index.close()
+
+    reopened = SparseIndex(tmp_path / "keywords.db")
+    assert len(reopened) == 2
+    assert reopened.search("pn-9000")[0][0] == "a"
+
+def test_shared_between_connections(tmp_path):
+    """Test that an index sees documents another connection (e.g. process) added."""
+    writer = SparseIndex(tmp_path / "keywords.db")
+    reader = SparseIndex(tmp_path / "keywords.db")
+    writer.add([("a", "shared keyword index"), ("b", "another document")])
+    assert len(reader) == 2
+    assert reader.search("shared")[0][0] == "a"
+    reader.add([("c", "third document")])
+    writer.remove(["a"])
+    assert len(writer) == len(reader) == 2
+    writer.close()
+    reader.close()
@@ -0,0 +1,26 @@
+"""Guards the startup time of a FileAgent that only answers queries."""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from src.agent.agent import FileAgent
+FileAgent()
+elapsed = time.perf_counter() - started
+heavy = [name for name in ("docling", "torch", "transformers", "aixplain", "googleapiclient", "numpy",
+                           "requests")
+         if name in sys.modules]
+print(json.dumps({"elapsed": elapsed, "heavy": heavy}))
+"""
+
+def test_query_only_agent_starts_fast():
+    """Test that importing and creating a FileAgent loads no heavy dependency and takes well under a second."""
+    output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=Path(__file__).resolve().parent.parent,
+                            capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    assert result["heavy"] == []
+    assert result["elapsed"] < 0.8
@@ -0,0 +1,65 @@
+"""Test suite for plain-text files read through a reused buffer."""
+
+import pytest
+from unittest.mock import patch
+from src.utils.hashing import hash_buffer, hash_file
+from src.utils.text_file import TextFile
+
+@pytest.mark.parametrize("block_size", [1, 2, 3, 5, 1024])
+def test_lines_match_splitlines_across_blocks(tmp_path, block_size):
+    """Test incremental decoding with lines, "\\r\\n" pairs and multi-byte characters split between blocks."""
+    content = "# Log ✓\r\nfirst line\r\n\r\nsecond\rthird\n日本語 row,1,2\n\x0cpage\nno newline at end"
+    path = tmp_path / "app.log.txt"
+    path.write_bytes(content.encode("utf-8"))
+    with TextFile(path, block_size) as text:
+        assert list(text.lines()) == content.splitlines()
+        assert text.read() == content
+        assert text.checksum() == hash_file(str(path))
+        assert text.stats.st_size == len(content.encode("utf-8"))
+
+def test_empty_and_invalid_files(tmp_path):
+    """Test that empty files read as no text and invalid UTF-8 is replaced."""
+    empty = tmp_path / "empty.txt"
+    empty.write_bytes(b"")
+    with TextFile(empty) as text:
+        assert text.stats.st_size == 0 and list(text.lines()) == [] and text.read() == ""
+        assert text.checksum() == hash_file(str(empty))
+
+    broken = tmp_path / "broken.csv"
+    broken.write_bytes(b"a,b\n\xff\xfe,c\n")
+    with TextFile(broken, 2) as text:
+        assert list(text.lines()) == ["a,b", "��,c"]
+
+def test_file_truncated_after_opening(tmp_path):
+    """Test that a file truncated between hashing and decoding reads short instead of crashing the process."""
+    path = tmp_path / "app.log"
+    path.write_text("".join(f"line {i}\n" for i in range(10000)))
+    with TextFile(path, 4096) as text:
+        checksum = text.checksum()
+        with open(path, "r+b") as f:
+            f.truncate(12)
+        assert list(text.lines()) == ["line 0", "line "]
+        assert text.read() == "line 0\nline "
+        assert checksum == text.checksum() != hash_file(str(path))
+
+def test_decoding_hashes_the_file_in_the_same_read(tmp_path):
+    """Test that the checksum is computed while decoding, and only by a read that got to the end."""
+    path = tmp_path / "app.log"
+    path.write_text("".join(f"line {i}\n" for i in range(10000)))
+    with TextFile(path, 4096) as text, patch.object(text, "_blocks", wraps=text._blocks) as reads:
+        assert len(list(text.lines())) == 10000
+        assert text.checksum() == hash_file(str(path))
+        assert reads.call_count == 1
+
+    with TextFile(path, 4096) as text, patch.object(text, "_blocks", wraps=text._blocks) as reads:
+        assert next(text.lines()) == "line 0"
+        assert text.checksum() == hash_file(str(path))
+        assert reads.call_count == 2
+
+@pytest.mark.parametrize("size", [0, 1, 5000])
+def test_hash_file_reads_through_a_bounded_buffer(tmp_path, size):
+    """Test that hash_file matches hash_buffer without mapping the file."""
+    path = tmp_path / "data.bin"
+    path.write_bytes(bytes(range(256)) * (size // 256) + b"x" * (size % 256))
+    with patch("src.utils.hashing.HASH_BLOCK_SIZE", 1000):
+        assert hash_file(str(path)) == hash_buffer(path.read_bytes())